@@ -0,0 +1,217 @@
+"""ATS-style keyword match scoring of resumes against a job description.
+
+Resumes and the job description are compared by TF-IDF cosine similarity
+over ``ATS_FIELDS``, tokenized the same way as search. Each resume's term
+vector (sorted term ids plus sublinear term frequencies) is cached per
+``(resume id, version)``, so scoring never re-tokenizes an unchanged
+resume; a new version simply misses the cache and ``invalidate`` frees the
+old vector early. Term ids whose document frequency drops to zero are
+reused for new terms once ``recycle_after`` seconds have passed (longer
+than any request holds a vector), so the vocabulary tracks the cached
+resumes rather than every term ever seen.
+
+Batch scoring concatenates the cached vectors into one CSR-style layout
+and computes every dot product, norm and keyword hit with NumPy, so
+scoring thousands of resumes is a handful of array operations. Document
+frequencies cover the resumes currently cached.
+"""
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rich_text import RICH_TEXT_FIELDS
+from search_index import field_values, tokenize
+
+ATS_FIELDS = (
+    "skills",
+    "experience.title",
+    "experience.description",
+    "projects.description",
+    "projects.technologies",
+)
+PROJECTION = {"_id": 0, "id": 1, "version": 1, **{path: 1 for path in ATS_FIELDS},
+              **{f"{path}_text": 1 for path in RICH_TEXT_FIELDS if path in ATS_FIELDS}}
+
+# Job-posting boilerplate that would otherwise rank as rare, "missing" keywords
+JOB_STOPWORDS = frozenset("""
+    ability about across all also an our we you your us they their this that these who will would can
+    must should have has had not no looking hiring join role position candidate candidates team teams
+    work working opportunity company apply including include includes such other more plus etc years
+    year experience experienced strong excellent good great preferred required requirements
+    responsibilities responsible qualifications skills knowledge understanding familiarity ideal
+    environment new what how why when where which while within using use used able well both
+""".split())
+
+
+def resume_tokens(resume: Dict[str, Any]) -> List[str]:
+    return [token for path in ATS_FIELDS
+            for value in field_values(resume, path.split("."))
+            for token in tokenize(value)]
+
+
+# (version, term ids, sublinear term frequencies)
+Vector = Tuple[int, np.ndarray, np.ndarray]
+
+
+class AtsScorer:
+    def __init__(self, max_cached_vectors: int = 100_000, recycle_after: float = 60.0):
+        self.max_cached_vectors = max_cached_vectors
+        self.recycle_after = recycle_after
+        self._vocabulary: Dict[str, int] = {}
+        self._terms: List[str] = []
+        self._document_frequency = np.zeros(1024, dtype=np.int32)
+        # term id -> when its document frequency last dropped to zero; the deque holds them in that order
+        self._released: Dict[int, float] = {}
+        self._release_order: Deque[Tuple[float, int]] = deque()
+        # resume id -> vector
+        self._vectors: "OrderedDict[str, Vector]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._vocabulary.get(term)
+        if term_id is not None:
+            self._released.pop(term_id, None)
+            return term_id
+        term_id = self._recycled_term_id()
+        if term_id is None:
+            term_id = len(self._terms)
+            self._terms.append(term)
+            if term_id >= len(self._document_frequency):
+                grown = np.zeros(len(self._document_frequency) * 2, dtype=np.int32)
+                grown[:len(self._document_frequency)] = self._document_frequency
+                self._document_frequency = grown
+        else:
+            del self._vocabulary[self._terms[term_id]]
+            self._terms[term_id] = term
+        self._vocabulary[term] = term_id
+        return term_id
+
+    def _recycled_term_id(self) -> Optional[int]:
+        now = time.monotonic()
+        while self._release_order and self._release_order[0][0] + self.recycle_after <= now:
+            released_at, term_id = self._release_order.popleft()
+            # Skip entries for terms seen again, or released again later
+            if self._released.get(term_id) == released_at:
+                del self._released[term_id]
+                return term_id
+        return None
+
+    def cached_version(self, resume_id: str) -> Optional[int]:
+        entry = self._vectors.get(resume_id)
+        return entry[0] if entry is not None else None
+
+    def add(self, resume: Dict[str, Any], tokens: Optional[List[str]] = None) -> Vector:
+        """Cache the term vector of ``resume`` (with ``id`` and ``version``) and return it.
+
+        ``tokens`` are its ``resume_tokens``, when already computed off the event loop.
+        """
+        if tokens is None:
+            tokens = resume_tokens(resume)
+        counts = Counter(self._term_id(token) for token in tokens)
+        ids = np.fromiter(sorted(counts), dtype=np.int32, count=len(counts))
+        frequencies = 1.0 + np.log(np.fromiter((counts[i] for i in ids), dtype=np.float64, count=len(ids)))
+        self.invalidate(resume["id"])
+        vector = self._vectors[resume["id"]] = (resume.get("version", 0), ids, frequencies)
+        self._document_frequency[ids] += 1
+        while len(self._vectors) > self.max_cached_vectors:
+            self.invalidate(next(iter(self._vectors)))
+        return vector
+
+    def invalidate(self, resume_id: str) -> None:
+        entry = self._vectors.pop(resume_id, None)
+        if entry is not None:
+            ids = entry[1]
+            self._document_frequency[ids] -= 1
+            released_at = time.monotonic()
+            for term_id in ids[self._document_frequency[ids] == 0].tolist():
+                self._released[term_id] = released_at
+                self._release_order.append((released_at, term_id))
+
+    def lookup(self, versions: Dict[str, int]) -> Tuple[Dict[str, Vector], List[str]]:
+        """Cached vectors of the given versions, and the ids whose vector is absent or older.
+
+        Callers score the returned vectors rather than reading the cache
+        again, since an entry may be invalidated or evicted meanwhile.
+        """
+        vectors, stale = {}, []
+        for resume_id, version in versions.items():
+            entry = self._vectors.get(resume_id)
+            if entry is not None and entry[0] == version:
+                self._vectors.move_to_end(resume_id)
+                vectors[resume_id] = entry
+                self.hits += 1
+            else:
+                stale.append(resume_id)
+                self.misses += 1
+        return vectors, stale
+
+    def _idf(self, document_frequency: np.ndarray) -> np.ndarray:
+        documents = len(self._vectors)
+        return np.log((1.0 + documents) / (1.0 + document_frequency)) + 1.0
+
+    def score(self, job_description: str, vectors: Dict[str, Vector], top_keywords: int = 30) -> Dict[str, Any]:
+        """Cosine similarity of each resume (id -> vector) to ``job_description`` plus keyword coverage.
+
+        Results are sorted best first.
+        """
+        job_counts = Counter(token for token in tokenize(job_description) if token not in JOB_STOPWORDS)
+        job_terms = list(job_counts)
+        known = np.array([self._vocabulary.get(term, -1) for term in job_terms], dtype=np.int64)
+        frequency = np.where(known >= 0, self._document_frequency[np.maximum(known, 0)], 0)
+        job_weights = (1.0 + np.log(np.array([job_counts[t] for t in job_terms], dtype=np.float64))) \
+            * self._idf(frequency)
+        job_norm = float(np.sqrt(np.sum(job_weights ** 2))) if len(job_terms) else 0.0
+        order = np.argsort(-job_weights, kind="stable")[:top_keywords]
+        keywords = [job_terms[i] for i in order]
+
+        resume_ids = list(vectors)
+        vectors = list(vectors.values())
+        lengths = np.array([len(ids) for _, ids, _ in vectors], dtype=np.int64)
+        if vectors and lengths.sum():
+            indices = np.concatenate([ids for _, ids, _ in vectors])
+            frequencies = np.concatenate([tf for _, _, tf in vectors])
+        else:
+            indices, frequencies = np.zeros(0, dtype=np.int32), np.zeros(0)
+        rows = np.repeat(np.arange(len(vectors)), lengths)
+
+        # Per-term lookup tables reaching only the highest term id of the job description; the
+        # last slot is the "not in the job" entry every larger id is clipped to
+        known_terms = np.nonzero(known >= 0)[0]
+        table_size = int(known[known_terms].max()) + 2 if len(known_terms) else 1
+        query = np.zeros(table_size)
+        query[known[known_terms]] = job_weights[known_terms]
+        rank = np.full(len(job_terms), -1, dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        position = np.full(table_size, -1, dtype=np.int64)
+        position[known[known_terms]] = rank[known_terms]
+
+        weights = frequencies * self._idf(self._document_frequency[indices])
+        dots = np.bincount(rows, weights=weights * np.take(query, indices, mode="clip"), minlength=len(vectors))
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(vectors)))
+        denominator = norms * job_norm
+        scores = np.divide(dots, denominator, out=np.zeros(len(vectors)), where=denominator > 0)
+
+        # Which of the top keywords each resume contains, as one boolean matrix
+        keyword_positions = np.take(position, indices, mode="clip")
+        hit = keyword_positions >= 0
+        contains = np.zeros((len(vectors), len(keywords)), dtype=bool)
+        contains[rows[hit], keyword_positions[hit]] = True
+
+        # Plain lists from here on; per-element NumPy access is slower than the math above
+        ranking = np.argsort(-scores, kind="stable")
+        rounded = np.round(scores, 4).tolist()
+        results = []
+        for row, present in zip(ranking.tolist(), contains[ranking].tolist()):
+            results.append({
+                "resume_id": resume_ids[row],
+                "score": rounded[row],
+                "matched": [keyword for keyword, flag in zip(keywords, present) if flag],
+                "missing": [keyword for keyword, flag in zip(keywords, present) if not flag],
+            })
+        return {"keywords": keywords, "results": results}
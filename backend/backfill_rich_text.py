@@ -0,0 +1,118 @@
+"""Normalize the rich text of resumes stored before it was done on write.
+
+    python backfill_rich_text.py --batch-size 200 --pause 0.1
+
+Walks the ``resumes`` collection in ``id`` order, one page of
+``--batch-size`` documents at a time, and rewrites the rich-text fields
+through the API's models: HTML is normalized and the derived fields
+(``description_text``, ``technologies_list``, ...) are filled in. Each page
+is written with one ``bulk_write`` of the documents that changed, guarded
+by their ``version`` so a concurrent edit is never overwritten (it was
+normalized by the API anyway); ``--pause`` spaces pages out to bound the
+load on a live database.
+
+Like any write, each update increments ``version`` and sets
+``updated_at``, so delta syncs, the search index refresh and the ATS
+vectors pick the change up, and an editor still open on the old version
+gets a 412 and reloads instead of writing it back. The rewritten resumes
+are invalidated in the resume cache through the API's own
+``invalidate_cached_resumes``: with ``RESUME_CACHE_REDIS_URL`` set that
+reaches every worker; per-process caches serve the old document until
+``RESUME_CACHE_TTL_SECONDS`` expires it.
+
+Safe to re-run: documents that are already normalized are not written.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+PROJECTION = {"_id": 0, "id": 1, "version": 1, "personal_info": 1, "experience": 1, "projects": 1}
+
+
+def normalized_fields(resume: Dict[str, Any], models: Dict[str, Type[BaseModel]]) -> Dict[str, Any]:
+    """``$set`` of the fields of a stored resume that change when validated by ``models`` (field -> model)."""
+    changes = {}
+    for field, model in models.items():
+        value = resume.get(field)
+        if value is None:
+            continue
+        if isinstance(value, list):
+            normalized = [model.model_validate(item).model_dump() for item in value]
+        else:
+            normalized = model.model_validate(value).model_dump()
+        if normalized != value:
+            changes[field] = normalized
+    return changes
+
+
+async def backfill(collection, models: Dict[str, Type[BaseModel]], batch_size: int = 200,
+                   pause: float = 0.0, dry_run: bool = False,
+                   invalidate: Optional[Callable[..., Awaitable[None]]] = None) -> Dict[str, int]:
+    stats = {"scanned": 0, "updated": 0, "invalid": 0}
+    last_id: Optional[str] = None
+    while True:
+        query = {"id": {"$gt": last_id}} if last_id is not None else {}
+        page = await collection.find(query, PROJECTION).sort("id", 1).limit(batch_size).to_list(batch_size)
+        if not page:
+            return stats
+        last_id = page[-1]["id"]
+        stats["scanned"] += len(page)
+
+        updates, written = [], []
+        for resume in page:
+            try:
+                changes = normalized_fields(resume, models)
+            except ValidationError as e:
+                # e.g. a description over the size limit; left for its owner to shorten
+                stats["invalid"] += 1
+                logger.warning("Skipping resume %s: %s", resume["id"], e.errors()[0]["msg"])
+                continue
+            if changes:
+                updates.append(UpdateOne({"id": resume["id"], "version": resume.get("version")},
+                                         {"$set": {**changes, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}))
+                written.append(resume["id"])
+        if updates and dry_run:
+            stats["updated"] += len(updates)
+        elif updates:
+            result = await collection.bulk_write(updates, ordered=False)
+            stats["updated"] += result.modified_count
+            if invalidate is not None:
+                await invalidate(*written)
+        logger.info("Backfill at %s: %s", last_id, stats)
+        if pause:
+            await asyncio.sleep(pause)
+
+
+async def _main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Normalize rich text of stored resumes")
+    parser.add_argument("--batch-size", type=int, default=200, help="documents read and written per page")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to wait between pages")
+    parser.add_argument("--dry-run", action="store_true", help="count the documents that would change")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    # The API module loads .env and owns the models the documents are validated with
+    import server
+
+    models: Dict[str, Type[BaseModel]] = {
+        "personal_info": server.PersonalInfo, "experience": server.Experience, "projects": server.Project,
+    }
+    try:
+        stats = await backfill(server.db.resumes, models, args.batch_size, args.pause, args.dry_run,
+                               invalidate=server.invalidate_cached_resumes)
+    finally:
+        server.client.close()
+    print(f"{'Would update' if args.dry_run else 'Updated'} {stats['updated']} of {stats['scanned']} resumes"
+          f" ({stats['invalid']} skipped as invalid)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(_main()))
@@ -0,0 +1,164 @@
+"""MongoDB index bootstrap and query-plan guard.
+
+``ensure_indexes`` runs on startup and is idempotent: ``create_index`` is a
+no-op when an identical index already exists.
+
+``check_query_plans`` explains every query shape the API issues and reports
+the ones MongoDB would answer with a collection scan. Run it against a real
+database with ``python db_indexes.py`` (exits non-zero on a COLLSCAN) or set
+``MONGO_QUERY_PLAN_GUARD=1`` to refuse to start when a shape is unindexed.
+New queries should add their shape to ``QUERY_SHAPES``.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Deleted resumes stay behind as tombstones for delta sync this long
+TOMBSTONE_RETENTION_SECONDS = int(os.environ.get('TOMBSTONE_RETENTION_DAYS', '30')) * 86400
+
+INDEXES: Dict[str, List[Dict[str, Any]]] = {
+    "users": [
+        {"keys": [("email", ASCENDING)], "name": "email_unique", "unique": True},
+        {"keys": [("id", ASCENDING)], "name": "id_unique", "unique": True},
+    ],
+    "resumes": [
+        {"keys": [("id", ASCENDING)], "name": "id_unique", "unique": True},
+        {"keys": [("user_id", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)],
+         "name": "user_updated_at"},
+        {"keys": [("updated_at", ASCENDING)], "name": "updated_at"},
+        {"keys": [("deleted_at", ASCENDING)], "name": "deleted_at_ttl",
+         "expireAfterSeconds": TOMBSTONE_RETENTION_SECONDS},
+    ],
+    "resume_revisions": [
+        {"keys": [("resume_id", ASCENDING), ("revision", DESCENDING)], "name": "resume_revision_unique",
+         "unique": True},
+    ],
+    "jobs": [
+        {"keys": [("id", ASCENDING)], "name": "id_unique", "unique": True},
+        {"keys": [("user_id", ASCENDING), ("status", ASCENDING)], "name": "user_status"},
+        {"keys": [("status", ASCENDING), ("created_at", ASCENDING)], "name": "status_created_at"},
+        # Set when a job finishes; the result is removed once it has been kept for the job TTL
+        {"keys": [("expires_at", ASCENDING)], "name": "expires_at_ttl", "expireAfterSeconds": 0},
+    ],
+}
+
+_SAMPLE_TIME = datetime(2025, 1, 1)
+
+# Representative filters/sorts for every query the API issues. Writes by id
+# (replace/update/delete) plan exactly like the equivalent find.
+QUERY_SHAPES: List[Dict[str, Any]] = [
+    {"name": "users by email", "collection": "users", "filter": {"email": "user@example.com"}},
+    {"name": "resume by id", "collection": "resumes",
+     "filter": {"id": "resume-id", "user_id": "user-id", "deleted_at": None}},
+    {"name": "resume by id and version", "collection": "resumes",
+     "filter": {"id": "resume-id", "user_id": "user-id", "deleted_at": None, "version": {"$in": [1]}}},
+    {"name": "resume listing", "collection": "resumes", "filter": {"user_id": "user-id", "deleted_at": None},
+     "sort": [("updated_at", -1), ("id", -1)]},
+    {"name": "resume listing after cursor", "collection": "resumes",
+     "filter": {"user_id": "user-id", "deleted_at": None,
+                "$or": [{"updated_at": {"$lt": _SAMPLE_TIME}},
+                        {"updated_at": _SAMPLE_TIME, "id": {"$lt": "resume-id"}}]},
+     "sort": [("updated_at", -1), ("id", -1)]},
+    {"name": "resume sync after cursor", "collection": "resumes",
+     "filter": {"user_id": "user-id",
+                "$or": [{"updated_at": {"$gt": _SAMPLE_TIME}},
+                        {"updated_at": _SAMPLE_TIME, "id": {"$gt": "resume-id"}}]},
+     "sort": [("updated_at", 1), ("id", 1)]},
+    {"name": "resume export", "collection": "resumes", "filter": {"user_id": "user-id", "deleted_at": None}},
+    {"name": "resumes by ids", "collection": "resumes",
+     "filter": {"id": {"$in": ["resume-id"]}, "user_id": "user-id", "deleted_at": None}},
+    {"name": "search index refresh", "collection": "resumes",
+     "filter": {"updated_at": {"$gte": _SAMPLE_TIME}}},
+    {"name": "rich-text backfill page", "collection": "resumes", "filter": {"id": {"$gt": "resume-id"}},
+     "sort": [("id", 1)]},
+    {"name": "revisions of resumes", "collection": "resume_revisions", "filter": {"resume_id": {"$in": ["resume-id"]}}},
+    {"name": "revision history", "collection": "resume_revisions",
+     "filter": {"resume_id": "resume-id", "revision": {"$lt": 10}}, "sort": [("revision", -1)]},
+    {"name": "revision snapshot lookup", "collection": "resume_revisions",
+     "filter": {"resume_id": "resume-id", "kind": "snapshot", "revision": {"$lte": 10}},
+     "sort": [("revision", -1)]},
+    {"name": "revision diffs to replay", "collection": "resume_revisions",
+     "filter": {"resume_id": "resume-id", "revision": {"$gt": 1, "$lte": 10}}, "sort": [("revision", 1)]},
+    {"name": "job by id", "collection": "jobs", "filter": {"id": "job-id", "user_id": "user-id"}},
+    {"name": "active jobs per user", "collection": "jobs",
+     "filter": {"user_id": "user-id", "status": {"$in": ["queued", "running"]}}},
+    {"name": "queued jobs at startup", "collection": "jobs", "filter": {"status": "queued"},
+     "sort": [("created_at", 1)]},
+    {"name": "expired job leases", "collection": "jobs",
+     "filter": {"status": "running", "$or": [{"lease_until": {"$lt": _SAMPLE_TIME}}, {"lease_until": None}]}},
+    {"name": "stale queued jobs", "collection": "jobs",
+     "filter": {"status": "queued", "updated_at": {"$lt": _SAMPLE_TIME}}, "sort": [("created_at", 1)]},
+]
+
+
+async def ensure_indexes(db) -> None:
+    for collection, specs in INDEXES.items():
+        for spec in specs:
+            options = {key: value for key, value in spec.items() if key != "keys"}
+            try:
+                await db[collection].create_index(spec["keys"], **options)
+            except OperationFailure as e:
+                # e.g. existing duplicate emails blocking a unique index; the
+                # API keeps working, so log loudly rather than refuse to start
+                logger.error("Could not create index %s.%s: %s", collection, spec["name"], e)
+
+
+def _stages(plan: Any):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+async def explain_shape(db, shape: Dict[str, Any]) -> List[str]:
+    command: Dict[str, Any] = {"find": shape["collection"], "filter": shape["filter"]}
+    if shape.get("sort"):
+        command["sort"] = dict(shape["sort"])
+    result = await db.command("explain", command, verbosity="queryPlanner")
+    return list(_stages(result["queryPlanner"]["winningPlan"]))
+
+
+async def check_query_plans(db, shapes: Optional[List[Dict[str, Any]]] = None) -> List[str]:
+    """Return a description of every query shape whose winning plan is a COLLSCAN."""
+    failures = []
+    for shape in shapes or QUERY_SHAPES:
+        stages = await explain_shape(db, shape)
+        if "COLLSCAN" in stages:
+            failures.append(f"{shape['name']} ({shape['collection']}): {' <- '.join(stages)}")
+    return failures
+
+
+async def _main() -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        await ensure_indexes(db)
+        failures = await check_query_plans(db)
+    finally:
+        client.close()
+
+    for failure in failures:
+        print(f"❌ COLLSCAN: {failure}")
+    if not failures:
+        print(f"✅ All {len(QUERY_SHAPES)} query shapes use an index")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(_main()))
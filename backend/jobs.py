@@ -0,0 +1,328 @@
+"""Background jobs for expensive resume operations.
+
+``JobQueue.submit`` persists a job in the ``jobs`` collection and returns
+immediately; a dispatcher task on the event loop hands queued jobs to a
+bounded process pool, so CPU-heavy handlers (PDF rendering, ...) never
+compete with request handling for the GIL. Dispatch is round-robin across
+users and capped by ``per_user_limit`` running jobs per user; users with
+``max_active_per_user`` queued or running jobs get ``QueueFull``.
+``run_for`` runs a handler inline for a request, counted against the same
+``per_user_limit``: a user already at the limit gets ``QueueFull`` instead
+of another render in the pool.
+
+Handlers are module-level functions registered by name. They receive the
+job's ``params`` (as persisted) and return a dict, which becomes the job
+result; a result with ``content`` bytes is served as a file download. A
+handler can come with a ``warm_up`` function that ``JobQueue.warm_up``
+runs in the pool at startup, so the first job does not pay for starting
+a worker and importing its dependencies.
+Finished jobs carry ``expires_at`` and a TTL index removes them once the
+result has been kept for ``result_ttl``.
+
+Jobs are claimed with an atomic ``queued -> running`` update, so a job
+cancelled (or claimed by another worker process) in the meantime is never
+run twice. Cancelling a running job lets the handler finish but discards
+its result. Jobs still running at shutdown go back to ``queued`` and are
+picked up again on the next start.
+
+A claim holds a ``lease`` (``lease_owner``/``lease_until``) that the
+claiming process renews while the job runs. Every process sweeps the
+collection each third of a lease: running jobs whose lease has lapsed (their
+process died) go back to ``queued``, and queued jobs that have waited longer
+than a lease are adopted into the local dispatch queue, so jobs queued only
+in the memory of a dead process still run. A job finishing after losing its
+lease does not overwrite the result of the process that re-ran it.
+"""
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATES = ("queued", "running")
+
+
+def _start_worker() -> None:
+    pass
+
+
+class QueueFull(Exception):
+    """Raised when a user already has the maximum number of active or running jobs; callers should answer 429."""
+
+
+class JobQueue:
+    def __init__(self, collection: Callable[[], Any], workers: int = 2, per_user_limit: int = 1,
+                 max_active_per_user: int = 20, result_ttl: timedelta = timedelta(hours=1),
+                 executor: str = "process", lease: timedelta = timedelta(seconds=60)):
+        # Resolved on every use so the database handle can be swapped (tests, benchmarks)
+        self._collection = collection
+        self.workers = workers
+        self.per_user_limit = per_user_limit
+        self.max_active_per_user = max_active_per_user
+        self.result_ttl = result_ttl
+        self.executor_kind = executor
+        self.lease = lease
+        self._owner = uuid.uuid4().hex
+        self._executor: Optional[Executor] = None
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+        self._warm_ups: List[Callable[[], None]] = []
+        # user id -> job ids waiting in this process, in submission order
+        self._queued: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        self._running: Dict[str, int] = defaultdict(int)
+        self._running_jobs: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._wake = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="jobs")
+        return self._executor
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 warm_up: Optional[Callable[[], None]] = None) -> None:
+        self._handlers[kind] = handler
+        if warm_up is not None and warm_up not in self._warm_ups:
+            self._warm_ups.append(warm_up)
+
+    async def warm_up(self) -> None:
+        """Start the pool's workers and run the handlers' warm-up functions in them."""
+        loop = asyncio.get_running_loop()
+        for warm_up in self._warm_ups or [_start_worker]:
+            # One call per worker; the pool starts a process for each call it cannot give an idle one
+            await asyncio.gather(*(loop.run_in_executor(self.executor, warm_up) for _ in range(self.workers)))
+
+    async def run(self, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a handler in the pool and wait for it, without persisting a job."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._handlers[kind], params)
+
+    async def run_for(self, user_id: str, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """``run`` on behalf of ``user_id``, holding one of the user's ``per_user_limit`` running slots."""
+        if self._running.get(user_id, 0) >= self.per_user_limit:
+            raise QueueFull(f"At most {self.per_user_limit} running jobs per user")
+        self._running[user_id] += 1
+        try:
+            return await self.run(kind, params)
+        finally:
+            self._release(user_id)
+
+    async def submit(self, user_id: str, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        active = await self._collection().count_documents(
+            {"user_id": user_id, "status": {"$in": list(ACTIVE_STATES)}})
+        if active >= self.max_active_per_user:
+            raise QueueFull(f"At most {self.max_active_per_user} active jobs per user")
+        now = datetime.utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "kind": kind,
+            "status": "queued",
+            "params": params,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self._collection().insert_one(dict(job))
+        self._enqueue(user_id, job["id"])
+        return job
+
+    def _enqueue(self, user_id: str, job_id: str) -> None:
+        self._queued.setdefault(user_id, deque()).append(job_id)
+        self._wake.set()
+
+    async def get(self, job_id: str, user_id: str, with_result: bool = False) -> Optional[Dict[str, Any]]:
+        projection = {"_id": 0, "params": 0} if with_result else {"_id": 0, "params": 0, "result": 0}
+        return await self._collection().find_one({"id": job_id, "user_id": user_id}, projection)
+
+    async def cancel(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job, or flag a running one; returns the job as it now stands."""
+        now = datetime.utcnow()
+        projection = {"_id": 0, "params": 0, "result": 0}
+        job = await self._collection().find_one_and_update(
+            {"id": job_id, "user_id": user_id, "status": "queued"},
+            {"$set": {"status": "cancelled", "finished_at": now, "updated_at": now,
+                      "expires_at": now + self.result_ttl}},
+            projection=projection, return_document=ReturnDocument.AFTER,
+        )
+        if job is not None:
+            waiting = self._queued.get(user_id)
+            if waiting is not None and job_id in waiting:
+                waiting.remove(job_id)
+            return job
+        job = await self._collection().find_one_and_update(
+            {"id": job_id, "user_id": user_id, "status": "running"},
+            {"$set": {"cancel_requested": True, "updated_at": now}},
+            projection=projection, return_document=ReturnDocument.AFTER,
+        )
+        return job or await self.get(job_id, user_id)
+
+    def _next_job(self):
+        # Round-robin: take the first user with capacity, then move them to the back
+        for user_id, waiting in list(self._queued.items()):
+            if not waiting:
+                del self._queued[user_id]
+                continue
+            if self._running[user_id] >= self.per_user_limit:
+                continue
+            job_id = waiting.popleft()
+            self._queued.move_to_end(user_id)
+            return user_id, job_id
+        return None
+
+    async def _dispatch(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while len(self._running_jobs) < self.workers:
+                picked = self._next_job()
+                if picked is None:
+                    break
+                user_id, job_id = picked
+                self._running[user_id] += 1
+                self._running_jobs.add(job_id)
+                task = asyncio.get_running_loop().create_task(self._execute(user_id, job_id))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, user_id: str, job_id: str) -> None:
+        try:
+            now = datetime.utcnow()
+            job = await self._collection().find_one_and_update(
+                {"id": job_id, "status": "queued"},
+                {"$set": {"status": "running", "started_at": now, "updated_at": now,
+                          "lease_owner": self._owner, "lease_until": now + self.lease}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if job is None:
+                return  # cancelled, or claimed by another process
+            update: Dict[str, Any]
+            try:
+                result = await self.run(job["kind"], job["params"])
+                update = {"status": "succeeded", "result": result}
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Job %s (%s) failed", job_id, job["kind"])
+                update = {"status": "failed", "error": str(e) or type(e).__name__}
+            now = datetime.utcnow()
+            update.update(finished_at=now, updated_at=now, expires_at=now + self.result_ttl)
+            claimed = {"id": job_id, "status": "running", "lease_owner": self._owner}
+            finished = await self._collection().update_one(
+                {**claimed, "cancel_requested": {"$ne": True}}, {"$set": update})
+            if finished.matched_count == 0:
+                await self._collection().update_one(
+                    claimed,
+                    {"$set": {"status": "cancelled", "finished_at": now, "updated_at": now,
+                              "expires_at": now + self.result_ttl}})
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Could not run job %s", job_id)
+        finally:
+            self._running_jobs.discard(job_id)
+            self._release(user_id)
+
+    def _release(self, user_id: str) -> None:
+        self._running[user_id] -= 1
+        if not self._running[user_id]:
+            del self._running[user_id]
+        self._wake.set()
+
+    async def start(self) -> None:
+        """Queue jobs persisted by earlier runs and start dispatching."""
+        if self._dispatcher is not None:
+            return
+        async for job in self._collection().find(
+                {"status": "queued"}, {"_id": 0, "id": 1, "user_id": 1}).sort("created_at", 1):
+            self._enqueue(job["user_id"], job["id"])
+        self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+        self._sweeper = asyncio.get_running_loop().create_task(self._sweep_forever())
+
+    async def sweep(self) -> Dict[str, int]:
+        """Renew this process's leases, requeue expired ones and adopt stale queued jobs."""
+        now = datetime.utcnow()
+        jobs = self._collection()
+        if self._running_jobs:
+            await jobs.update_many(
+                {"id": {"$in": list(self._running_jobs)}, "status": "running", "lease_owner": self._owner},
+                {"$set": {"lease_until": now + self.lease}})
+        # Jobs claimed before leases existed have none and are treated as expired
+        expired = {"status": "running", "$or": [{"lease_until": {"$lt": now}}, {"lease_until": None}]}
+        reclaimed = 0
+        async for job in jobs.find(expired, {"_id": 0, "id": 1, "user_id": 1}):
+            result = await jobs.update_one(
+                {"id": job["id"], **expired},
+                {"$set": {"status": "queued", "updated_at": now},
+                 "$unset": {"started_at": "", "lease_owner": "", "lease_until": ""}})
+            if result.modified_count:
+                logger.warning("Job %s lost its lease; queued again", job["id"])
+                reclaimed += 1
+                self._enqueue(job["user_id"], job["id"])
+        local = {job_id for waiting in self._queued.values() for job_id in waiting}
+        adopted = 0
+        async for job in jobs.find({"status": "queued", "updated_at": {"$lt": now - self.lease}},
+                                   {"_id": 0, "id": 1, "user_id": 1}).sort("created_at", 1):
+            if job["id"] not in local:
+                adopted += 1
+                self._enqueue(job["user_id"], job["id"])
+        return {"reclaimed": reclaimed, "adopted": adopted}
+
+    async def _sweep_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job lease sweep failed")
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        interrupted = list(self._running_jobs)
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if interrupted:
+            # Put them back so the next start runs them again
+            await self._collection().update_many(
+                {"id": {"$in": interrupted}, "status": "running", "lease_owner": self._owner},
+                {"$set": {"status": "queued", "updated_at": datetime.utcnow()},
+                 "$unset": {"started_at": "", "lease_owner": "", "lease_until": ""}})
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "running": len(self._running_jobs),
+            "queued": sum(len(waiting) for waiting in self._queued.values()),
+        }
@@ -0,0 +1,133 @@
+"""Production entry point: several uvicorn workers serving ``server:create_app``.
+
+    python launcher.py --workers 4 --port 8001
+
+Each worker is a separate process with its own event loop, MongoDB pool
+(``MONGO_MAX_POOL_SIZE`` connections at most, so size it for
+workers x pool), caches and job pool. State that must not be split across
+workers is handled when ``--workers`` is above 1:
+
+* the write-behind buffer is turned off (``WRITE_BEHIND_ENABLED=0``): two
+  workers buffering the same resume would both acknowledge the next
+  version, defeating ``If-Match``, and reads would miss pending writes;
+* the resume cache needs ``RESUME_CACHE_REDIS_URL``; without it the local
+  cache is turned off, since it never sees other workers' invalidations;
+* rate-limit buckets are per process unless ``RATE_LIMIT_REDIS_URL`` is
+  set, so each client gets a budget per worker (a warning is logged);
+* set ``NOTIFY_BACKEND=change_stream`` so WebSocket change notifications
+  reach clients of every worker.
+
+Workers answer ``/api/ready`` with 503 until they have warmed up, so a
+load balancer only routes to warm workers.
+
+On SIGTERM a worker first drains: for ``--drain-seconds`` it keeps serving
+but answers ``/api/ready`` with 503, so the load balancer takes it out of
+rotation while it can still answer (a second signal skips the wait). Then
+uvicorn stops accepting connections and gives in-flight requests
+``--graceful-timeout`` seconds to finish. After that the app's
+shutdown handlers flush buffered autosaves and put running jobs back in
+the queue.
+"""
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, MutableMapping, Tuple
+
+import uvicorn
+from dotenv import load_dotenv
+from uvicorn.supervisors import Multiprocess
+
+APP = "server:create_app"
+
+
+logger = logging.getLogger(__name__)
+
+
+def multi_worker_settings(environ: MutableMapping[str, str]) -> Tuple[Dict[str, str], List[str]]:
+    """Environment overrides for running several workers, and warnings about what stays per process."""
+    overrides: Dict[str, str] = {}
+    warnings: List[str] = []
+    if environ.get("WRITE_BEHIND_ENABLED", "1") != "0":
+        overrides["WRITE_BEHIND_ENABLED"] = "0"
+        warnings.append("write-behind buffering is per process; disabled for multiple workers")
+    if environ.get("RESUME_CACHE_ENABLED", "1") == "1" and not environ.get("RESUME_CACHE_REDIS_URL"):
+        overrides["RESUME_CACHE_ENABLED"] = "0"
+        warnings.append("the local resume cache misses other workers' invalidations; disabled for multiple "
+                        "workers (set RESUME_CACHE_REDIS_URL to share one)")
+    if environ.get("RATE_LIMIT_ENABLED", "1") == "1" and not environ.get("RATE_LIMIT_REDIS_URL"):
+        warnings.append("rate-limit buckets are per worker without RATE_LIMIT_REDIS_URL")
+    if environ.get("NOTIFY_BACKEND", "local") != "change_stream":
+        warnings.append("change notifications only reach clients of the same worker without "
+                        "NOTIFY_BACKEND=change_stream")
+    return overrides, warnings
+
+
+class DrainingServer(uvicorn.Server):
+    def __init__(self, config: uvicorn.Config, drain_seconds: float):
+        super().__init__(config)
+        self.drain_seconds = drain_seconds
+        self.draining = False
+
+    def handle_exit(self, sig, frame) -> None:
+        if self.draining or self.should_exit or self.drain_seconds <= 0:
+            super().handle_exit(sig, frame)
+            return
+        self.draining = True
+        # Already imported by this worker when it loaded the app
+        importlib.import_module(APP.partition(":")[0]).begin_drain()
+        asyncio.get_event_loop().call_later(self.drain_seconds, super().handle_exit, sig, frame)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run the Resume Creator API")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                        help="worker processes (default: WEB_CONCURRENCY, else one per CPU)")
+    parser.add_argument("--graceful-timeout", type=float,
+                        default=float(os.environ.get("GRACEFUL_TIMEOUT_SECONDS", "30")),
+                        help="seconds in-flight requests get to finish on shutdown")
+    parser.add_argument("--drain-seconds", type=float, default=float(os.environ.get("DRAIN_SECONDS", "5")),
+                        help="seconds a worker reports not ready before it stops listening on SIGTERM")
+    parser.add_argument("--log-level", default=os.environ.get("LOG_LEVEL", "info"))
+    parser.add_argument("--proxy-headers", action="store_true",
+                        help="trust X-Forwarded-* from the proxy in front of the workers")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s:     %(message)s")
+
+    if args.workers > 1:
+        # Settings from .env count too; the overrides win over it because load_dotenv does not override
+        load_dotenv(Path(__file__).parent / ".env")
+        # Inherited by the worker processes, which read these when importing server
+        overrides, warnings = multi_worker_settings(os.environ)
+        os.environ.update(overrides)
+        for warning in warnings:
+            logger.warning("%d workers: %s", args.workers, warning)
+
+    # What uvicorn.run does, with a server that drains before it exits
+    sys.path.insert(0, str(Path(__file__).parent))
+    config = uvicorn.Config(
+        APP,
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+        proxy_headers=args.proxy_headers,
+    )
+    server = DrainingServer(config, args.drain_seconds)
+    if config.workers > 1:
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+        if not server.started:
+            sys.exit(3)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""In-process metrics with Prometheus text exposition.
+
+Covers three sources of latency:
+
+* ``MetricsMiddleware``: per-route request latency, in-flight requests,
+  response sizes, plus an optional slow-request log;
+* ``MongoCommandListener``: per-collection/per-command MongoDB latency and
+  returned/affected document counts (registered on the Motor client);
+* ``observe_password_hash``: bcrypt run and queue-wait time.
+
+Instruments are thread-safe because pymongo calls listeners from its own
+I/O threads. ``registry.render()`` produces the ``/api/metrics`` body.
+"""
+import bisect
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 500, 1000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.label_names, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.label_names, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # label values -> (per-bucket counts incl. +Inf, sum)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(labels, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), t[0])) for k, (c, t) in self._values.items())
+        lines = self.header()
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Run ``collector`` before each scrape, e.g. to copy cache counters into gauges."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")))
+http_response_bytes = registry.register(Histogram(
+    "http_response_size_bytes", "HTTP response body size by route", ("method", "route"), SIZE_BUCKETS))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"))
+http_slow_requests = registry.register(Counter(
+    "http_slow_requests_total", "Requests slower than the slow-request threshold", ("method", "route")))
+
+mongo_command_seconds = registry.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ("collection", "command", "outcome")))
+mongo_command_documents = registry.register(Histogram(
+    "mongo_command_documents", "Documents returned or affected per MongoDB command",
+    ("collection", "command"), COUNT_BUCKETS))
+
+password_hash_seconds = registry.register(Histogram(
+    "password_hash_duration_seconds", "bcrypt run time in the worker pool", ("operation",)))
+password_hash_wait_seconds = registry.register(Histogram(
+    "password_hash_queue_wait_seconds", "Time bcrypt calls waited for a pool worker", ("operation",)))
+
+
+def observe_password_hash(operation: str, run_seconds: float, wait_seconds: float) -> None:
+    password_hash_seconds.observe(run_seconds, operation)
+    password_hash_wait_seconds.observe(wait_seconds, operation)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware so streaming bodies are measured without buffering."""
+
+    def __init__(self, app, slow_request_seconds: Optional[float] = None):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+        self._route_paths: Dict[Callable, str] = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            # Label by route template, never the raw path, to keep cardinality bounded
+            for route in getattr(scope.get("app"), "routes", []):
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            self._route_paths[endpoint] = path = path or endpoint.__name__
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+        size = {"bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                size["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            method, route = scope["method"], self._route(scope)
+            http_request_seconds.observe(elapsed, method, route, str(status["code"]))
+            http_response_bytes.observe(size["bytes"], method, route)
+            if self.slow_request_seconds is not None and elapsed >= self.slow_request_seconds:
+                http_slow_requests.inc(method, route)
+                logger.warning("Slow request: %s %s -> %s in %.1f ms",
+                               method, scope.get("path"), status["code"], elapsed * 1000)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def __init__(self):
+        self._started: Dict[Tuple[int, int], Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            # getMore names the cursor id here; the collection is a separate field
+            collection = event.command.get("collection", event.database_name)
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (collection, event.command_name)
+
+    def _finish(self, event, outcome: str):
+        with self._lock:
+            collection, command = self._started.pop((event.connection_id, event.request_id),
+                                                    ("unknown", event.command_name))
+        mongo_command_seconds.observe(event.duration_micros / 1e6, collection, command, outcome)
+        return collection, command
+
+    def succeeded(self, event):
+        collection, command = self._finish(event, "success")
+        documents = _document_count(command, event.reply)
+        if documents is not None:
+            mongo_command_documents.observe(documents, collection, command)
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+def _document_count(command: str, reply) -> Optional[int]:
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if command == "findAndModify":
+        return 1 if reply.get("value") is not None else 0
+    if "n" in reply:
+        return int(reply["n"])
+    return None
@@ -0,0 +1,124 @@
+"""Streaming NDJSON encoding and decoding for bulk resume export/import.
+
+Both directions work on bounded chunks so memory stays flat no matter how
+large the dump is: ``encode_ndjson`` serializes one cursor batch at a time
+(optionally through a streaming gzip compressor), and ``read_ndjson``
+splits an uploaded byte stream into lines as it arrives, inflating gzip
+input (including multi-member files, as ``cat a.gz b.gz`` or pigz make)
+with a capped output size so a small upload cannot expand into an
+unbounded buffer.
+"""
+import zlib
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Optional, Tuple
+
+import orjson
+
+GZIP_MAGIC = b"\x1f\x8b"
+# Inflated bytes produced per decompress call
+_INFLATE_CHUNK = 256 * 1024
+
+
+async def encode_ndjson(documents: AsyncIterable[Dict[str, Any]], batch_size: int,
+                        compress: bool = False) -> AsyncIterator[bytes]:
+    """NDJSON (optionally gzip) chunks of roughly ``batch_size`` documents each."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    lines = []
+    async for document in documents:
+        lines.append(orjson.dumps(document))
+        if len(lines) >= batch_size:
+            chunk = b"\n".join(lines) + b"\n"
+            lines.clear()
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b"\n".join(lines) + b"\n" if lines else b""
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+async def _inflate(chunks: AsyncIterator[bytes], first: bytes) -> AsyncIterator[bytes]:
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    pending = first
+    while True:
+        if not pending:
+            try:
+                pending = await chunks.__anext__()
+            except StopAsyncIteration:
+                break
+        if decompressor.eof:
+            # Bytes after a member start the next one: concatenated members inflate to the joined text
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        data = decompressor.decompress(pending, _INFLATE_CHUNK)
+        # At the end of a member zlib leaves the rest in unconsumed_tail as well as in unused_data
+        while decompressor.unconsumed_tail and not decompressor.eof:
+            yield data
+            data = decompressor.decompress(decompressor.unconsumed_tail, _INFLATE_CHUNK)
+        yield data
+        pending = decompressor.unused_data
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+async def read_ndjson(stream: AsyncIterable[bytes], max_line_bytes: int
+                      ) -> AsyncIterator[Tuple[int, Optional[Any], Optional[str]]]:
+    """``(line number, parsed value, error)`` for every non-blank line of ``stream``.
+
+    Gzip input is detected by its magic bytes. Lines longer than
+    ``max_line_bytes`` are reported as errors and skipped without being
+    buffered.
+    """
+    chunks = stream.__aiter__()
+    first = b""
+    try:
+        while len(first) < len(GZIP_MAGIC):
+            first += await chunks.__anext__()
+    except StopAsyncIteration:
+        pass
+    body = _inflate(chunks, first) if first.startswith(GZIP_MAGIC) else _prepend(first, chunks)
+
+    line_number = 0
+    buffer = bytearray()
+    oversized = False
+    async for chunk in body:
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line_number += 1
+            if oversized or end - start > max_line_bytes:
+                oversized = False
+                yield line_number, None, f"Line exceeds {max_line_bytes} bytes"
+            else:
+                line = bytes(buffer[start:end]).strip()
+                if line:
+                    yield (line_number, *_parse(line))
+            start = end + 1
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            # Drop the partial line; the rest of it is skipped up to its newline
+            oversized = True
+            buffer.clear()
+
+    line = bytes(buffer).strip()
+    if oversized:
+        yield line_number + 1, None, f"Line exceeds {max_line_bytes} bytes"
+    elif line:
+        yield (line_number + 1, *_parse(line))
+
+
+async def _prepend(first: bytes, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    yield first
+    async for chunk in chunks:
+        yield chunk
+
+
+def _parse(line: bytes) -> Tuple[Optional[Any], Optional[str]]:
+    try:
+        return orjson.loads(line), None
+    except orjson.JSONDecodeError as e:
+        return None, f"Invalid JSON: {e}"
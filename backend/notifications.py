@@ -0,0 +1,275 @@
+"""Push notifications of resume changes to WebSocket subscribers.
+
+Writes publish a compact event per resume: ``{"type": "created" |
+"updated" | "deleted", "id", "version", "fields"}``, where ``fields`` are
+the top-level resume fields that changed. ``NotificationHub`` fans each
+event out to the connections of the resume's owner; the JSON is encoded
+once per event, not once per connection.
+
+Every ``Subscription`` queues at most ``max_queue`` messages. Nothing is
+allocated for an idle connection beyond the subscription itself: the
+queue and the task that sends it exist only while messages are waiting.
+When a client reads too slowly and its queue fills, the queued events are
+dropped and a single ``{"type": "resync"}`` is sent instead, telling the
+client to refetch its resumes; a send that does not complete within
+``send_timeout`` closes the connection. So one stalled client costs a
+bounded amount of memory and never delays the others.
+
+Events reach the hub through a backend:
+
+* ``LocalBackend``: the API publishes after each write commits (for
+  write-behind autosaves, when the buffer flushes them) and the hub
+  delivers in the same process. With several workers, a client only hears
+  about writes handled by the worker it is connected to.
+* ``ChangeStreamBackend``: every worker watches the ``resumes`` collection
+  with a MongoDB change stream (replica sets only) and delivers what it
+  sees, so writes from any worker reach every client, including autosaves
+  when the write-behind buffer flushes them. API-side publishes are no-ops.
+"""
+import asyncio
+import logging
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, FrozenSet, List, Optional, Set
+
+import orjson
+from pymongo.errors import PyMongoError
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+notification_events = metrics.registry.register(metrics.Counter(
+    "notification_events_total", "Resume change events published, by type", ("type",)))
+notification_resyncs = metrics.registry.register(metrics.Counter(
+    "notification_resyncs_total", "Subscriber queues dropped because the client read too slowly"))
+notification_subscribers = metrics.registry.register(metrics.Gauge(
+    "notification_subscribers", "Open resume change subscriptions"))
+
+RESYNC = orjson.dumps({"type": "resync"}).decode()
+# Fields every write touches, left out of the changed fields of an event
+_BOOKKEEPING = frozenset(("updated_at", "version", "deleted_at"))
+
+
+class TooManySubscriptions(Exception):
+    pass
+
+
+def change_event(kind: str, resume_id: str, version: Optional[int] = None,
+                 fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    event: Dict[str, Any] = {"type": kind, "id": resume_id}
+    if version is not None:
+        event["version"] = version
+    if fields is not None:
+        event["fields"] = sorted({field.split(".")[0] for field in fields} - _BOOKKEEPING)
+    return event
+
+
+class Subscription:
+    __slots__ = ("user_id", "resume_ids", "_send", "_close", "_hub", "_queue", "_sender", "_overflowed", "closed")
+
+    def __init__(self, hub: "NotificationHub", user_id: str, send: Callable[[str], Awaitable[None]],
+                 close: Callable[[], Awaitable[None]]):
+        self.user_id = user_id
+        # None: every resume of the user
+        self.resume_ids: Optional[FrozenSet[str]] = None
+        self._send = send
+        self._close = close
+        self._hub = hub
+        self._queue: Optional[Deque[str]] = None
+        self._sender: Optional[asyncio.Future] = None
+        self._overflowed = False
+        self.closed = False
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue) if self._queue is not None else 0
+
+    def push(self, message: str) -> None:
+        """Queue ``message`` without waiting; never blocks the publisher."""
+        if self.closed:
+            return
+        if self._queue is None:
+            self._queue = deque()
+        if len(self._queue) >= self._hub.max_queue:
+            # Events have been lost either way; one resync tells the client to catch up
+            self._queue.clear()
+            if not self._overflowed:
+                self._overflowed = True
+                self._hub.resyncs += 1
+                notification_resyncs.inc()
+        else:
+            self._queue.append(message)
+        if self._sender is None:
+            self._sender = asyncio.ensure_future(self._drain())
+
+    async def _drain(self) -> None:
+        try:
+            while not self.closed and (self._overflowed or self._queue):
+                if self._overflowed:
+                    self._overflowed = False
+                    message = RESYNC
+                else:
+                    message = self._queue.popleft()
+                await asyncio.wait_for(self._send(message), self._hub.send_timeout)
+        except Exception as e:
+            # Timed out or the connection is gone; closing it ends the endpoint, which unsubscribes
+            logger.info("Closing change subscription of user %s: %r", self.user_id, e)
+            self.closed = True
+            try:
+                await self._close()
+            except Exception:
+                pass
+        finally:
+            self._sender = None
+            self._queue = None
+
+
+class LocalBackend:
+    def __init__(self):
+        self._deliver: Optional[Callable[[str, Dict[str, Any]], None]] = None
+
+    def start(self, deliver: Callable[[str, Dict[str, Any]], None]) -> None:
+        self._deliver = deliver
+
+    async def publish(self, user_id: str, event: Dict[str, Any]) -> None:
+        if self._deliver is not None:
+            self._deliver(user_id, event)
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+
+# Keeps change events small: ids, owner and version of the document, and the names of updated fields
+_CHANGE_PIPELINE = [
+    {"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}},
+    {"$project": {
+        "operationType": 1,
+        "fullDocument.id": 1,
+        "fullDocument.user_id": 1,
+        "fullDocument.version": 1,
+        "fullDocument.deleted_at": 1,
+        "fields": {"$map": {"input": {"$objectToArray": {"$ifNull": ["$updateDescription.updatedFields", {}]}},
+                            "in": "$$this.k"}},
+    }},
+]
+
+
+class ChangeStreamBackend:
+    def __init__(self, collection: Callable[[], Any], retry_seconds: float = 5.0):
+        self.collection = collection
+        self.retry_seconds = retry_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token: Any = None
+
+    def start(self, deliver: Callable[[str, Dict[str, Any]], None]) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._watch(deliver))
+
+    async def publish(self, user_id: str, event: Dict[str, Any]) -> None:
+        # The change stream reports the write to every worker, this one included
+        return None
+
+    @staticmethod
+    def to_event(change: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        document = change.get("fullDocument") or {}
+        if not document.get("id") or not document.get("user_id"):
+            # Updated and then removed before the lookup ran
+            return None
+        if change["operationType"] == "insert":
+            return change_event("created", document["id"], document.get("version"))
+        if document.get("deleted_at") is not None:
+            return change_event("deleted", document["id"], document.get("version"))
+        return change_event("updated", document["id"], document.get("version"), change.get("fields") or [])
+
+    async def _watch(self, deliver: Callable[[str, Dict[str, Any]], None]) -> None:
+        while True:
+            try:
+                async with self.collection().watch(_CHANGE_PIPELINE, full_document="updateLookup",
+                                                   resume_after=self._resume_token) as stream:
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        event = self.to_event(change)
+                        if event is not None:
+                            deliver(change["fullDocument"]["user_id"], event)
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError:
+                logger.exception("Resume change stream failed; reopening in %.0fs", self.retry_seconds)
+                await asyncio.sleep(self.retry_seconds)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+class NotificationHub:
+    def __init__(self, backend: Any, max_queue: int = 64, send_timeout: float = 10.0,
+                 max_per_user: int = 20):
+        self.backend = backend
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.max_per_user = max_per_user
+        self._subscriptions: Dict[str, Set[Subscription]] = defaultdict(set)
+        self.subscribers = 0
+        self.delivered = 0
+        self.resyncs = 0
+
+    def start(self) -> None:
+        self.backend.start(self.deliver)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    def subscribe(self, user_id: str, send: Callable[[str], Awaitable[None]],
+                  close: Callable[[], Awaitable[None]]) -> Subscription:
+        subscriptions = self._subscriptions[user_id]
+        if len(subscriptions) >= self.max_per_user:
+            raise TooManySubscriptions(user_id)
+        subscription = Subscription(self, user_id, send, close)
+        subscriptions.add(subscription)
+        self.subscribers += 1
+        notification_subscribers.set(self.subscribers)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.closed = True
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None and subscription in subscriptions:
+            subscriptions.discard(subscription)
+            self.subscribers -= 1
+            notification_subscribers.set(self.subscribers)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    async def publish(self, user_id: str, event: Dict[str, Any]) -> None:
+        notification_events.inc(event["type"])
+        try:
+            await self.backend.publish(user_id, event)
+        except Exception:
+            # The write has committed; a lost notification only delays other tabs until they refetch
+            logger.exception("Could not publish resume change")
+
+    def deliver(self, user_id: str, event: Dict[str, Any]) -> None:
+        subscriptions = self._subscriptions.get(user_id)
+        if not subscriptions:
+            return
+        message = orjson.dumps(event).decode()
+        for subscription in list(subscriptions):
+            if subscription.resume_ids is None or event["id"] in subscription.resume_ids:
+                subscription.push(message)
+                self.delivered += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "subscribers": self.subscribers,
+            "users": len(self._subscriptions),
+            "queued": sum(s.queued for subs in self._subscriptions.values() for s in subs),
+            "delivered": self.delivered,
+            "resyncs": self.resyncs,
+        }
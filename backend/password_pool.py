@@ -0,0 +1,108 @@
+"""Password hashing off the event loop.
+
+bcrypt is deliberately slow (hundreds of milliseconds per call), so running
+it inline in an async handler stalls every other request on the worker.
+``PasswordHasher`` runs it in a bounded thread or process pool instead and
+sheds load with ``PoolSaturated`` once too many calls are waiting.
+"""
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PoolSaturated(Exception):
+    """Raised when the hashing queue is full; callers should answer 503."""
+
+
+# Module-level so they can be pickled into a process pool
+def _timed(func: Callable, *args) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    return pwd_context.verify(password, password_hash)
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        workers: int = 4,
+        queue_limit: int = 64,
+        executor: str = "thread",
+        observer: Optional[Callable[[str, float, float], None]] = None,
+    ):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.executor_kind = executor
+        # Called with (operation, run_seconds, wait_seconds) after each call
+        self.observer = observer
+        self._executor: Executor = None
+        self._pending = 0
+        self._stats: Dict[str, Dict[str, float]] = {
+            op: {"count": 0, "rejected": 0, "run_seconds": 0.0, "wait_seconds": 0.0, "max_seconds": 0.0}
+            for op in ("hash", "verify")
+        }
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, op: str, func: Callable, *args):
+        # Counting on the event loop thread keeps admission decisions cheap and exact
+        if self._pending >= self.workers + self.queue_limit:
+            self._stats[op]["rejected"] += 1
+            raise PoolSaturated(f"Password {op} queue is full")
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, run_seconds = await loop.run_in_executor(self.executor, _timed, func, *args)
+        finally:
+            self._pending -= 1
+        total = time.perf_counter() - start
+        wait_seconds = max(0.0, total - run_seconds)
+        stats = self._stats[op]
+        stats["count"] += 1
+        stats["run_seconds"] += run_seconds
+        stats["wait_seconds"] += wait_seconds
+        stats["max_seconds"] = max(stats["max_seconds"], total)
+        if self.observer is not None:
+            self.observer(op, run_seconds, wait_seconds)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run("verify", _verify, password, password_hash)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "pending": self._pending,
+            "operations": {op: dict(values) for op, values in self._stats.items()},
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,226 @@
+"""Server-side vector PDF rendering for resumes.
+
+Resumes are laid out with reportlab's platypus engine so text stays
+selectable and files stay small, instead of the browser rasterising the
+preview into one large PNG. Rendered documents are cached under a hash of
+the resume content and template, so unchanged resumes are never re-rendered.
+
+reportlab is imported on first render rather than with this module: it
+adds about 0.1 s to every worker's boot, and in production rendering
+happens in the job pool's processes, not in the web workers.
+"""
+import hashlib
+import html
+import io
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from rich_text import stored_text
+
+
+# Fields that make up the rendered output. Ids, owners and timestamps are
+# deliberately excluded so identical content shares a cache entry.
+CONTENT_FIELDS = ("title", "personal_info", "experience", "education", "skills", "projects")
+
+# Rough translation of the per-template Tailwind classes used by the
+# frontend preview into PDF styling.
+TEMPLATE_STYLES: Dict[str, Dict[str, Any]] = {
+    "template1": {"font": "Times-Roman", "bold": "Times-Bold", "accent": "#1f2937", "align": "left"},
+    "template2": {"font": "Helvetica", "bold": "Helvetica-Bold", "accent": "#2563eb", "align": "left"},
+    "template3": {"font": "Helvetica", "bold": "Helvetica", "accent": "#374151", "align": "center"},
+    "template4": {"font": "Helvetica", "bold": "Helvetica-Bold", "accent": "#111827", "align": "left", "header_bg": "#111827"},
+    "template5": {"font": "Courier", "bold": "Courier-Bold", "accent": "#1f2937", "align": "left"},
+    "template6": {"font": "Helvetica", "bold": "Helvetica-Bold", "accent": "#4338ca", "align": "left", "header_bg": "#4f46e5"},
+    "template7": {"font": "Times-Roman", "bold": "Times-Bold", "accent": "#1d4ed8", "align": "left"},
+    "template8": {"font": "Helvetica", "bold": "Helvetica-Bold", "accent": "#374151", "align": "left"},
+    "template9": {"font": "Helvetica", "bold": "Helvetica-Bold", "accent": "#1f2937", "align": "left", "header_bg": "#f3f4f6"},
+    "template10": {"font": "Helvetica", "bold": "Helvetica-Bold", "accent": "#7e22ce", "align": "center"},
+}
+DEFAULT_TEMPLATE = "template1"
+
+
+def content_hash(resume: Dict[str, Any], template_id: Optional[str] = None) -> str:
+    """Stable hash of everything that influences the rendered PDF."""
+    payload = {field: resume.get(field) for field in CONTENT_FIELDS}
+    payload["template_id"] = template_id or resume.get("template_id") or DEFAULT_TEMPLATE
+    encoded = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _plain(item: Dict[str, Any], name: str) -> str:
+    """Text of a rich-text field as escaped lines that reportlab paragraphs accept."""
+    return "<br/>".join(html.escape(line) for line in stored_text(item, name).splitlines())
+
+
+def warm_up() -> None:
+    """Import reportlab ahead of the first render (e.g. in a job pool worker)."""
+    import reportlab.platypus
+
+
+def _styles(template_id: str) -> Dict[str, Any]:
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+    from reportlab.lib.styles import ParagraphStyle
+
+    spec = TEMPLATE_STYLES.get(template_id, TEMPLATE_STYLES[DEFAULT_TEMPLATE])
+    accent = colors.HexColor(spec["accent"])
+    header_text = colors.white if spec.get("header_bg") in ("#111827", "#4f46e5") else colors.black
+    alignment = TA_CENTER if spec["align"] == "center" else TA_LEFT
+    return {
+        "name": ParagraphStyle("name", fontName=spec["bold"], fontSize=22, leading=26,
+                               alignment=alignment, textColor=header_text),
+        "contact": ParagraphStyle("contact", fontName=spec["font"], fontSize=9, leading=12,
+                                  alignment=alignment, textColor=header_text),
+        "section": ParagraphStyle("section", fontName=spec["bold"], fontSize=13, leading=16,
+                                  textColor=accent, spaceBefore=10, spaceAfter=4),
+        "item": ParagraphStyle("item", fontName=spec["bold"], fontSize=10.5, leading=13),
+        "meta": ParagraphStyle("meta", fontName=spec["font"], fontSize=9, leading=11,
+                               textColor=colors.HexColor("#4b5563")),
+        "body": ParagraphStyle("body", fontName=spec["font"], fontSize=9.5, leading=12.5, spaceAfter=4),
+    }
+
+
+def _header(resume: Dict[str, Any], template_id: str, styles: Dict[str, Any]):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Paragraph, Table, TableStyle
+
+    info = resume.get("personal_info") or {}
+    contact = " | ".join(
+        html.escape(info[key]) for key in ("email", "phone", "location", "linkedin", "website") if info.get(key)
+    )
+    rows = [[Paragraph(html.escape(info.get("full_name") or resume.get("title") or "Resume"), styles["name"])]]
+    if contact:
+        rows.append([Paragraph(contact, styles["contact"])])
+    header = Table(rows, colWidths=[A4[0] - 36 * mm])
+    header_bg = TEMPLATE_STYLES.get(template_id, {}).get("header_bg")
+    table_style = [("LEFTPADDING", (0, 0), (-1, -1), 6), ("RIGHTPADDING", (0, 0), (-1, -1), 6)]
+    if header_bg:
+        table_style.append(("BACKGROUND", (0, 0), (-1, -1), colors.HexColor(header_bg)))
+    header.setStyle(TableStyle(table_style))
+    return header
+
+
+def render_resume_pdf(resume: Dict[str, Any], template_id: Optional[str] = None) -> bytes:
+    """Render a stored resume document to PDF bytes."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.platypus import HRFlowable, Paragraph, SimpleDocTemplate, Spacer
+
+    template_id = template_id or resume.get("template_id") or DEFAULT_TEMPLATE
+    styles = _styles(template_id)
+    accent = colors.HexColor(TEMPLATE_STYLES.get(template_id, TEMPLATE_STYLES[DEFAULT_TEMPLATE])["accent"])
+
+    story = [_header(resume, template_id, styles), Spacer(1, 4 * mm)]
+
+    def section(title: str):
+        story.append(Paragraph(title, styles["section"]))
+        story.append(HRFlowable(width="100%", thickness=0.6, color=accent, spaceAfter=4))
+
+    summary = _plain(resume.get("personal_info") or {}, "summary")
+    if summary:
+        section("Professional Summary")
+        story.append(Paragraph(summary, styles["body"]))
+
+    if resume.get("experience"):
+        section("Experience")
+        for exp in resume["experience"]:
+            story.append(Paragraph(
+                f"{html.escape(exp.get('title', ''))} &mdash; {html.escape(exp.get('company', ''))}", styles["item"]))
+            end_date = "Present" if exp.get("current") else exp.get("end_date", "")
+            meta = " | ".join(filter(None, [
+                " - ".join(filter(None, [exp.get("start_date", ""), end_date])), exp.get("location", "")]))
+            if meta:
+                story.append(Paragraph(html.escape(meta), styles["meta"]))
+            description = _plain(exp, "description")
+            if description:
+                story.append(Paragraph(description, styles["body"]))
+
+    if resume.get("education"):
+        section("Education")
+        for edu in resume["education"]:
+            story.append(Paragraph(html.escape(edu.get("degree", "")), styles["item"]))
+            meta = " | ".join(filter(None, [
+                edu.get("institution", ""), edu.get("location", ""), edu.get("graduation_date", ""),
+                f"GPA: {edu['gpa']}" if edu.get("gpa") else ""]))
+            if meta:
+                story.append(Paragraph(html.escape(meta), styles["meta"]))
+
+    if resume.get("skills"):
+        section("Skills")
+        story.append(Paragraph(html.escape(", ".join(resume["skills"])), styles["body"]))
+
+    if resume.get("projects"):
+        section("Projects")
+        for project in resume["projects"]:
+            story.append(Paragraph(html.escape(project.get("name", "")), styles["item"]))
+            meta = " | ".join(filter(None, [project.get("technologies", ""), project.get("link", "")]))
+            if meta:
+                story.append(Paragraph(html.escape(meta), styles["meta"]))
+            description = _plain(project, "description")
+            if description:
+                story.append(Paragraph(description, styles["body"]))
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4, leftMargin=18 * mm, rightMargin=18 * mm, topMargin=16 * mm, bottomMargin=16 * mm,
+        title=resume.get("title") or "Resume", author=(resume.get("personal_info") or {}).get("full_name", ""),
+    )
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def pdf_file_name(resume: Dict[str, Any]) -> str:
+    name = (resume.get("personal_info") or {}).get("full_name") or resume.get("title") or "Resume"
+    return ("".join(ch for ch in name if ch.isalnum() or ch in " -_").strip() or "Resume") + ".pdf"
+
+
+def render_pdf_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Background job handler; runs in a worker process, so it must stay module-level."""
+    resume = params["resume"]
+    return {
+        "content": render_resume_pdf(resume, params.get("template_id")),
+        "media_type": "application/pdf",
+        "file_name": pdf_file_name(resume),
+        "content_hash": content_hash(resume, params.get("template_id")),
+    }
+
+
+class PdfRenderCache:
+    """Bounded LRU of rendered PDFs keyed by content hash."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            pdf = self._entries.get(key)
+            if pdf is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return pdf
+
+    def put(self, key: str, pdf: bytes) -> None:
+        with self._lock:
+            self._entries[key] = pdf
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def render(self, resume: Dict[str, Any], template_id: Optional[str] = None) -> bytes:
+        key = content_hash(resume, template_id)
+        pdf = self.get(key)
+        if pdf is None:
+            pdf = render_resume_pdf(resume, template_id)
+            self.put(key, pdf)
+        return pdf
@@ -0,0 +1,215 @@
+"""Per-client request rate limiting with token buckets.
+
+Every request to the API is classified into a route group (``auth`` for
+login/registration, ``writes`` for other non-GET requests, ``reads``) and
+takes one token from the bucket of its client for that group's
+``Policy``. A bucket holds up to ``burst`` tokens and refills at ``rate``
+tokens per second; a request that finds it empty is answered with ``429``
+and a ``Retry-After`` of the time until the next token, before any
+handler (or bcrypt) runs.
+
+Clients are keyed by authenticated user where the policy allows it and
+the request carries a valid token, and by IP address otherwise, so one
+user's autosave storm or one address's login flood only drains its own
+buckets. Two bucket stores are provided:
+
+* ``LocalBuckets``: per process. A bucket that has refilled completely
+  is indistinguishable from a new one, so idle buckets are dropped once
+  they are full again; ``max_keys`` bounds memory under address churn.
+* ``SharedBuckets``: wraps a store with the async ``eval`` of
+  ``redis.asyncio.Redis`` and updates buckets with a server-side script,
+  so all workers share one budget per client.
+"""
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import orjson
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+rate_limited_requests = metrics.registry.register(metrics.Counter(
+    "rate_limited_requests_total", "Requests rejected with 429 by route group", ("group",)))
+rate_limit_evictions = metrics.registry.register(metrics.Counter(
+    "rate_limit_bucket_evictions_total", "Buckets dropped from the local store", ("reason",)))
+rate_limit_buckets = metrics.registry.register(metrics.Gauge(
+    "rate_limit_buckets", "Token buckets held in the local store"))
+
+READ_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+
+@dataclass(frozen=True)
+class Policy:
+    name: str
+    rate: float  # tokens per second
+    burst: int
+    # "user": per authenticated user, falling back to the IP; "ip": always per IP
+    key: str = "user"
+
+
+class LocalBuckets:
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> (tokens, updated at, full at), least recently used first
+        self._buckets: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _evict(self, now: float) -> None:
+        # Oldest-touched first; stops at the first bucket that is still refilling
+        while self._buckets:
+            key, (_, _, full_at) = next(iter(self._buckets.items()))
+            if full_at > now:
+                break
+            del self._buckets[key]
+            self.evictions += 1
+            rate_limit_evictions.inc("idle")
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+            rate_limit_evictions.inc("capacity")
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Take a token from ``key``'s bucket; returns 0, or the seconds until one is available."""
+        now = time.monotonic()
+        tokens, updated, _ = self._buckets.pop(key, (burst, now, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        self._evict(now)
+        rate_limit_buckets.set(len(self._buckets))
+        return wait
+
+
+# KEYS[1]: bucket; ARGV: rate, burst. Returns the wait in seconds, as a string
+# because Lua numbers are truncated to integers on the way out.
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class SharedBuckets:
+    def __init__(self, store: Any, prefix: str = "ratelimit:"):
+        self.store = store
+        self.prefix = prefix
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        # Keys expire once their bucket is full again, which bounds the store like LocalBuckets
+        return float(await self.store.eval(_TAKE_SCRIPT, 1, self.prefix + key, rate, burst))
+
+
+class RateLimiter:
+    def __init__(self, policies: Iterable[Policy], buckets: Any,
+                 auth_paths: Iterable[str] = ("/api/login", "/api/register"),
+                 identify: Callable[[Dict[str, Any]], Optional[str]] = lambda scope: None,
+                 trust_forwarded: bool = False, prefix: str = "/api"):
+        self.policies = {policy.name: policy for policy in policies}
+        self.buckets = buckets
+        self.auth_paths = frozenset(auth_paths)
+        # ASGI scope -> user id of a valid bearer token, or None
+        self.identify = identify
+        self.trust_forwarded = trust_forwarded
+        self.prefix = prefix
+        self.rejected = 0
+
+    def policy_for(self, method: str, path: str) -> Optional[Policy]:
+        if not path.startswith(self.prefix):
+            return None
+        if path in self.auth_paths:
+            group = "auth"
+        else:
+            group = "reads" if method in READ_METHODS else "writes"
+        return self.policies.get(group)
+
+    def client_ip(self, scope: Dict[str, Any]) -> str:
+        if self.trust_forwarded:
+            for name, value in scope.get("headers") or ():
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def check(self, scope: Dict[str, Any]) -> Tuple[Optional[Policy], float]:
+        """The policy applied to the request and the seconds it must wait (0 to proceed)."""
+        policy = self.policy_for(scope["method"], scope["path"])
+        if policy is None:
+            return None, 0.0
+        user_id = self.identify(scope) if policy.key == "user" else None
+        key = f"{policy.name}:user:{user_id}" if user_id else f"{policy.name}:ip:{self.client_ip(scope)}"
+        try:
+            wait = await self.buckets.take(key, policy.rate, policy.burst)
+        except Exception:
+            # A shared store being down lets traffic through rather than failing it
+            logger.exception("Rate limit store call failed")
+            return policy, 0.0
+        if wait > 0:
+            self.rejected += 1
+            rate_limited_requests.inc(policy.name)
+        return policy, wait
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "buckets": type(self.buckets).__name__,
+            "rejected": self.rejected,
+            "policies": {name: {"rate": policy.rate, "burst": policy.burst, "key": policy.key}
+                         for name, policy in self.policies.items()},
+        }
+        if isinstance(self.buckets, LocalBuckets):
+            stats.update(entries=len(self.buckets), max_keys=self.buckets.max_keys,
+                         evictions=self.buckets.evictions)
+        return stats
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware answering 429 before the request reaches routing."""
+
+    def __init__(self, app, limiter: Callable[[], Optional[RateLimiter]]):
+        self.app = app
+        # Resolved on every request so the limiter can be swapped or disabled (tests, benchmarks)
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.limiter() if scope["type"] == "http" else None
+        if limiter is not None:
+            _, wait = await limiter.check(scope)
+            if wait > 0:
+                body = orjson.dumps({"detail": "Too many requests"})
+                await send({
+                    "type": "http.response.start",
+                    "status": 429,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"retry-after", str(max(1, math.ceil(wait))).encode()),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": body})
+                return
+        await self.app(scope, receive, send)
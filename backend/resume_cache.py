@@ -0,0 +1,204 @@
+"""Read-through cache of stored resume documents.
+
+``ResumeCache.get`` serves a resume from the cache or loads it from MongoDB
+and fills the cache. Callers invalidate a resume after every write to it,
+and a fill is dropped if its resume was invalidated while the read was in
+flight, so a slow read can never re-cache a version that a concurrent
+write has already replaced. Backends hand out a fill generation with each
+miss and take it back with the fill: within a process a token per resume
+is enough, but with ``SharedBackend`` the write may come from another
+worker, so the generation lives in the shared store.
+
+Documents are cached BSON-encoded: entries cannot be mutated by callers,
+they keep their datetimes, and their size is known for eviction. Two
+backends are provided:
+
+* ``LruBackend``: per process, evicts least recently used entries past
+  ``max_bytes`` and drops entries older than the TTL.
+* ``SharedBackend``: wraps a key-value store with the async ``mget``,
+  ``set(key, value, ex=seconds)`` and ``delete(*keys)`` subset of
+  ``redis.asyncio.Redis``, so all workers share entries and invalidations.
+  Invalidating a resume stores a new random generation for it; entries are
+  tagged with the generation read before their load, and an entry whose
+  tag no longer matches is a miss. ``MemoryStore`` implements that subset
+  in memory for tests and benchmarks.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import bson
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+cache_requests = metrics.registry.register(metrics.Counter(
+    "resume_cache_requests_total", "Resume reads by cache result", ("result",)))
+cache_evictions = metrics.registry.register(metrics.Counter(
+    "resume_cache_evictions_total", "Resumes dropped from the local cache", ("reason",)))
+cache_invalidations = metrics.registry.register(metrics.Counter(
+    "resume_cache_invalidations_total", "Resume cache invalidations after writes"))
+cache_bytes = metrics.registry.register(metrics.Gauge(
+    "resume_cache_bytes", "Encoded size of the resumes held in the local cache"))
+
+
+class LruBackend:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 300.0):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires at, encoded document)
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self.size = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: str, reason: str) -> None:
+        _, value = self._entries.pop(key)
+        self.size -= len(value)
+        self.evictions += 1
+        cache_evictions.inc(reason)
+
+    async def get(self, key: str) -> Tuple[Optional[bytes], Any]:
+        """``(value or None, fill generation)``; within one process ``ResumeCache`` guards fills itself."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        if entry[0] <= time.monotonic():
+            self._drop(key, "expired")
+            cache_bytes.set(self.size)
+            return None, None
+        self._entries.move_to_end(key)
+        return entry[1], None
+
+    async def set(self, key: str, value: bytes, generation: Any = None) -> None:
+        if len(value) > self.max_bytes:
+            return
+        await self.delete(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            self._drop(next(iter(self._entries)), "size")
+        cache_bytes.set(self.size)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= len(entry[1])
+        cache_bytes.set(self.size)
+
+
+class SharedBackend:
+    def __init__(self, store: Any, ttl_seconds: float = 300.0, prefix: str = "resume:"):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Tuple[Optional[bytes], bytes]:
+        """``(value or None, fill generation)``: the entry only counts if it was filled in this generation."""
+        value, generation = await self.store.mget(self.prefix + key, self.prefix + "generation:" + key)
+        generation = generation or b""
+        if value is not None:
+            tag, _, value = value.partition(b"\n")
+            if tag != generation:
+                return None, generation
+        return value, generation
+
+    async def set(self, key: str, value: bytes, generation: Optional[bytes] = None) -> None:
+        if generation is None:
+            return  # the miss could not read the generation, so the fill cannot be checked
+        await self.store.set(self.prefix + key, generation + b"\n" + value, ex=max(1, int(self.ttl_seconds)))
+
+    async def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        # Outlives every entry tagged with the previous generation, so expiring never revives one
+        ex = max(1, int(self.ttl_seconds)) * 2
+        await asyncio.gather(*(self.store.set(self.prefix + "generation:" + key, uuid.uuid4().hex.encode(), ex=ex)
+                               for key in keys))
+        await self.store.delete(*(self.prefix + key for key in keys))
+
+
+class MemoryStore:
+    """In-memory stand-in for the Redis commands ``SharedBackend`` uses."""
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[float, bytes]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._values.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self._values.pop(key, None)
+            return None
+        return entry[1]
+
+    async def mget(self, *keys: str) -> List[Optional[bytes]]:
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ex: Optional[int] = None) -> None:
+        self._values[key] = (time.monotonic() + ex if ex else float("inf"), value)
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._values.pop(key, None) is not None for key in keys)
+
+
+class ResumeCache:
+    def __init__(self, backend: Any):
+        self.backend = backend
+        # resume id -> token of the read currently allowed to fill it
+        self._fills: Dict[str, object] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, resume_id: str, user_id: str,
+                  load: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        """The stored resume, from the cache or from ``load()``; ``None`` if it does not exist."""
+        encoded, generation = await self._backend_call(self.backend.get(resume_id)) or (None, None)
+        if encoded is not None:
+            resume = bson.decode(encoded)
+            if resume.get("user_id") == user_id:
+                self.hits += 1
+                cache_requests.inc("hit")
+                return resume
+        self.misses += 1
+        cache_requests.inc("miss")
+
+        token = self._fills[resume_id] = object()
+        try:
+            resume = await load()
+        finally:
+            filled = self._fills.get(resume_id) is token
+            if filled:
+                del self._fills[resume_id]
+        # Only owned, live documents are cached, so a hit never needs another filter
+        if resume is not None and filled and resume.get("user_id") == user_id and not resume.get("deleted_at"):
+            resume.pop("_id", None)
+            await self._backend_call(self.backend.set(resume_id, bson.encode(resume), generation))
+        return resume
+
+    async def invalidate(self, *resume_ids: str) -> None:
+        for resume_id in resume_ids:
+            self._fills.pop(resume_id, None)
+        cache_invalidations.inc(amount=len(resume_ids))
+        await self._backend_call(self.backend.delete(*resume_ids))
+
+    async def _backend_call(self, call: Awaitable[Any]) -> Any:
+        # A shared store being down degrades to reading MongoDB, never to failed requests
+        try:
+            return await call
+        except Exception:
+            logger.exception("Resume cache backend call failed")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"backend": type(self.backend).__name__, "hits": self.hits, "misses": self.misses}
+        if isinstance(self.backend, LruBackend):
+            stats.update(entries=len(self.backend), bytes=self.backend.size, max_bytes=self.backend.max_bytes,
+                         evictions=self.backend.evictions)
+        return stats
@@ -0,0 +1,198 @@
+"""Translate resume PATCH bodies into a single MongoDB update document.
+
+Two body shapes are accepted:
+
+* a partial document, e.g. ``{"personal_info": {"summary": "..."}}``. Nested
+  objects are merged field by field, lists and scalars replace the stored
+  value, and keys the model does not know are ignored (as with PUT);
+* a list of JSON-Patch-style operations, e.g.
+  ``[{"op": "replace", "path": "/personal_info/summary", "value": "..."}]``.
+  ``replace``/``add`` on a field map to ``$set``, ``add`` at ``/list/-`` or
+  ``/list/<n>`` maps to ``$push`` and ``remove`` of a list element by
+  ``value`` maps to ``$pull``.
+
+MongoDB pads an array with ``null`` to reach a ``$set`` index past its end,
+so ``existing_paths`` gives the list elements an update addresses by
+index; callers add them to the update's filter as ``$exists`` guards.
+
+Every value is validated against the field's type on the resume model
+before it reaches the database. Fields a model derives from others (its
+``DERIVED`` map, e.g. the plain text of a rich-text description) are set
+alongside the field they come from and cannot be patched themselves.
+"""
+import typing
+from functools import lru_cache
+from typing import Annotated, Any, Dict, FrozenSet, List, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+
+class PatchError(ValueError):
+    """The PATCH body cannot be applied to a resume."""
+
+
+_adapters: Dict[Any, TypeAdapter] = {}
+
+
+def _validate(annotation: Any, value: Any, path: str) -> Any:
+    adapter = _adapters.get(annotation)
+    if adapter is None:
+        adapter = _adapters[annotation] = TypeAdapter(annotation)
+    try:
+        validated = adapter.validate_python(value)
+    except ValidationError as e:
+        raise PatchError(f"Invalid value for '{path}': {e.errors()[0]['msg']}")
+    return adapter.dump_python(validated)
+
+
+def _list_item_type(annotation: Any) -> Any:
+    if typing.get_origin(annotation) in (list, List):
+        return typing.get_args(annotation)[0]
+    return None
+
+
+def _field_type(field: Any) -> Any:
+    # Constraints and validators of Annotated fields live in the field's metadata
+    return Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation
+
+
+@lru_cache(maxsize=None)
+def _derived_names(model: Type[BaseModel]) -> FrozenSet[str]:
+    return frozenset(key for name, derive in getattr(model, "DERIVED", {}).items()
+                     for key in derive(name, model.model_fields[name].get_default(call_default_factory=True)))
+
+
+def _model(annotation: Any) -> Any:
+    return annotation if isinstance(annotation, type) and issubclass(annotation, BaseModel) else None
+
+
+def _resolve(model: Type[BaseModel], parts: List[str]) -> Any:
+    """Return the annotation addressed by ``parts`` (indices allowed)."""
+    annotation: Any = model
+    for part in parts:
+        item_type = _list_item_type(annotation)
+        if item_type is not None:
+            if not part.isdigit():
+                raise PatchError(f"Expected a list index, got '{part}'")
+            annotation = item_type
+        elif isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            field = annotation.model_fields.get(part)
+            if field is None:
+                raise PatchError(f"Unknown field '{part}'")
+            if part in _derived_names(annotation):
+                raise PatchError(f"'{part}' is derived from other fields and cannot be changed")
+            annotation = _field_type(field)
+        else:
+            raise PatchError(f"Cannot descend into '{part}'")
+    return annotation
+
+
+def _pointer(path: str) -> List[str]:
+    if not path.startswith("/") or path == "/":
+        raise PatchError(f"Invalid path '{path}'")
+    return [part.replace("~1", "/").replace("~0", "~") for part in path[1:].split("/")]
+
+
+def _check_conflicts(paths: List[str]) -> None:
+    for i, first in enumerate(paths):
+        for second in paths[i + 1:]:
+            shorter, longer = sorted((first, second), key=len)
+            if longer == shorter or longer.startswith(shorter + "."):
+                raise PatchError(f"Conflicting changes to '{shorter}' and '{longer}'")
+
+
+def _from_document(model: Type[BaseModel], body: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    changes: Dict[str, Any] = {}
+    for key, value in body.items():
+        field = model.model_fields.get(key)
+        if field is None or key in _derived_names(model):
+            continue
+        annotation = _field_type(field)
+        path = f"{prefix}{key}"
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel) and isinstance(value, dict):
+            changes.update(_from_document(annotation, value, prefix=f"{path}."))
+        else:
+            changes[path] = _validate(annotation, value, path)
+    return changes
+
+
+def existing_paths(update: Dict[str, Any]) -> Dict[str, Any]:
+    """Filter requiring every list element that ``update`` addresses by index to exist."""
+    guards: Dict[str, Any] = {}
+    for operator in ("$set", "$push", "$pull"):
+        for path in update.get(operator, {}):
+            parts = path.split(".")
+            for i, part in enumerate(parts):
+                if part.isdigit():
+                    guards[".".join(parts[:i + 1])] = {"$exists": True}
+    return guards
+
+
+def build_update(model: Type[BaseModel], body: Any) -> Tuple[Dict[str, Any], List[str]]:
+    """Return ``(update, touched_paths)`` for a PATCH body against ``model``."""
+    set_fields: Dict[str, Any] = {}
+    push_fields: Dict[str, Any] = {}
+    pull_fields: Dict[str, Any] = {}
+    touched: List[str] = []
+
+    if isinstance(body, dict):
+        set_fields = _from_document(model, body)
+        touched = list(set_fields)
+    elif isinstance(body, list):
+        for op in body:
+            if not isinstance(op, dict) or "op" not in op or "path" not in op:
+                raise PatchError("Each operation needs 'op' and 'path'")
+            parts = _pointer(op["path"])
+            dotted = ".".join(parts)
+            kind = op["op"]
+            if kind not in ("add", "replace", "remove"):
+                raise PatchError(f"Unsupported operation '{kind}'")
+            if "value" not in op:
+                raise PatchError(f"Operation '{kind}' on '{op['path']}' needs a 'value'")
+
+            if kind == "remove":
+                item_type = _list_item_type(_resolve(model, parts))
+                if item_type is None:
+                    raise PatchError(f"'remove' only applies to lists, '{op['path']}' is not one")
+                pull_fields[dotted] = _validate(item_type, op["value"], dotted)
+                touched.append(dotted)
+            elif kind == "add" and (parts[-1] == "-" or parts[-1].isdigit()):
+                item_type = _list_item_type(_resolve(model, parts[:-1]))
+                if item_type is None:
+                    # A numeric key on a non-list field falls through to a plain set
+                    set_fields[dotted] = _validate(_resolve(model, parts), op["value"], dotted)
+                    touched.append(dotted)
+                    continue
+                list_path = ".".join(parts[:-1])
+                push = {"$each": [_validate(item_type, op["value"], list_path)]}
+                if parts[-1] != "-":
+                    push["$position"] = int(parts[-1])
+                push_fields[list_path] = push
+                touched.append(list_path)
+            else:
+                set_fields[dotted] = _validate(_resolve(model, parts), op["value"], dotted)
+                touched.append(dotted)
+    else:
+        raise PatchError("Body must be a partial resume or a list of patch operations")
+
+    if not touched:
+        raise PatchError("No changes to apply")
+    _check_conflicts(touched)
+
+    for path, value in list(set_fields.items()):
+        *parent, name = path.split(".")
+        derive = getattr(_model(_resolve(model, parent)), "DERIVED", {}).get(name)
+        if derive is not None:
+            prefix = ".".join(parent + [""])
+            for key, derived in derive(name, value).items():
+                set_fields[prefix + key] = derived
+                touched.append(prefix + key)
+
+    update: Dict[str, Any] = {}
+    if set_fields:
+        update["$set"] = set_fields
+    if push_fields:
+        update["$push"] = push_fields
+    if pull_fields:
+        update["$pull"] = pull_fields
+    return update, touched
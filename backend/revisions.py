@@ -0,0 +1,256 @@
+"""Resume revision history as periodic snapshots plus field-level diffs.
+
+Every recorded revision is stored in ``resume_revisions`` either as a full
+``snapshot`` of the resume content or as a ``diff`` against the revision
+before it. A new snapshot starts once ``snapshot_interval`` diffs have
+accumulated or the diffs since the last snapshot outweigh it, so
+materializing any revision replays a bounded number of diffs.
+
+Diffs are ``{"set": [[path, value], ...], "unset": [path, ...]}`` with
+dotted paths (kept out of field names, which MongoDB restricts);
+equal-length lists are diffed element-wise (``experience.2.description``)
+and anything else is replaced whole.
+
+Retention runs whenever a snapshot is written: diffs older than the newest
+snapshot past ``diff_retention`` are dropped (history thins out to
+snapshots), and only the newest ``max_snapshots`` snapshots are kept.
+Revision numbers are the resume's ``version`` when the revision was
+captured; coalesced autosaves skip versions. The latest revision of each
+resume is cached per process, so like the write-behind buffer this assumes
+a resume's writes are routed to one worker.
+"""
+import asyncio
+import copy
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import bson
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+Diff = Dict[str, Any]
+
+
+def diff_content(old: Any, new: Any) -> Diff:
+    """Field-level changes that turn ``old`` into ``new``."""
+    changes: Diff = {"set": [], "unset": []}
+    _diff(old, new, "", changes)
+    return changes
+
+
+def _diff(old: Any, new: Any, path: str, changes: Diff) -> None:
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, value in new.items():
+            child = f"{path}.{key}" if path else key
+            if key not in old:
+                changes["set"].append([child, copy.deepcopy(value)])
+            elif old[key] != value:
+                _diff(old[key], value, child, changes)
+        for key in old:
+            if key not in new:
+                changes["unset"].append(f"{path}.{key}" if path else key)
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        for index, (before, after) in enumerate(zip(old, new)):
+            if before != after:
+                _diff(before, after, f"{path}.{index}", changes)
+    else:
+        changes["set"].append([path, copy.deepcopy(new)])
+
+
+def _parent(document: Any, path: str):
+    *parents, leaf = path.split(".")
+    for part in parents:
+        document = document[int(part)] if isinstance(document, list) else document.setdefault(part, {})
+    return document, leaf
+
+
+def apply_diff(content: Dict[str, Any], changes: Diff) -> Dict[str, Any]:
+    """Apply a diff from ``diff_content`` to ``content`` in place and return it."""
+    for path in changes.get("unset", ()):
+        parent, leaf = _parent(content, path)
+        parent.pop(leaf, None)
+    for path, value in changes.get("set", ()):
+        parent, leaf = _parent(content, path)
+        parent[int(leaf) if isinstance(parent, list) else leaf] = copy.deepcopy(value)
+    return content
+
+
+def _size(document: Dict[str, Any]) -> int:
+    return len(bson.encode(document))
+
+
+@dataclass
+class _Head:
+    revision: int
+    content: Dict[str, Any]
+    snapshot_bytes: int
+    diffs_since_snapshot: int = 0
+    diff_bytes: int = 0
+
+
+class RevisionStore:
+    def __init__(self, revisions: Callable[[], Any], fields: Iterable[str],
+                 snapshot_interval: int = 25, diff_retention: timedelta = timedelta(days=30),
+                 max_snapshots: int = 50, max_cached_heads: int = 1000):
+        # Resolved on every use so the database handle can be swapped (tests, benchmarks)
+        self._revisions = revisions
+        self.fields = tuple(fields)
+        self.snapshot_interval = snapshot_interval
+        self.diff_retention = diff_retention
+        self.max_snapshots = max_snapshots
+        self.max_cached_heads = max_cached_heads
+        # Latest revision per resume, so recording a diff never replays history
+        self._heads: "OrderedDict[str, _Head]" = OrderedDict()
+        # Striped so concurrent records of one resume are serialized without a lock per resume
+        self._locks = [asyncio.Lock() for _ in range(64)]
+
+    def content(self, resume: Dict[str, Any]) -> Dict[str, Any]:
+        return {field: copy.deepcopy(resume[field]) for field in self.fields if field in resume}
+
+    async def record(self, resume: Dict[str, Any]) -> None:
+        """Store ``resume`` (a full stored document) as revision ``resume["version"]``."""
+        resume_id = resume["id"]
+        try:
+            async with self._locks[hash(resume_id) % len(self._locks)]:
+                await self._record(resume_id, resume["user_id"], resume.get("version", 0), self.content(resume))
+        except PyMongoError:
+            # History is best effort; the write it describes has already succeeded
+            logger.exception("Could not record revision of resume %s", resume_id)
+
+    async def record_created(self, resumes: List[Dict[str, Any]]) -> None:
+        """Store newly created resumes, which have no history yet, as snapshots in one insert."""
+        now = datetime.utcnow()
+        documents = []
+        for resume in resumes:
+            content = self.content(resume)
+            documents.append({"resume_id": resume["id"], "user_id": resume["user_id"],
+                              "revision": resume.get("version", 0), "created_at": now,
+                              "fields": sorted(content), "kind": "snapshot", "content": content})
+        if not documents:
+            return
+        try:
+            await self._revisions().insert_many(documents, ordered=False)
+        except PyMongoError:
+            logger.exception("Could not record revisions of %d created resumes", len(documents))
+
+    async def _record(self, resume_id: str, user_id: str, revision: int, content: Dict[str, Any]) -> None:
+        head = self._heads.get(resume_id) or await self._load_head(resume_id)
+        if head is not None and revision <= head.revision:
+            return
+        now = datetime.utcnow()
+        document: Dict[str, Any] = {"resume_id": resume_id, "user_id": user_id, "revision": revision,
+                                    "created_at": now}
+
+        changes = diff_content(head.content, content) if head is not None else None
+        if changes is not None and not changes["set"] and not changes["unset"]:
+            return
+        diff_bytes = _size(changes) if changes is not None else 0
+        snapshot = (head is None or head.diffs_since_snapshot + 1 >= self.snapshot_interval
+                    or head.diff_bytes + diff_bytes > head.snapshot_bytes)
+        if changes is not None:
+            paths = [path for path, _ in changes["set"]] + changes["unset"]
+            document["fields"] = sorted({path.split(".")[0] for path in paths})
+        else:
+            document["fields"] = sorted(content)
+        if snapshot:
+            document.update(kind="snapshot", content=content)
+        else:
+            document.update(kind="diff", changes=changes)
+
+        try:
+            await self._revisions().insert_one(document)
+        except DuplicateKeyError:
+            # Another process recorded this revision; reload our view next time
+            self._heads.pop(resume_id, None)
+            return
+
+        if snapshot:
+            head = _Head(revision, content, _size(content))
+        else:
+            head = _Head(revision, content, head.snapshot_bytes, head.diffs_since_snapshot + 1,
+                         head.diff_bytes + diff_bytes)
+        self._remember(resume_id, head)
+        if snapshot:
+            await self.compact(resume_id, now)
+
+    def _remember(self, resume_id: str, head: _Head) -> None:
+        self._heads[resume_id] = head
+        self._heads.move_to_end(resume_id)
+        while len(self._heads) > self.max_cached_heads:
+            self._heads.popitem(last=False)
+
+    async def _load_head(self, resume_id: str) -> Optional[_Head]:
+        snapshot = await self._revisions().find_one(
+            {"resume_id": resume_id, "kind": "snapshot"}, sort=[("revision", DESCENDING)])
+        if snapshot is None:
+            return None
+        head = _Head(snapshot["revision"], snapshot["content"], _size(snapshot["content"]))
+        diffs = self._revisions().find(
+            {"resume_id": resume_id, "revision": {"$gt": snapshot["revision"]}}).sort("revision", ASCENDING)
+        async for diff in diffs:
+            apply_diff(head.content, diff["changes"])
+            head.revision = diff["revision"]
+            head.diffs_since_snapshot += 1
+            head.diff_bytes += _size(diff["changes"])
+        return head
+
+    async def history(self, resume_id: str, limit: int, before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Revision summaries, newest first."""
+        query: Dict[str, Any] = {"resume_id": resume_id}
+        if before is not None:
+            query["revision"] = {"$lt": before}
+        cursor = self._revisions().find(
+            query, {"_id": 0, "revision": 1, "kind": 1, "created_at": 1, "fields": 1},
+        ).sort("revision", DESCENDING).limit(limit)
+        return await cursor.to_list(limit)
+
+    async def materialize(self, resume_id: str, revision: int) -> Optional[Dict[str, Any]]:
+        """The resume content as of ``revision``: nearest snapshot plus the diffs after it."""
+        snapshot = await self._revisions().find_one(
+            {"resume_id": resume_id, "kind": "snapshot", "revision": {"$lte": revision}},
+            sort=[("revision", DESCENDING)])
+        if snapshot is None:
+            return None
+        found = snapshot
+        content = snapshot["content"]
+        if snapshot["revision"] < revision:
+            diffs = self._revisions().find(
+                {"resume_id": resume_id, "revision": {"$gt": snapshot["revision"], "$lte": revision}},
+                {"_id": 0, "revision": 1, "created_at": 1, "changes": 1},
+            ).sort("revision", ASCENDING)
+            found = None
+            async for diff in diffs:
+                apply_diff(content, diff["changes"])
+                found = diff
+            if found is None or found["revision"] != revision:
+                return None
+        return {"revision": revision, "created_at": found["created_at"], "content": content}
+
+    async def compact(self, resume_id: str, now: Optional[datetime] = None) -> None:
+        """Drop diffs past the retention window and snapshots beyond ``max_snapshots``."""
+        now = now or datetime.utcnow()
+        snapshots = await self._revisions().find(
+            {"resume_id": resume_id, "kind": "snapshot"}, {"_id": 0, "revision": 1, "created_at": 1},
+        ).sort("revision", DESCENDING).to_list(None)
+        # Diffs before a snapshot that is itself past retention are all past retention
+        expired = next((s["revision"] for s in snapshots if s["created_at"] < now - self.diff_retention), None)
+        if expired is not None:
+            await self._revisions().delete_many(
+                {"resume_id": resume_id, "kind": "diff", "revision": {"$lt": expired}})
+        if len(snapshots) > self.max_snapshots:
+            oldest_kept = snapshots[self.max_snapshots - 1]["revision"]
+            await self._revisions().delete_many({"resume_id": resume_id, "revision": {"$lt": oldest_kept}})
+
+    async def delete(self, resume_id: str) -> None:
+        self._heads.pop(resume_id, None)
+        await self._revisions().delete_many({"resume_id": resume_id})
+
+    async def delete_many(self, resume_ids: List[str]) -> None:
+        for resume_id in resume_ids:
+            self._heads.pop(resume_id, None)
+        await self._revisions().delete_many({"resume_id": {"$in": resume_ids}})
@@ -0,0 +1,105 @@
+"""Write-time normalization of rich-text editor HTML.
+
+Descriptions and the summary arrive from the Quill editor as HTML
+fragments. They are normalized once, when a resume is written:
+``normalize`` keeps only ``RICH_TEXT_TAGS`` with every attribute dropped,
+re-escapes text, maps ``b``/``i`` to ``strong``/``em``, collapses
+whitespace and drops the empty paragraphs Quill leaves behind, so equal
+content is stored as equal strings.
+
+Next to each rich-text field the resume stores what readers would
+otherwise re-parse from the HTML on every request (``derived_fields``):
+``<field>_text`` (one line per block), ``<field>_words`` and
+``<field>_bullets`` (the text of each list item). Project technologies,
+a free-form string, get ``technologies_list``.
+"""
+import html
+import re
+from typing import Any, Dict, List
+
+RICH_TEXT_TAGS = frozenset("p br ul ol li strong em b i u s h3 h4".split())
+# Rich-text fields of a resume, as dotted paths
+RICH_TEXT_FIELDS = ("personal_info.summary", "experience.description", "projects.description")
+
+_RICH_TAG = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9]*)\b[^>]*>|<!--.*?-->", re.S)
+_RICH_DROP = re.compile(r"<(script|style)\b.*?</\1\s*>", re.S | re.I)
+_CANONICAL_TAG = {"b": "strong", "i": "em"}
+_EMPTY_BLOCK = re.compile(r"<(p|h3|h4|li)>(?:\s|<br>)*</\1>")
+_SPACE = re.compile(r"\s+")
+_BLOCK_BREAK = re.compile(r"</?(?:p|br|ul|ol|li|h3|h4)>")
+_LIST_ITEM = re.compile(r"<li>(.*?)</li>", re.S)
+_TAG = re.compile(r"<[^>]+>")
+_TECHNOLOGY_SEPARATOR = re.compile(r"[,;|\n]")
+
+
+def sanitize(value: Any) -> str:
+    """Editor HTML with only ``RICH_TEXT_TAGS`` kept, stripped of attributes; everything else escaped."""
+    if not value:
+        return ""
+    parts = []
+    position = 0
+    text = _RICH_DROP.sub("", str(value))
+    for match in _RICH_TAG.finditer(text):
+        parts.append(html.escape(html.unescape(text[position:match.start()]), quote=False))
+        closing, tag = match.group(1), (match.group(2) or "").lower()
+        if tag in RICH_TEXT_TAGS:
+            tag = _CANONICAL_TAG.get(tag, tag)
+            parts.append(f"<{closing}{tag}>" if tag != "br" else "<br>")
+        position = match.end()
+    parts.append(html.escape(html.unescape(text[position:]), quote=False))
+    return "".join(parts)
+
+
+def normalize(value: Any) -> str:
+    """Canonical form of editor HTML, as stored. ``normalize(normalize(x)) == normalize(x)``."""
+    text = _SPACE.sub(" ", sanitize(value))
+    previous = None
+    while previous != text:
+        # Repeated so a list left empty by dropping its items goes too
+        previous, text = text, _EMPTY_BLOCK.sub("", text)
+        text = re.sub(r"<(ul|ol)>\s*</\1>", "", text)
+    return text.strip()
+
+
+def plain_lines(value: Any) -> List[str]:
+    """Non-empty text lines of (normalized) rich text, one per block."""
+    if not value:
+        return []
+    text = html.unescape(_TAG.sub("", _BLOCK_BREAK.sub("\n", str(value))))
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def bullets(value: Any) -> List[str]:
+    """Text of each list item of (normalized) rich text."""
+    if not value:
+        return []
+    items = (" ".join(plain_lines(item)) for item in _LIST_ITEM.findall(str(value)))
+    return [item for item in items if item]
+
+
+def derived_fields(name: str, value: Any) -> Dict[str, Any]:
+    """The fields stored next to rich-text field ``name``."""
+    text = "\n".join(plain_lines(value))
+    return {f"{name}_text": text, f"{name}_words": len(text.split()), f"{name}_bullets": bullets(value)}
+
+
+def technology_list(value: Any) -> List[str]:
+    """``"React, Node.js; MongoDB"`` -> ``["React", "Node.js", "MongoDB"]``, without duplicates."""
+    seen = set()
+    technologies = []
+    for item in _TECHNOLOGY_SEPARATOR.split(str(value or "")):
+        item = _SPACE.sub(" ", item).strip()
+        if item and item.lower() not in seen:
+            seen.add(item.lower())
+            technologies.append(item)
+    return technologies
+
+
+def technology_fields(name: str, value: Any) -> Dict[str, Any]:
+    return {f"{name}_list": technology_list(value)}
+
+
+def stored_text(item: Dict[str, Any], name: str) -> str:
+    """Plain text of rich-text field ``name`` of ``item``, parsed only for documents stored before it was derived."""
+    text = item.get(f"{name}_text")
+    return text if isinstance(text, str) else "\n".join(plain_lines(sanitize(item.get(name))))
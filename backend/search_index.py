@@ -0,0 +1,259 @@
+"""In-process inverted index for ranked resume search.
+
+Indexed fields and their weights are in ``FIELD_WEIGHTS``; rich-text
+fields are read from the plain text stored next to their HTML, and only
+stripped of tags here for documents written before it was. Postings are
+partitioned by owner, so a query only touches the caller's resumes, while
+document frequencies are global so BM25 ranking has meaningful IDF values
+even for users with a handful of resumes. Skills are also kept verbatim in
+a sorted per-user vocabulary for prefix matching (``pyth`` -> ``python``).
+
+The index is kept current two ways: the API calls ``update``/``remove``
+right after its own writes, and ``refresh`` pulls every resume (or
+tombstone) whose ``updated_at`` moved past the last watermark, which picks
+up writes made by other workers and heals anything a hook missed.
+"""
+import asyncio
+import bisect
+import heapq
+import html
+import logging
+import math
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo.errors import PyMongoError
+
+from rich_text import RICH_TEXT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+FIELD_WEIGHTS = {
+    "skills": 3.0,
+    "experience.title": 2.0,
+    "projects.technologies": 2.0,
+    "experience.company": 1.5,
+    "experience.description": 1.0,
+    "personal_info.summary": 1.0,
+}
+PROJECTION = {"_id": 0, "id": 1, "user_id": 1, "updated_at": 1, "deleted_at": 1,
+              **{path: 1 for path in FIELD_WEIGHTS},
+              **{f"{path}_text": 1 for path in RICH_TEXT_FIELDS if path in FIELD_WEIGHTS}}
+
+# Added per matched skill prefix, on top of the text score
+SKILL_MATCH_BOOST = 1.0
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TAG = re.compile(r"<[^>]+>")
+# Keeps technology names whole: c++, c#, node.js, asp.net
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+STOPWORDS = frozenset("a an and are as at be by for from in is it of on or the to with".split())
+
+
+def tokenize(text: str) -> List[str]:
+    text = html.unescape(_TAG.sub(" ", text or "")).lower()
+    return [token for token in _TOKEN.findall(text) if token not in STOPWORDS]
+
+
+def normalize_skill(skill: str) -> str:
+    return " ".join(tokenize(skill))
+
+
+def field_values(document: Any, parts: List[str]) -> Iterable[str]:
+    if isinstance(document, list):
+        for item in document:
+            yield from field_values(item, parts)
+    elif not parts:
+        if isinstance(document, str):
+            yield document
+    elif isinstance(document, dict):
+        text = document.get(f"{parts[0]}_text") if len(parts) == 1 else None
+        if isinstance(text, str):
+            # Plain text derived from rich-text HTML when the resume was written
+            yield text
+        else:
+            yield from field_values(document.get(parts[0]), parts[1:])
+
+
+def resume_terms(resume: Dict[str, Any]) -> Dict[str, float]:
+    """Field-weighted term frequencies of a resume."""
+    terms: Dict[str, float] = defaultdict(float)
+    for path, weight in FIELD_WEIGHTS.items():
+        for value in field_values(resume, path.split(".")):
+            for token in tokenize(value):
+                terms[token] += weight
+    return dict(terms)
+
+
+class _UserIndex:
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.lengths: Dict[str, float] = {}
+        self.skill_docs: Dict[str, Set[str]] = defaultdict(set)
+        self.skill_vocabulary: List[str] = []
+
+
+class SearchIndex:
+    def __init__(self, refresh_overlap: timedelta = timedelta(seconds=10)):
+        # Re-read this far behind the watermark so writes that carry an older
+        # updated_at (write-behind flushes, clock skew) are not missed
+        self.refresh_overlap = refresh_overlap
+        self.ready = False
+        self._users: Dict[str, _UserIndex] = {}
+        # resume id -> (owner, weighted terms, normalized skills)
+        self._documents: Dict[str, Tuple[str, Dict[str, float], Set[str]]] = {}
+        self._document_frequency: Dict[str, int] = defaultdict(int)
+        self._total_length = 0.0
+        self._watermark: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def update(self, resume: Dict[str, Any]) -> None:
+        """Index a stored resume (or drop it, for a tombstone)."""
+        if resume.get("deleted_at"):
+            self.remove(resume["id"])
+            return
+        terms = resume_terms(resume)
+        skills = {normalize_skill(skill) for skill in resume.get("skills") or [] if isinstance(skill, str)}
+        skills.discard("")
+        existing = self._documents.get(resume["id"])
+        if existing is not None and existing == (resume["user_id"], terms, skills):
+            return
+        self.remove(resume["id"])
+
+        user = self._users.setdefault(resume["user_id"], _UserIndex())
+        for term, frequency in terms.items():
+            user.postings[term][resume["id"]] = frequency
+            self._document_frequency[term] += 1
+        length = sum(terms.values())
+        user.lengths[resume["id"]] = length
+        self._total_length += length
+        for skill in skills:
+            if not user.skill_docs[skill]:
+                bisect.insort(user.skill_vocabulary, skill)
+            user.skill_docs[skill].add(resume["id"])
+        self._documents[resume["id"]] = (resume["user_id"], terms, skills)
+
+    def remove(self, resume_id: str) -> None:
+        existing = self._documents.pop(resume_id, None)
+        if existing is None:
+            return
+        user_id, terms, skills = existing
+        user = self._users[user_id]
+        for term in terms:
+            postings = user.postings[term]
+            postings.pop(resume_id, None)
+            if not postings:
+                del user.postings[term]
+            self._document_frequency[term] -= 1
+            if not self._document_frequency[term]:
+                del self._document_frequency[term]
+        self._total_length -= user.lengths.pop(resume_id, 0.0)
+        for skill in skills:
+            user.skill_docs[skill].discard(resume_id)
+            if not user.skill_docs[skill]:
+                del user.skill_docs[skill]
+                del user.skill_vocabulary[bisect.bisect_left(user.skill_vocabulary, skill)]
+        if not user.lengths:
+            del self._users[user_id]
+
+    def _skill_matches(self, user: _UserIndex, prefix: str) -> Set[str]:
+        matches: Set[str] = set()
+        start = bisect.bisect_left(user.skill_vocabulary, prefix)
+        for skill in user.skill_vocabulary[start:]:
+            if not skill.startswith(prefix):
+                break
+            matches |= user.skill_docs[skill]
+        return matches
+
+    def search(self, user_id: str, query: str = "", skills: Iterable[str] = (),
+               limit: int = 20, offset: int = 0) -> Tuple[int, List[Tuple[str, float]]]:
+        """BM25-ranked ``(resume_id, score)`` hits of the user's resumes, and the total hit count.
+
+        Hits match any ``query`` term and every ``skills`` prefix.
+        """
+        user = self._users.get(user_id)
+        if user is None:
+            return 0, []
+
+        # Skill prefixes narrow the candidates first, so text scoring skips everything else
+        prefixes = [prefix for prefix in (normalize_skill(skill) for skill in skills) if prefix]
+        candidates: Optional[Set[str]] = None
+        for prefix in prefixes:
+            matches = self._skill_matches(user, prefix)
+            candidates = matches if candidates is None else candidates & matches
+
+        scores: Dict[str, float] = defaultdict(float)
+        documents = len(self._documents)
+        average_length = self._total_length / documents if documents else 1.0
+        # BM25 with the per-document length norm split into constant and length terms
+        base, per_length = BM25_K1 * (1 - BM25_B), BM25_K1 * BM25_B / average_length
+        lengths = user.lengths
+        for term in set(tokenize(query)):
+            postings = user.postings.get(term)
+            if not postings:
+                continue
+            frequency = self._document_frequency[term]
+            idf = math.log(1 + (documents - frequency + 0.5) / (frequency + 0.5)) * (BM25_K1 + 1)
+            if candidates is not None and len(candidates) < len(postings):
+                hits = ((resume_id, postings[resume_id]) for resume_id in candidates if resume_id in postings)
+            else:
+                hits = postings.items()
+            for resume_id, weight in hits:
+                scores[resume_id] += idf * weight / (weight + base + per_length * lengths[resume_id])
+
+        if candidates is not None:
+            if tokenize(query):
+                scores = {resume_id: score for resume_id, score in scores.items() if resume_id in candidates}
+            else:
+                scores = dict.fromkeys(candidates, 0.0)
+            boost = SKILL_MATCH_BOOST * len(prefixes)
+            for resume_id in scores:
+                scores[resume_id] += boost
+
+        ranked = heapq.nlargest(offset + limit, scores.items(), key=lambda hit: (hit[1], hit[0]))
+        return len(scores), ranked[offset:]
+
+    async def refresh(self, collection) -> int:
+        """Apply every resume changed since the last refresh; the first call builds the index."""
+        query: Dict[str, Any] = {"deleted_at": None}
+        if self._watermark is not None:
+            query = {"updated_at": {"$gte": self._watermark - self.refresh_overlap}}
+        applied = 0
+        watermark = self._watermark
+        async for resume in collection.find(query, PROJECTION):
+            self.update(resume)
+            applied += 1
+            if resume.get("updated_at") and (watermark is None or resume["updated_at"] > watermark):
+                watermark = resume["updated_at"]
+        self._watermark = watermark or datetime.utcnow()
+        self.ready = True
+        return applied
+
+    async def _run(self, collection: Callable[[], Any], interval: float) -> None:
+        while True:
+            try:
+                applied = await self.refresh(collection())
+                if applied:
+                    logger.debug("Search index refreshed %d resumes", applied)
+            except PyMongoError:
+                logger.exception("Search index refresh failed")
+            await asyncio.sleep(interval)
+
+    def start(self, collection: Callable[[], Any], interval: float = 5.0) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(collection, interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -1,59 +1,250 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+import asyncio
 import os
 import logging
+import multiprocessing
+import secrets
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import AfterValidator, BaseModel, Field, ValidationError, model_validator
+from typing import Annotated, Any, Callable, ClassVar, Dict, List, Literal, Optional
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
+import base64
 import hashlib
+import json
 import jwt
-from passlib.context import CryptContext
+
+import ats_scoring
+import metrics
+from db_indexes import TOMBSTONE_RETENTION_SECONDS, check_query_plans, ensure_indexes
+from jobs import JobQueue, QueueFull
+from launcher import multi_worker_settings
+from ndjson_io import encode_ndjson, read_ndjson
+from notifications import ChangeStreamBackend, LocalBackend, NotificationHub, TooManySubscriptions, change_event
+from password_pool import PasswordHasher, PoolSaturated
+from pdf_export import CONTENT_FIELDS, PdfRenderCache, content_hash, pdf_file_name, render_pdf_job
+from pdf_export import warm_up as warm_up_pdf_export
+from rate_limit import LocalBuckets, Policy, RateLimiter, RateLimitMiddleware, SharedBuckets
+from resume_cache import LruBackend, ResumeCache, SharedBackend
+from resume_patch import PatchError, build_update, existing_paths
+import rich_text
+from revisions import RevisionStore
+from search_index import SearchIndex
+from template_engine import TemplateEngine
+from thumbnails import ThumbnailCache, render_thumbnail
+from token_cache import TokenCache
+from write_buffer import PendingWrite, ResumeNotFound, VersionConflict, WriteBehindBuffer, set_path
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# `uvicorn --workers N` spawns each worker as a child process and gunicorn takes its worker count from
+# WEB_CONCURRENCY; launcher.py has already applied these overrides before starting its workers
+if multiprocessing.parent_process() is not None or int(os.environ.get('WEB_CONCURRENCY', '1')) > 1:
+    worker_overrides, worker_warnings = multi_worker_settings(os.environ)
+    if worker_overrides:
+        os.environ.update(worker_overrides)
+        for warning in worker_warnings:
+            logging.getLogger(__name__).warning("multiple workers: %s", warning)
+
+# MongoDB connection, one pool per worker process
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
 
-# Create the main app without a prefix
-app = FastAPI()
+def create_mongo_client() -> AsyncIOMotorClient:
+    optional_ms = lambda name: int(os.environ[name]) if os.environ.get(name) else None
+    return AsyncIOMotorClient(
+        mongo_url,
+        maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+        minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', '0')),
+        maxIdleTimeMS=optional_ms('MONGO_MAX_IDLE_TIME_MS'),
+        waitQueueTimeoutMS=optional_ms('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+        # Fail fast when MongoDB is unreachable; /api/ready reports it and the balancer routes around us
+        connectTimeoutMS=int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000')),
+        serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+        socketTimeoutMS=optional_ms('MONGO_SOCKET_TIMEOUT_MS'),
+        event_listeners=[metrics.MongoCommandListener()],
+    )
+
+client = create_mongo_client()
+db = client[os.environ['DB_NAME']]
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing runs in a bounded pool so bcrypt never blocks the event loop
+password_hasher = PasswordHasher(
+    workers=int(os.environ.get('PASSWORD_HASH_WORKERS', '4')),
+    queue_limit=int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', '64')),
+    executor=os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread'),
+    observer=metrics.observe_password_hash,
+)
+
+# Resume listing
+RESUME_PAGE_SIZE = 20
+RESUME_PAGE_SIZE_MAX = 100
+RESUME_SUMMARY_PROJECTION = {
+    "_id": 0, "id": 1, "title": 1, "template_id": 1, "updated_at": 1, "version": 1, "personal_info.full_name": 1,
+}
+RESUME_SYNC_PROJECTION = {**RESUME_SUMMARY_PROJECTION, "deleted_at": 1}
+# updated_at is stamped before the write commits (or the write-behind buffer flushes it), so a
+# finished sync hands out a watermark this far back and the next one re-reads the window
+SYNC_OVERLAP = timedelta(seconds=float(os.environ.get('SYNC_OVERLAP_SECONDS', '10')))
+
+# Bulk NDJSON export/import, streamed in batches so memory stays flat for any dump size
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '500'))
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '500'))
+IMPORT_MAX_LINE_BYTES = int(os.environ.get('IMPORT_MAX_LINE_BYTES', str(1024 * 1024)))
+IMPORT_MAX_REPORTED_ERRORS = 100
 
-# JWT settings
-SECRET_KEY = "resume_creator_secret_key_2025"
+# JWT settings; there is deliberately no default, see .env.example
+SECRET_KEY = os.environ['JWT_SECRET_KEY']
+if not SECRET_KEY:
+    raise RuntimeError("JWT_SECRET_KEY is empty")
 ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get('ACCESS_TOKEN_EXPIRE_MINUTES', str(60 * 24)))
+
+# Bearer token the scraper sends to /api/metrics*; without one those routes answer 404
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Claims of recently verified tokens, so repeat requests skip signature checks
+token_cache = TokenCache(
+    max_entries=int(os.environ.get('TOKEN_CACHE_MAX_ENTRIES', '10000')),
+    ttl_seconds=float(os.environ.get('TOKEN_CACHE_TTL_SECONDS', '300')),
+)
+bearer_scheme = HTTPBearer(auto_error=False)
+
+# Serve resume documents this service wrote straight from Mongo with orjson,
+# skipping the Pydantic rebuild and the response_model re-validation
+FAST_JSON_RESPONSES = os.environ.get('FAST_JSON_RESPONSES', '1') == '1'
+
+# Ranked search; refreshed from Mongo so writes by other workers show up too
+search_index = SearchIndex(
+    refresh_overlap=timedelta(seconds=float(os.environ.get('SEARCH_REFRESH_OVERLAP_SECONDS', '10'))),
+)
+SEARCH_REFRESH_SECONDS = float(os.environ.get('SEARCH_REFRESH_SECONDS', '5'))
+
+# Per-resume ATS term vectors, keyed by version so unchanged resumes are never re-tokenized
+ats_scorer = ats_scoring.AtsScorer(
+    max_cached_vectors=int(os.environ.get('ATS_VECTOR_CACHE_MAX_ENTRIES', '100000')),
+)
+ATS_BATCH_MAX = int(os.environ.get('ATS_BATCH_MAX', '5000'))
+
+# Ids accepted by one batch get/delete/duplicate request
+RESUME_BATCH_MAX = int(os.environ.get('RESUME_BATCH_MAX', '100'))
+
+# Read-through cache for single-resume reads; every write to a resume invalidates it
+def resume_cache_backend():
+    ttl_seconds = float(os.environ.get('RESUME_CACHE_TTL_SECONDS', '300'))
+    redis_url = os.environ.get('RESUME_CACHE_REDIS_URL')
+    if redis_url:
+        # Shared by all workers; redis is only required when this is configured
+        import redis.asyncio
+        return SharedBackend(redis.asyncio.from_url(redis_url), ttl_seconds=ttl_seconds)
+    return LruBackend(max_bytes=int(os.environ.get('RESUME_CACHE_MAX_MB', '64')) * 1024 * 1024,
+                      ttl_seconds=ttl_seconds)
+
+resume_cache = ResumeCache(resume_cache_backend()) if os.environ.get('RESUME_CACHE_ENABLED', '1') == '1' else None
+
+# Rendered PDFs, keyed by a hash of resume content + template
+pdf_cache = PdfRenderCache(max_entries=int(os.environ.get('PDF_CACHE_MAX_ENTRIES', '256')))
+
+# Resume templates compiled once from disk, and list-view thumbnails keyed by content hash
+template_engine = TemplateEngine(ROOT_DIR / "resume_templates")
+thumbnail_cache = ThumbnailCache(max_entries=int(os.environ.get('THUMBNAIL_CACHE_MAX_ENTRIES', '4096')))
+
+# Expensive resume operations run in a worker process pool, off the event loop and the GIL
+job_queue = JobQueue(
+    lambda: db.jobs,
+    workers=int(os.environ.get('JOB_WORKERS', '2')),
+    per_user_limit=int(os.environ.get('JOB_PER_USER_LIMIT', '1')),
+    max_active_per_user=int(os.environ.get('JOB_MAX_ACTIVE_PER_USER', '20')),
+    result_ttl=timedelta(seconds=int(os.environ.get('JOB_RESULT_TTL_SECONDS', '3600'))),
+    executor=os.environ.get('JOB_EXECUTOR', 'process'),
+    lease=timedelta(seconds=int(os.environ.get('JOB_LEASE_SECONDS', '60'))),
+)
+job_queue.register("pdf_export", render_pdf_job, warm_up=warm_up_pdf_export)
+
+# Resume change events pushed to WebSocket subscribers; change streams need a replica set
+notification_hub = NotificationHub(
+    ChangeStreamBackend(lambda: db.resumes) if os.environ.get('NOTIFY_BACKEND', 'local') == 'change_stream'
+    else LocalBackend(),
+    max_queue=int(os.environ.get('NOTIFY_QUEUE_SIZE', '64')),
+    send_timeout=float(os.environ.get('NOTIFY_SEND_TIMEOUT_SECONDS', '10')),
+    max_per_user=int(os.environ.get('NOTIFY_MAX_CONNECTIONS_PER_USER', '20')),
+)
+
+# Readiness: set once startup warm-up has finished, cleared again when shutdown begins
+readiness = {"warmed_up": False, "draining": False}
+
+def begin_drain() -> None:
+    """Answer ``/api/ready`` with 503 while still serving, so a load balancer stops routing here first."""
+    readiness["draining"] = True
+READY_PING_TIMEOUT_SECONDS = float(os.environ.get('READY_PING_TIMEOUT_SECONDS', '2'))
+
+
+# Size limits on editor input, enforced by validation before anything is parsed or stored
+RICH_TEXT_MAX_CHARS = int(os.environ.get('RICH_TEXT_MAX_CHARS', '20000'))
+TECHNOLOGIES_MAX_CHARS = int(os.environ.get('TECHNOLOGIES_MAX_CHARS', '1000'))
+
+# Quill HTML, sanitized and canonicalized on every write
+RichText = Annotated[str, Field(max_length=RICH_TEXT_MAX_CHARS), AfterValidator(rich_text.normalize)]
+
+
+class DerivedFieldsModel(BaseModel):
+    """A model storing fields computed from others next to them.
+
+    ``DERIVED`` maps a field to a function of ``(name, value)`` returning the
+    derived fields; they are recomputed whenever the model is validated, so
+    values sent by clients are overwritten.
+    """
+    DERIVED: ClassVar[Dict[str, Callable[[str, Any], Dict[str, Any]]]] = {}
+
+    @model_validator(mode="after")
+    def derive_fields(self):
+        for name, derive in self.DERIVED.items():
+            for key, value in derive(name, getattr(self, name)).items():
+                setattr(self, key, value)
+        return self
 
 
 # Define Models
-class PersonalInfo(BaseModel):
+class PersonalInfo(DerivedFieldsModel):
+    DERIVED = {"summary": rich_text.derived_fields}
+
     full_name: str = ""
     email: str = ""
     phone: str = ""
     location: str = ""
     linkedin: str = ""
     website: str = ""
-    summary: str = ""
+    summary: RichText = ""
+    summary_text: str = ""
+    summary_words: int = 0
+    summary_bullets: List[str] = Field(default_factory=list)
+
+class Experience(DerivedFieldsModel):
+    DERIVED = {"description": rich_text.derived_fields}
 
-class Experience(BaseModel):
     title: str = ""
     company: str = ""
     location: str = ""
     start_date: str = ""
     end_date: str = ""
     current: bool = False
-    description: str = ""
+    description: RichText = ""
+    description_text: str = ""
+    description_words: int = 0
+    description_bullets: List[str] = Field(default_factory=list)
 
 class Education(BaseModel):
     degree: str = ""
@@ -62,10 +253,16 @@ class Education(BaseModel):
     graduation_date: str = ""
     gpa: str = ""
 
-class Project(BaseModel):
+class Project(DerivedFieldsModel):
+    DERIVED = {"description": rich_text.derived_fields, "technologies": rich_text.technology_fields}
+
     name: str = ""
-    description: str = ""
-    technologies: str = ""
+    description: RichText = ""
+    description_text: str = ""
+    description_words: int = 0
+    description_bullets: List[str] = Field(default_factory=list)
+    technologies: str = Field("", max_length=TECHNOLOGIES_MAX_CHARS)
+    technologies_list: List[str] = Field(default_factory=list)
     link: str = ""
 
 class ResumeData(BaseModel):
@@ -78,9 +275,21 @@ class ResumeData(BaseModel):
     education: List[Education] = Field(default_factory=list)
     skills: List[str] = Field(default_factory=list)
     projects: List[Project] = Field(default_factory=list)
+    # Bumped on every write; documents stored before versioning read as 0
+    version: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Response defaults for fields missing from documents stored before they existed
+RESUME_DEFAULTS = ResumeData().model_dump(exclude={"id", "created_at", "updated_at"})
+# Fields of the nested models; an item missing any predates them (or the derived rich-text fields)
+RESUME_ITEM_FIELDS = {
+    "personal_info": frozenset(PersonalInfo.model_fields),
+    "experience": frozenset(Experience.model_fields),
+    "education": frozenset(Education.model_fields),
+    "projects": frozenset(Project.model_fields),
+}
+
 class ResumeCreate(BaseModel):
     title: str = "My Resume"
     template_id: str = "template1"
@@ -90,6 +299,126 @@ class ResumeCreate(BaseModel):
     skills: List[str] = Field(default_factory=list)
     projects: List[Project] = Field(default_factory=list)
 
+# Revision history: periodic snapshots plus field-level diffs between them
+revision_store = RevisionStore(
+    lambda: db.resume_revisions,
+    fields=ResumeCreate.model_fields,
+    snapshot_interval=int(os.environ.get('REVISION_SNAPSHOT_INTERVAL', '25')),
+    diff_retention=timedelta(days=int(os.environ.get('REVISION_DIFF_RETENTION_DAYS', '30'))),
+    max_snapshots=int(os.environ.get('REVISION_MAX_SNAPSHOTS', '50')),
+)
+
+# Coalesce autosave writes in memory and flush them to Mongo in bulk
+write_buffer = WriteBehindBuffer(
+    lambda: db.resumes,
+    flush_interval=int(os.environ.get('WRITE_BEHIND_FLUSH_MS', '1000')) / 1000,
+    max_pending=int(os.environ.get('WRITE_BEHIND_MAX_PENDING', '1000')),
+    on_flush=lambda writes: record_flushed_writes(writes),
+) if os.environ.get('WRITE_BEHIND_ENABLED', '1') == '1' else None
+
+class ResumePatchResult(BaseModel):
+    id: str
+    version: int
+    updated_at: datetime
+    changes: Dict[str, Any]
+
+class ResumeSummary(BaseModel):
+    id: str
+    title: str = "My Resume"
+    template_id: str = "template1"
+    full_name: str = ""
+    updated_at: datetime
+    version: Optional[int] = None
+
+class ResumePage(BaseModel):
+    items: List[ResumeSummary]
+    next_cursor: Optional[str] = None
+
+class ResumeSync(BaseModel):
+    items: List[ResumeSummary]
+    deleted: List[str]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+class ResumeSearchHit(ResumeSummary):
+    score: float
+
+class ResumeSearchPage(BaseModel):
+    items: List[ResumeSearchHit]
+    total: int
+    next_offset: Optional[int] = None
+
+class ResumeImportError(BaseModel):
+    line: int
+    error: str
+
+class ResumeImportResult(BaseModel):
+    imported: int
+    failed: int
+    # The first IMPORT_MAX_REPORTED_ERRORS failures
+    errors: List[ResumeImportError]
+
+class ResumeIds(BaseModel):
+    ids: List[str] = Field(..., min_length=1)
+
+class ResumeBatchItem(BaseModel):
+    id: str
+    status: Literal["ok", "created", "deleted", "not_found"]
+    # The resume for get, the new copy for duplicate
+    resume: Optional[ResumeData] = None
+
+class ResumeBatchResult(BaseModel):
+    # One per distinct requested id, in request order
+    items: List[ResumeBatchItem]
+
+class AtsScoreRequest(BaseModel):
+    job_description: str = Field(..., min_length=1)
+    # Batch mode only: defaults to all of the user's resumes
+    resume_ids: Optional[List[str]] = None
+    top_keywords: int = Field(30, ge=1, le=100)
+
+class AtsScore(BaseModel):
+    resume_id: str
+    score: float
+    matched: List[str]
+    missing: List[str]
+
+class AtsScoreReport(BaseModel):
+    keywords: List[str]
+    results: List[AtsScore]
+
+class ResumeRevisionSummary(BaseModel):
+    revision: int
+    kind: str
+    created_at: datetime
+    fields: List[str] = Field(default_factory=list)
+
+class ResumeRevisionPage(BaseModel):
+    items: List[ResumeRevisionSummary]
+    next_cursor: Optional[str] = None
+
+class ResumeRevision(BaseModel):
+    revision: int
+    created_at: datetime
+    resume: ResumeCreate
+
+class JobCreate(BaseModel):
+    kind: Literal["pdf_export"]
+    resume_id: str
+    template_id: Optional[str] = None
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    result_url: Optional[str] = None
+
 class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     email: str
@@ -114,23 +443,236 @@ class ResumeTemplate(BaseModel):
 
 
 # Helper functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def run_password_hasher(operation, *args):
+    try:
+        return await operation(*args)
+    except PoolSaturated:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
 
-def create_access_token(data: dict):
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
+    now = datetime.utcnow()
+    to_encode["iat"] = now
+    to_encode["exp"] = now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> dict:
+    if credentials is None or credentials.scheme.lower() != "bearer":
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    
+    try:
+        claims = decode_token(credentials.credentials)
+    except jwt.PyJWTError:
+        raise HTTPException(
+            status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"}
+        )
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+    return {"user_id": claims["user_id"], "email": claims.get("sub")}
+
+async def require_metrics_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> None:
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if (credentials is None or credentials.scheme.lower() != "bearer"
+            or not secrets.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode())):
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+
+def decode_token(token: str) -> Optional[dict]:
+    """Verified claims of ``token`` (``None`` without a user id); raises ``jwt.PyJWTError``."""
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp"]})
+        if not claims.get("user_id"):
+            return None
+        token_cache.put(token, claims)
+    return claims
+
+def request_user_id(scope: dict) -> Optional[str]:
+    """User id of the request's bearer token, or ``None`` if it has no valid one."""
+    for name, value in scope.get("headers") or ():
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return None
+            try:
+                claims = decode_token(token.strip())
+            except jwt.PyJWTError:
+                return None
+            return claims["user_id"] if claims else None
+    return None
+
+def encode_cursor(updated_at: datetime, resume_id: str) -> str:
+    raw = json.dumps([updated_at.isoformat(), resume_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        updated_at, resume_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(updated_at), str(resume_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def resume_etag(version: int) -> str:
+    return f'"{version}"'
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: W/"3" and "3" name the same representation
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def parse_if_match(if_match: Optional[str]) -> Optional[List[int]]:
+    """Versions an If-Match header accepts, or None when any version will do."""
+    if not if_match or if_match.strip() == "*":
+        return None
+    versions = []
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        tag = tag[2:] if tag.startswith("W/") else tag
+        try:
+            versions.append(int(tag.strip('"')))
+        except ValueError:
+            continue
+    if not versions:
+        raise HTTPException(status_code=412, detail="Resume has been modified")
+    return versions
+
+def resume_filter(resume_id: str, user_id: str, if_match: Optional[str] = None) -> dict:
+    """Filter for one of the user's live resumes, matching only when the stored version satisfies If-Match."""
+    query: Dict[str, Any] = {"id": resume_id, "user_id": user_id, "deleted_at": None}
+    versions = parse_if_match(if_match)
+    if versions is not None:
+        # Documents written before versioning have no field and count as version 0
+        query["version"] = {"$in": versions + [None] if 0 in versions else versions}
+    return query
+
+async def stage_resume_write(resume_id: str, user_id: str, updates: dict, if_match: Optional[str]):
+    try:
+        return await write_buffer.stage(resume_id, user_id, updates, parse_if_match(if_match))
+    except ResumeNotFound:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    except VersionConflict:
+        raise HTTPException(status_code=412, detail="Resume has been modified")
+
+async def load_resume(resume_id: str, user_id: str) -> Optional[dict]:
+    """A live resume of the user, read through the resume cache, with pending writes applied."""
+    load = lambda: db.resumes.find_one(resume_filter(resume_id, user_id), {"_id": 0})
+    resume = await (resume_cache.get(resume_id, user_id, load) if resume_cache is not None else load())
+    if resume is not None and write_buffer is not None:
+        resume = write_buffer.overlay(resume)
+    return resume
+
+async def load_resumes(resume_ids: List[str], user_id: str) -> Dict[str, dict]:
+    """The user's live resumes among ``resume_ids``, by id, from one query, with pending writes applied."""
+    query = {"id": {"$in": resume_ids}, "user_id": user_id, "deleted_at": None}
+    resumes = await db.resumes.find(query, {"_id": 0}).to_list(None)
+    if write_buffer is not None:
+        resumes = [write_buffer.overlay(resume) for resume in resumes]
+    return {resume["id"]: resume for resume in resumes}
+
+async def invalidate_cached_resumes(*resume_ids: str) -> None:
+    if resume_cache is not None:
+        await resume_cache.invalidate(*resume_ids)
+
+async def record_resume_writes(resume_ids: List[str], resumes: Optional[List[dict]] = None) -> None:
+    """Invalidate, and feed revision history and search from, written resumes.
+
+    ``resumes`` are their full post-images when the write returned them; otherwise they are read back.
+    """
+    await invalidate_cached_resumes(*resume_ids)
+    if resumes is None:
+        try:
+            resumes = await db.resumes.find({"id": {"$in": resume_ids}, "deleted_at": None}, {"_id": 0}).to_list(None)
+        except PyMongoError:
+            logger.exception("Could not read back written resumes")
+            return
+    for resume in resumes:
+        await revision_store.record(resume)
+        search_index.update(resume)
+
+async def record_flushed_writes(writes: List[PendingWrite]) -> None:
+    """Buffered writes are only announced once flushed, so subscribers never see an uncommitted version."""
+    await record_resume_writes([write.resume_id for write in writes])
+    for write in writes:
+        await notify_resume_change(write.user_id, "updated", write.resume_id, write.version, list(write.fields))
+
+async def notify_resume_change(user_id: str, kind: str, resume_id: str, version: Optional[int] = None,
+                               fields: Optional[List[str]] = None) -> None:
+    await notification_hub.publish(user_id, change_event(kind, resume_id, version, fields))
+
+async def load_ats_vectors(query: dict, limit: int) -> Dict[str, ats_scoring.Vector]:
+    """Up-to-date ATS vectors of the resumes matching ``query``, by id; resumes deleted meanwhile are left out."""
+    stored = await db.resumes.find(query, {"_id": 0, "id": 1, "version": 1}).to_list(limit)
+    if write_buffer is not None:
+        stored = [write_buffer.overlay(resume) for resume in stored]
+    versions = {resume["id"]: resume.get("version", 0) for resume in stored}
+    vectors, stale = ats_scorer.lookup(versions)
+    if stale:
+        resumes = await db.resumes.find({**query, "id": {"$in": stale}}, ats_scoring.PROJECTION).to_list(None)
+        if write_buffer is not None:
+            resumes = [write_buffer.overlay(resume) for resume in resumes]
+        # Tokenizing is the CPU-heavy part; the scorer itself is only touched on the event loop
+        tokens = await run_in_threadpool(lambda: [ats_scoring.resume_tokens(resume) for resume in resumes])
+        for resume, resume_tokens in zip(resumes, tokens):
+            vectors[resume["id"]] = ats_scorer.add(resume, resume_tokens)
+    # In listing order, whichever query found the vector
+    return {resume_id: vectors[resume_id] for resume_id in versions if resume_id in vectors}
+
+def stored_by_current_models(resume: dict) -> bool:
+    """Whether every nested item of a stored resume has all the fields the models write today."""
+    for name, fields in RESUME_ITEM_FIELDS.items():
+        value = resume.get(name)
+        items = [value] if isinstance(value, dict) else value or []
+        if not all(isinstance(item, dict) and fields <= item.keys() for item in items):
+            return False
+    return True
+
+def trusted_resume(resume: dict) -> dict:
+    """Stored resume as a response body, without re-validating it unless it predates the current models."""
+    resume.pop("_id", None)
+    if not stored_by_current_models(resume):
+        # Nested defaults and derived rich-text fields come from validation, as on the validated path
+        return ResumeData(**resume).model_dump()
+    return {**RESUME_DEFAULTS, **resume}
+
+def resume_summary(resume: dict) -> dict:
+    return {
+        "id": resume["id"],
+        "title": resume.get("title", "My Resume"),
+        "template_id": resume.get("template_id", "template1"),
+        "full_name": (resume.get("personal_info") or {}).get("full_name", ""),
+        "updated_at": resume["updated_at"],
+        "version": resume.get("version"),
+    }
+
 
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
     return {"message": "Resume Creator API"}
 
+@api_router.get("/ready")
+async def ready(response: Response):
+    """503 until the worker has warmed up, while it drains, and whenever MongoDB does not answer a ping."""
+    try:
+        await asyncio.wait_for(db.command("ping"), READY_PING_TIMEOUT_SECONDS)
+        mongo = True
+    except (PyMongoError, asyncio.TimeoutError):
+        mongo = False
+    is_ready = mongo and readiness["warmed_up"] and not readiness["draining"]
+    if not is_ready:
+        response.status_code = 503
+    return {"ready": is_ready, "mongo": mongo, "search_index": search_index.ready, **readiness}
+
 # User routes
 @api_router.post("/register")
 async def register_user(user_data: UserCreate):
@@ -143,10 +685,14 @@ async def register_user(user_data: UserCreate):
     user = User(
         email=user_data.email,
         full_name=user_data.full_name,
-        password_hash=get_password_hash(user_data.password)
+        password_hash=await run_password_hasher(password_hasher.hash, user_data.password)
     )
     
-    await db.users.insert_one(user.dict())
+    try:
+        await db.users.insert_one(user.dict())
+    except DuplicateKeyError:
+        # Lost a race with a concurrent registration; the unique index decides
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create access token
     access_token = create_access_token(data={"sub": user.email, "user_id": user.id})
@@ -165,7 +711,9 @@ async def register_user(user_data: UserCreate):
 async def login_user(user_data: UserLogin):
     # Find user
     user = await db.users.find_one({"email": user_data.email})
-    if not user or not verify_password(user_data.password, user["password_hash"]):
+    if not user or not await run_password_hasher(
+        password_hasher.verify, user_data.password, user["password_hash"]
+    ):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Create access token
@@ -181,124 +729,786 @@ async def login_user(user_data: UserLogin):
         }
     }
 
+@api_router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_token)])
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@api_router.get("/metrics/password-hashing", dependencies=[Depends(require_metrics_token)])
+async def password_hashing_metrics():
+    return password_hasher.stats()
+
+@api_router.get("/metrics/rate-limit", dependencies=[Depends(require_metrics_token)])
+async def rate_limit_metrics():
+    return rate_limiter.stats() if rate_limiter is not None else {"enabled": False}
+
+@api_router.get("/metrics/notifications", dependencies=[Depends(require_metrics_token)])
+async def notification_metrics():
+    return notification_hub.stats()
+
+@api_router.get("/metrics/resume-cache", dependencies=[Depends(require_metrics_token)])
+async def resume_cache_metrics():
+    return resume_cache.stats() if resume_cache is not None else {"enabled": False}
+
 # Resume routes
+RESUME_TEMPLATES = [
+    {
+        "id": "template1",
+        "name": "Classic Professional",
+        "description": "Clean and professional layout perfect for corporate roles",
+        "preview_image": "https://images.unsplash.com/photo-1586281380349-632531db7ed4?w=300&h=400&fit=crop"
+    },
+    {
+        "id": "template2",
+        "name": "Modern Creative",
+        "description": "Contemporary design with subtle color accents",
+        "preview_image": "https://images.unsplash.com/photo-1434030216411-0b793f4b4173?w=300&h=400&fit=crop"
+    },
+    {
+        "id": "template3",
+        "name": "Minimalist Clean",
+        "description": "Simple and elegant design focused on content",
+        "preview_image": "https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=300&h=400&fit=crop"
+    },
+    {
+        "id": "template4",
+        "name": "Executive Elite",
+        "description": "Sophisticated layout for senior positions",
+        "preview_image": "https://images.unsplash.com/photo-1521791136064-7986c2920216?w=300&h=400&fit=crop"
+    },
+    {
+        "id": "template5",
+        "name": "Tech Focus",
+        "description": "Perfect for developers and tech professionals",
+        "preview_image": "https://images.unsplash.com/photo-1460925895917-afdab827c52f?w=300&h=400&fit=crop"
+    },
+    {
+        "id": "template6",
+        "name": "Creative Bold",
+        "description": "Eye-catching design for creative industries",
+        "preview_image": "https://images.unsplash.com/photo-1552664730-d307ca884978?w=300&h=400&fit=crop"
+    },
+    {
+        "id": "template7",
+        "name": "Academic Scholar",
+        "description": "Traditional format ideal for academic positions",
+        "preview_image": "https://images.unsplash.com/photo-1481627834876-b7833e8f5570?w=300&h=400&fit=crop"
+    },
+    {
+        "id": "template8",
+        "name": "Startup Dynamic",
+        "description": "Modern layout for startup and entrepreneurial roles",
+        "preview_image": "https://images.unsplash.com/photo-1559136555-9303baea8ebd?w=300&h=400&fit=crop"
+    },
+    {
+        "id": "template9",
+        "name": "Healthcare Pro",
+        "description": "Professional design for healthcare professionals",
+        "preview_image": "https://images.unsplash.com/photo-1576091160399-112ba8d25d1f?w=300&h=400&fit=crop"
+    },
+    {
+        "id": "template10",
+        "name": "Sales Champion",
+        "description": "Results-focused layout for sales professionals",
+        "preview_image": "https://images.unsplash.com/photo-1507680434567-5739c80be1ac?w=300&h=400&fit=crop"
+    }
+]
+TEMPLATES_ETAG = '"%s"' % hashlib.sha256(json.dumps(RESUME_TEMPLATES, sort_keys=True).encode()).hexdigest()[:16]
+
 @api_router.get("/templates")
-async def get_resume_templates():
-    templates = [
-        {
-            "id": "template1",
-            "name": "Classic Professional",
-            "description": "Clean and professional layout perfect for corporate roles",
-            "preview_image": "https://images.unsplash.com/photo-1586281380349-632531db7ed4?w=300&h=400&fit=crop"
-        },
-        {
-            "id": "template2", 
-            "name": "Modern Creative",
-            "description": "Contemporary design with subtle color accents",
-            "preview_image": "https://images.unsplash.com/photo-1434030216411-0b793f4b4173?w=300&h=400&fit=crop"
-        },
-        {
-            "id": "template3",
-            "name": "Minimalist Clean",
-            "description": "Simple and elegant design focused on content",
-            "preview_image": "https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=300&h=400&fit=crop"
-        },
-        {
-            "id": "template4",
-            "name": "Executive Elite",
-            "description": "Sophisticated layout for senior positions",
-            "preview_image": "https://images.unsplash.com/photo-1521791136064-7986c2920216?w=300&h=400&fit=crop"
-        },
-        {
-            "id": "template5",
-            "name": "Tech Focus",
-            "description": "Perfect for developers and tech professionals",
-            "preview_image": "https://images.unsplash.com/photo-1460925895917-afdab827c52f?w=300&h=400&fit=crop"
-        },
-        {
-            "id": "template6",
-            "name": "Creative Bold",
-            "description": "Eye-catching design for creative industries",
-            "preview_image": "https://images.unsplash.com/photo-1552664730-d307ca884978?w=300&h=400&fit=crop"
-        },
-        {
-            "id": "template7",
-            "name": "Academic Scholar",
-            "description": "Traditional format ideal for academic positions",
-            "preview_image": "https://images.unsplash.com/photo-1481627834876-b7833e8f5570?w=300&h=400&fit=crop"
-        },
-        {
-            "id": "template8",
-            "name": "Startup Dynamic",
-            "description": "Modern layout for startup and entrepreneurial roles",
-            "preview_image": "https://images.unsplash.com/photo-1559136555-9303baea8ebd?w=300&h=400&fit=crop"
-        },
-        {
-            "id": "template9",
-            "name": "Healthcare Pro",
-            "description": "Professional design for healthcare professionals",
-            "preview_image": "https://images.unsplash.com/photo-1576091160399-112ba8d25d1f?w=300&h=400&fit=crop"
-        },
-        {
-            "id": "template10",
-            "name": "Sales Champion",
-            "description": "Results-focused layout for sales professionals",
-            "preview_image": "https://images.unsplash.com/photo-1507680434567-5739c80be1ac?w=300&h=400&fit=crop"
-        }
-    ]
-    return templates
+async def get_resume_templates(request: Request, response: Response):
+    if etag_matches(request.headers.get("if-none-match"), TEMPLATES_ETAG):
+        return Response(status_code=304, headers={"ETag": TEMPLATES_ETAG})
+    response.headers["ETag"] = TEMPLATES_ETAG
+    return RESUME_TEMPLATES
 
 @api_router.post("/resumes", response_model=ResumeData, status_code=201)
-async def create_resume(resume_data: ResumeCreate):
-    resume = ResumeData(**resume_data.dict())
+async def create_resume(resume_data: ResumeCreate, current_user: dict = Depends(get_current_user)):
+    # Nested models are passed on as validated instances, so their HTML is not normalized twice
+    resume = ResumeData(**dict(resume_data), user_id=current_user["user_id"], version=1)
     await db.resumes.insert_one(resume.dict())
+    await revision_store.record(resume.dict())
+    search_index.update(resume.dict())
+    await notify_resume_change(resume.user_id, "created", resume.id, resume.version)
     return resume
 
-@api_router.get("/resumes", response_model=List[ResumeData])
-async def get_resumes():
-    resumes = await db.resumes.find().to_list(1000)
-    return [ResumeData(**resume) for resume in resumes]
+@api_router.get("/resumes", response_model=ResumePage)
+async def get_resumes(
+    limit: int = Query(RESUME_PAGE_SIZE, ge=1, le=RESUME_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    # Keyset pagination, newest first: (updated_at, id) strictly after the cursor
+    query: Dict[str, Any] = {"user_id": current_user["user_id"], "deleted_at": None}
+    if cursor:
+        updated_at, resume_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"updated_at": {"$lt": updated_at}},
+            {"updated_at": updated_at, "id": {"$lt": resume_id}},
+        ]
+    
+    # Fetch one extra row to learn whether another page exists
+    cursor_query = db.resumes.find(query, RESUME_SUMMARY_PROJECTION).sort([("updated_at", -1), ("id", -1)])
+    resumes = await cursor_query.limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(resumes) > limit:
+        resumes = resumes[:limit]
+        next_cursor = encode_cursor(resumes[-1]["updated_at"], resumes[-1]["id"])
+    if write_buffer is not None:
+        resumes = [write_buffer.overlay(resume) for resume in resumes]
+    page = {"items": [resume_summary(resume) for resume in resumes], "next_cursor": next_cursor}
+    if FAST_JSON_RESPONSES:
+        return ORJSONResponse(page)
+    return page
+
+@api_router.get("/resumes/sync", response_model=ResumeSync)
+async def sync_resumes(
+    since: Optional[str] = None,
+    limit: int = Query(RESUME_PAGE_SIZE_MAX, ge=1, le=RESUME_PAGE_SIZE_MAX),
+    current_user: dict = Depends(get_current_user),
+):
+    """Resumes created, changed or deleted after the ``since`` watermark, oldest first.
+
+    Without ``since`` this is a full sync of live resumes. Keep calling with
+    ``next_cursor`` while ``has_more``; the last ``next_cursor`` is the
+    watermark for the next sync. That watermark lies ``SYNC_OVERLAP`` before
+    the last change returned, so the next sync repeats recent changes: clients
+    dedupe by ``id``, keeping the highest ``version``.
+    """
+    # Writes still in the buffer would otherwise land behind the watermark
+    if write_buffer is not None and write_buffer.has_pending(current_user["user_id"]):
+        await write_buffer.flush()
+
+    query: Dict[str, Any] = {"user_id": current_user["user_id"]}
+    if since:
+        updated_at, resume_id = decode_cursor(since)
+        if updated_at < datetime.utcnow() - timedelta(seconds=TOMBSTONE_RETENTION_SECONDS):
+            raise HTTPException(status_code=410, detail="Sync cursor expired; sync without since")
+        query["$or"] = [
+            {"updated_at": {"$gt": updated_at}},
+            {"updated_at": updated_at, "id": {"$gt": resume_id}},
+        ]
+    else:
+        query["deleted_at"] = None
+    
+    cursor_query = db.resumes.find(query, RESUME_SYNC_PROJECTION).sort([("updated_at", 1), ("id", 1)])
+    resumes = await cursor_query.limit(limit + 1).to_list(limit + 1)
+    has_more = len(resumes) > limit
+    resumes = resumes[:limit]
+    
+    next_cursor = since
+    if resumes and has_more:
+        next_cursor = encode_cursor(resumes[-1]["updated_at"], resumes[-1]["id"])
+    elif resumes:
+        next_cursor = encode_cursor(resumes[-1]["updated_at"] - SYNC_OVERLAP, "")
+    page = {
+        "items": [resume_summary(resume) for resume in resumes if not resume.get("deleted_at")],
+        "deleted": [resume["id"] for resume in resumes if resume.get("deleted_at")],
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    }
+    if FAST_JSON_RESPONSES:
+        return ORJSONResponse(page)
+    return page
+
+@api_router.get("/resumes/export")
+async def export_resumes(gzip: bool = False, current_user: dict = Depends(get_current_user)):
+    """Every live resume of the user as NDJSON, streamed from the cursor batch by batch."""
+    if write_buffer is not None and write_buffer.has_pending(current_user["user_id"]):
+        await write_buffer.flush()
+    cursor = db.resumes.find(
+        {"user_id": current_user["user_id"], "deleted_at": None}, {"_id": 0, "user_id": 0, "deleted_at": 0},
+    ).batch_size(EXPORT_BATCH_SIZE)
+    file_name = f"resumes-{datetime.utcnow():%Y%m%d}.ndjson" + (".gz" if gzip else "")
+    return StreamingResponse(
+        encode_ndjson(cursor, EXPORT_BATCH_SIZE, compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'},
+    )
+
+async def insert_imported_resumes(batch: List[tuple], report_error) -> int:
+    resumes = [resume for _, resume in batch]
+    try:
+        await db.resumes.insert_many(resumes, ordered=False)
+    except BulkWriteError as e:
+        failures = {error["index"]: error["errmsg"] for error in e.details.get("writeErrors", [])}
+        for index, message in failures.items():
+            report_error(batch[index][0], message)
+        resumes = [resume for index, resume in enumerate(resumes) if index not in failures]
+    for resume in resumes:
+        search_index.update(resume)
+    await revision_store.record_created(resumes)
+    for resume in resumes:
+        await notify_resume_change(resume["user_id"], "created", resume["id"], resume["version"])
+    return len(resumes)
+
+@api_router.post("/resumes/import", response_model=ResumeImportResult)
+async def import_resumes(request: Request, current_user: dict = Depends(get_current_user)):
+    """Create a resume from every ``ResumeCreate`` line of an NDJSON (or gzipped NDJSON) body.
+
+    The body is parsed as it streams in and inserted ``IMPORT_BATCH_SIZE``
+    resumes at a time; invalid lines are reported and skipped. Imported
+    resumes always get new ids.
+    """
+    imported, failed, errors = 0, 0, []
+
+    def report_error(line: int, error: str) -> None:
+        nonlocal failed
+        failed += 1
+        if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+            errors.append({"line": line, "error": error})
+
+    batch = []
+    async for line, value, error in read_ndjson(request.stream(), IMPORT_MAX_LINE_BYTES):
+        if error is None:
+            try:
+                resume_data = ResumeCreate.model_validate(value)
+            except ValidationError as e:
+                error = "; ".join(
+                    f"{'.'.join(map(str, detail['loc'])) or 'resume'}: {detail['msg']}" for detail in e.errors())
+        if error is not None:
+            report_error(line, error)
+            continue
+        resume = ResumeData(**dict(resume_data), user_id=current_user["user_id"], version=1)
+        batch.append((line, resume.model_dump()))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            imported += await insert_imported_resumes(batch, report_error)
+            batch = []
+    if batch:
+        imported += await insert_imported_resumes(batch, report_error)
+    return {"imported": imported, "failed": failed, "errors": errors}
+
+@api_router.get("/resumes/search", response_model=ResumeSearchPage)
+async def search_resumes(
+    response: Response,
+    q: str = "",
+    skill: List[str] = Query(default=[]),
+    limit: int = Query(RESUME_PAGE_SIZE, ge=1, le=RESUME_PAGE_SIZE_MAX),
+    offset: int = Query(0, ge=0),
+    current_user: dict = Depends(get_current_user),
+):
+    """Rank the user's resumes by ``q`` terms; every ``skill`` is a required prefix match."""
+    if not q.strip() and not skill:
+        raise HTTPException(status_code=400, detail="Provide q or skill to search")
+    if not search_index.ready:
+        raise HTTPException(status_code=503, detail="Search index is still building",
+                            headers={"Retry-After": str(int(SEARCH_REFRESH_SECONDS))})
+    
+    total, hits = search_index.search(current_user["user_id"], q, skill, limit, offset)
+    resumes = await db.resumes.find(
+        {"id": {"$in": [resume_id for resume_id, _ in hits]}, "user_id": current_user["user_id"], "deleted_at": None},
+        RESUME_SUMMARY_PROJECTION,
+    ).to_list(len(hits))
+    by_id = {resume["id"]: resume for resume in resumes}
+    items = []
+    for resume_id, score in hits:
+        if resume_id in by_id:
+            resume = by_id[resume_id]
+            if write_buffer is not None:
+                resume = write_buffer.overlay(resume)
+            items.append({**resume_summary(resume), "score": round(score, 4)})
+    next_offset = offset + limit if offset + limit < total else None
+    page = {"items": items, "total": total, "next_offset": next_offset}
+    if FAST_JSON_RESPONSES:
+        return ORJSONResponse(page)
+    return page
+
+@api_router.post("/resumes/ats-score", response_model=AtsScoreReport)
+async def score_resumes(request: AtsScoreRequest, current_user: dict = Depends(get_current_user)):
+    """Score many of the user's resumes against one job description, best match first."""
+    query: Dict[str, Any] = {"user_id": current_user["user_id"], "deleted_at": None}
+    if request.resume_ids is not None:
+        if len(request.resume_ids) > ATS_BATCH_MAX:
+            raise HTTPException(status_code=400, detail=f"At most {ATS_BATCH_MAX} resumes per request")
+        query["id"] = {"$in": request.resume_ids}
+    vectors = await load_ats_vectors(query, ATS_BATCH_MAX)
+    report = ats_scorer.score(request.job_description, vectors, request.top_keywords)
+    if FAST_JSON_RESPONSES:
+        return ORJSONResponse(report)
+    return report
+
+def batch_ids(request: ResumeIds) -> List[str]:
+    resume_ids = list(dict.fromkeys(request.ids))
+    if len(resume_ids) > RESUME_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {RESUME_BATCH_MAX} resumes per request")
+    return resume_ids
+
+def batch_result(results: List[dict], status_code: int = 200):
+    if FAST_JSON_RESPONSES:
+        return ORJSONResponse({"items": [
+            {**item, "resume": trusted_resume(item["resume"]) if item.get("resume") else None} for item in results
+        ]}, status_code=status_code)
+    return ResumeBatchResult(items=results)
+
+@api_router.post("/resumes/batch/get", response_model=ResumeBatchResult)
+async def get_resumes_batch(request: ResumeIds, current_user: dict = Depends(get_current_user)):
+    resume_ids = batch_ids(request)
+    resumes = await load_resumes(resume_ids, current_user["user_id"])
+    return batch_result([
+        {"id": resume_id, "status": "ok", "resume": resumes[resume_id]} if resume_id in resumes
+        else {"id": resume_id, "status": "not_found"}
+        for resume_id in resume_ids
+    ])
+
+@api_router.post("/resumes/batch/delete", response_model=ResumeBatchResult)
+async def delete_resumes_batch(request: ResumeIds, current_user: dict = Depends(get_current_user)):
+    resume_ids = batch_ids(request)
+    user_id = current_user["user_id"]
+    live = [resume["id"] for resume in await db.resumes.find(
+        {"id": {"$in": resume_ids}, "user_id": user_id, "deleted_at": None}, {"_id": 0, "id": 1}).to_list(None)]
+    if live:
+        if write_buffer is not None:
+            for resume_id in live:
+                write_buffer.discard(resume_id, user_id)
+        # Same tombstones as delete_resume, for all of them in one update
+        now = datetime.utcnow()
+        await db.resumes.update_many(
+            {"id": {"$in": live}, "user_id": user_id, "deleted_at": None},
+            {
+                "$set": {"deleted_at": now, "updated_at": now},
+                "$unset": {field: "" for field in RESUME_DEFAULTS if field not in ("user_id", "version")},
+                "$inc": {"version": 1},
+            },
+        )
+        await invalidate_cached_resumes(*live)
+        await revision_store.delete_many(live)
+        for resume_id in live:
+            search_index.remove(resume_id)
+            ats_scorer.invalidate(resume_id)
+            await notify_resume_change(user_id, "deleted", resume_id)
+    deleted = set(live)
+    return batch_result([{"id": resume_id, "status": "deleted" if resume_id in deleted else "not_found"}
+                         for resume_id in resume_ids])
+
+@api_router.post("/resumes/batch/duplicate", response_model=ResumeBatchResult, status_code=201)
+async def duplicate_resumes_batch(request: ResumeIds, current_user: dict = Depends(get_current_user)):
+    resume_ids = batch_ids(request)
+    sources = await load_resumes(resume_ids, current_user["user_id"])
+    now = datetime.utcnow()
+    # Copied from the server's view of each resume, so pending autosaves are included
+    copies = {
+        resume_id: ResumeData(**{
+            **source,
+            "id": str(uuid.uuid4()),
+            "title": f"{source.get('title') or 'My Resume'} (copy)",
+            "version": 1,
+            "created_at": now,
+            "updated_at": now,
+        }).model_dump()
+        for resume_id, source in sources.items()
+    }
+    if copies:
+        await db.resumes.insert_many([dict(resume) for resume in copies.values()])
+        await revision_store.record_created(list(copies.values()))
+        for resume in copies.values():
+            search_index.update(resume)
+            await notify_resume_change(resume["user_id"], "created", resume["id"], resume["version"])
+    return batch_result([
+        {"id": resume_id, "status": "created", "resume": copies[resume_id]} if resume_id in copies
+        else {"id": resume_id, "status": "not_found"}
+        for resume_id in resume_ids
+    ], status_code=201)
 
 @api_router.get("/resumes/{resume_id}", response_model=ResumeData)
-async def get_resume(resume_id: str):
-    resume = await db.resumes.find_one({"id": resume_id})
+async def get_resume(
+    resume_id: str,
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+):
+    resume = await load_resume(resume_id, current_user["user_id"])
     if not resume:
         raise HTTPException(status_code=404, detail="Resume not found")
+    
+    etag = resume_etag(resume.get("version", 0))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    if FAST_JSON_RESPONSES:
+        return ORJSONResponse(trusted_resume(resume), headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return ResumeData(**resume)
 
 @api_router.put("/resumes/{resume_id}", response_model=ResumeData)
-async def update_resume(resume_id: str, resume_data: ResumeCreate):
-    existing_resume = await db.resumes.find_one({"id": resume_id})
-    if not existing_resume:
+async def update_resume(
+    resume_id: str,
+    resume_data: ResumeCreate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+):
+    updated_data = resume_data.dict()
+    ats_scorer.invalidate(resume_id)
+    if write_buffer is not None:
+        # Acknowledged from memory; the background flush writes it to Mongo
+        pending = await stage_resume_write(resume_id, current_user["user_id"], updated_data, if_match)
+        resume = {
+            **updated_data,
+            "id": resume_id,
+            "user_id": current_user["user_id"],
+            "version": pending.version,
+            "created_at": pending.created_at or pending.updated_at,
+            "updated_at": pending.updated_at,
+        }
+    else:
+        # Replace every editable field and bump the version in one atomic update.
+        # The If-Match precondition lives in the filter, so a concurrent writer
+        # can never be overwritten between a read and a write.
+        updated_data["updated_at"] = datetime.utcnow()
+        resume = await db.resumes.find_one_and_update(
+            resume_filter(resume_id, current_user["user_id"], if_match),
+            {"$set": updated_data, "$inc": {"version": 1}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not resume:
+            if if_match and await db.resumes.find_one(resume_filter(resume_id, current_user["user_id"]), {"_id": 1}):
+                raise HTTPException(status_code=412, detail="Resume has been modified")
+            raise HTTPException(status_code=404, detail="Resume not found")
+        await invalidate_cached_resumes(resume_id)
+        await revision_store.record(resume)
+        search_index.update(resume)
+        # Buffered writes are announced by the flush
+        await notify_resume_change(current_user["user_id"], "updated", resume_id, resume["version"], list(updated_data))
+    
+    etag = resume_etag(resume["version"])
+    if FAST_JSON_RESPONSES:
+        return ORJSONResponse(trusted_resume(resume), headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return ResumeData(**resume)
+
+@api_router.patch("/resumes/{resume_id}", response_model=ResumePatchResult)
+async def patch_resume(
+    resume_id: str,
+    response: Response,
+    body: Any = Body(...),
+    if_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+):
+    try:
+        update, touched = build_update(ResumeCreate, body)
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    ats_scorer.invalidate(resume_id)
+    if write_buffer is not None:
+        bufferable = list(update) == ["$set"] and not any(
+            part.isdigit() for path in update["$set"] for part in path.split(".")
+        )
+        if bufferable:
+            pending = await stage_resume_write(resume_id, current_user["user_id"], update["$set"], if_match)
+            changes: Dict[str, Any] = {}
+            for path, value in update["$set"].items():
+                set_path(changes, path, value)
+            response.headers["ETag"] = resume_etag(pending.version)
+            return {"id": resume_id, "version": pending.version, "updated_at": pending.updated_at, "changes": changes}
+        # $push/$pull and positional paths go straight to Mongo, after anything pending
+        await write_buffer.flush_one(resume_id)
+    
+    # An index past the end of a list would be padded with nulls the models cannot read back
+    guards = existing_paths(update)
+    update.setdefault("$set", {})["updated_at"] = datetime.utcnow()
+    update["$inc"] = {"version": 1}
+    
+    # Report only what changed, trimmed to the enclosing list for indexed paths
+    changed_paths = set()
+    for path in touched:
+        parts = path.split(".")
+        index = next((i for i, part in enumerate(parts) if part.isdigit()), len(parts))
+        changed_paths.add(".".join(parts[:index]))
+    changed_paths = {
+        path for path in changed_paths
+        if not any(path.startswith(other + ".") for other in changed_paths)
+    }
+    
+    # Single atomic round trip: apply the update and return the whole new state, which
+    # revision history and search need too
+    resume = await db.resumes.find_one_and_update(
+        {**resume_filter(resume_id, current_user["user_id"], if_match), **guards},
+        update, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+    )
+    if not resume:
+        if guards and await db.resumes.find_one(resume_filter(resume_id, current_user["user_id"], if_match), {"_id": 1}):
+            raise HTTPException(status_code=409, detail="List index out of range")
+        if if_match and await db.resumes.find_one(resume_filter(resume_id, current_user["user_id"]), {"_id": 1}):
+            raise HTTPException(status_code=412, detail="Resume has been modified")
         raise HTTPException(status_code=404, detail="Resume not found")
+    await record_resume_writes([resume_id], [resume])
+    await notify_resume_change(current_user["user_id"], "updated", resume_id, resume["version"], touched)
     
-    updated_data = resume_data.dict()
-    updated_data["id"] = resume_id
-    updated_data["created_at"] = existing_resume["created_at"]
-    updated_data["updated_at"] = datetime.utcnow()
+    changes = {}
+    for path in changed_paths:
+        value: Any = resume
+        for part in path.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        set_path(changes, path, value)
+    response.headers["ETag"] = resume_etag(resume["version"])
+    return {"id": resume["id"], "version": resume["version"], "updated_at": resume["updated_at"], "changes": changes}
+
+@api_router.post("/resumes/{resume_id}/ats-score", response_model=AtsScore)
+async def score_resume(resume_id: str, request: AtsScoreRequest, current_user: dict = Depends(get_current_user)):
+    vectors = await load_ats_vectors(resume_filter(resume_id, current_user["user_id"]), 1)
+    if not vectors:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    return ats_scorer.score(request.job_description, vectors, request.top_keywords)["results"][0]
+
+async def owned_resume_for_history(resume_id: str, user_id: str) -> None:
+    if not await db.resumes.find_one(resume_filter(resume_id, user_id), {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Resume not found")
+    # History includes saves still waiting in the write-behind buffer
+    if write_buffer is not None:
+        await write_buffer.flush_one(resume_id)
+
+@api_router.get("/resumes/{resume_id}/revisions", response_model=ResumeRevisionPage)
+async def list_resume_revisions(
+    resume_id: str,
+    limit: int = Query(RESUME_PAGE_SIZE, ge=1, le=RESUME_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    before = None
+    if cursor:
+        try:
+            before = int(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    await owned_resume_for_history(resume_id, current_user["user_id"])
     
-    resume = ResumeData(**updated_data)
-    await db.resumes.replace_one({"id": resume_id}, resume.dict())
-    return resume
+    revisions = await revision_store.history(resume_id, limit + 1, before)
+    next_cursor = None
+    if len(revisions) > limit:
+        revisions = revisions[:limit]
+        next_cursor = str(revisions[-1]["revision"])
+    return {"items": revisions, "next_cursor": next_cursor}
+
+@api_router.get("/resumes/{resume_id}/revisions/{revision}", response_model=ResumeRevision)
+async def get_resume_revision(resume_id: str, revision: int, current_user: dict = Depends(get_current_user)):
+    await owned_resume_for_history(resume_id, current_user["user_id"])
+    materialized = await revision_store.materialize(resume_id, revision)
+    if materialized is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {
+        "revision": materialized["revision"],
+        "created_at": materialized["created_at"],
+        "resume": materialized["content"],
+    }
+
+async def load_rendered_resume(resume_id: str, user_id: str, template_id: Optional[str]):
+    resume = await load_resume(resume_id, user_id)
+    if not resume:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    template_id = template_id or resume.get("template_id") or "template1"
+    if template_id not in template_engine.template_ids:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return resume, template_id, f'"{content_hash(resume, template_id)}"'
+
+@api_router.get("/resumes/{resume_id}/html", response_class=HTMLResponse)
+async def render_resume_html(
+    resume_id: str,
+    request: Request,
+    template_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    resume, template_id, etag = await load_rendered_resume(resume_id, current_user["user_id"], template_id)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return HTMLResponse(template_engine.render(template_id, resume), headers={"ETag": etag})
+
+@api_router.get("/resumes/{resume_id}/thumbnail")
+async def get_resume_thumbnail(
+    resume_id: str,
+    request: Request,
+    template_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    resume, template_id, etag = await load_rendered_resume(resume_id, current_user["user_id"], template_id)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    # Drawn again only when the content hash changes, and then off the event loop
+    cache_key = etag.strip('"')
+    thumbnail = thumbnail_cache.get(cache_key)
+    if thumbnail is None:
+        thumbnail = await run_in_threadpool(render_thumbnail, resume, template_id)
+        thumbnail_cache.put(cache_key, thumbnail)
+    return Response(content=thumbnail, media_type="image/png", headers={"ETag": etag})
+
+@api_router.get("/resumes/{resume_id}/pdf")
+async def export_resume_pdf(
+    resume_id: str,
+    template_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    resume = await load_resume(resume_id, current_user["user_id"])
+    if not resume:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    
+    # Cache hits skip the job pool entirely; misses render in a worker process
+    cache_key = content_hash(resume, template_id)
+    pdf = pdf_cache.get(cache_key)
+    if pdf is None:
+        try:
+            job = await job_queue.run_for(current_user["user_id"], "pdf_export", pdf_job_params(resume, template_id))
+        except QueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+        pdf = job["content"]
+        pdf_cache.put(cache_key, pdf)
+    
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f'attachment; filename="{pdf_file_name(resume)}"',
+            "ETag": f'"{cache_key}"',
+        },
+    )
+
+def pdf_job_params(resume: dict, template_id: Optional[str]) -> dict:
+    # Only what the renderer reads, so job documents stay small
+    return {
+        "resume_id": resume["id"],
+        "resume": {field: resume.get(field) for field in (*CONTENT_FIELDS, "template_id")},
+        "template_id": template_id,
+    }
+
+def job_view(job: dict) -> dict:
+    if job["status"] == "succeeded":
+        job["result_url"] = f"/api/jobs/{job['id']}/result"
+    return job
+
+@api_router.post("/jobs", response_model=Job, status_code=202)
+async def submit_job(request: JobCreate, current_user: dict = Depends(get_current_user)):
+    resume = await load_resume(request.resume_id, current_user["user_id"])
+    if not resume:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    try:
+        job = await job_queue.submit(
+            current_user["user_id"], request.kind, pdf_job_params(resume, request.template_id))
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return job_view(job)
+
+@api_router.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await job_queue.get(job_id, current_user["user_id"])
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_view(job)
+
+@api_router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await job_queue.get(job_id, current_user["user_id"], with_result=True)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    result = job["result"]
+    if "content" not in result:
+        return result
+    return Response(
+        content=result["content"],
+        media_type=result["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{result["file_name"]}"'},
+    )
+
+@api_router.delete("/jobs/{job_id}", response_model=Job)
+async def cancel_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await job_queue.cancel(job_id, current_user["user_id"])
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] not in ("cancelled", "running"):
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    return job_view(job)
 
 @api_router.delete("/resumes/{resume_id}")
-async def delete_resume(resume_id: str):
-    result = await db.resumes.delete_one({"id": resume_id})
-    if result.deleted_count == 0:
+async def delete_resume(resume_id: str, current_user: dict = Depends(get_current_user)):
+    if write_buffer is not None:
+        write_buffer.discard(resume_id, current_user["user_id"])
+    # Keep a content-free tombstone so /resumes/sync can report the deletion;
+    # the deleted_at TTL index removes it after the retention window
+    now = datetime.utcnow()
+    result = await db.resumes.update_one(
+        resume_filter(resume_id, current_user["user_id"]),
+        {
+            "$set": {"deleted_at": now, "updated_at": now},
+            "$unset": {field: "" for field in RESUME_DEFAULTS if field not in ("user_id", "version")},
+            "$inc": {"version": 1},
+        },
+    )
+    if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Resume not found")
+    await invalidate_cached_resumes(resume_id)
+    await revision_store.delete(resume_id)
+    search_index.remove(resume_id)
+    ats_scorer.invalidate(resume_id)
+    await notify_resume_change(current_user["user_id"], "deleted", resume_id)
     return {"message": "Resume deleted successfully"}
 
+@api_router.websocket("/resumes/changes")
+async def resume_changes(websocket: WebSocket, token: Optional[str] = None):
+    """Push an event for every change to the user's resumes, from any tab or device.
 
-# Include the router in the main app
-app.include_router(api_router)
+    Browsers cannot set headers on a WebSocket handshake, so the access token
+    may be passed as ``?token=``; a bearer header works too. Events are
+    ``{"type": "created"|"updated"|"deleted", "id", "version", "fields"}``,
+    or ``{"type": "resync"}`` when events were dropped because the client
+    read too slowly. Send ``{"type": "subscribe", "ids": [...]}`` to only
+    hear about some resumes, and ``{"type": "subscribe", "ids": null}`` to
+    hear about all of them again.
+    """
+    try:
+        claims = decode_token(token) if token else None
+        user_id = claims["user_id"] if claims else request_user_id(websocket.scope)
+    except jwt.PyJWTError:
+        user_id = None
+    if not user_id:
+        await websocket.close(code=1008)
+        return
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    await websocket.accept()
+    try:
+        subscription = notification_hub.subscribe(user_id, websocket.send_text, websocket.close)
+    except TooManySubscriptions:
+        await websocket.close(code=1013, reason="Too many open change subscriptions")
+        return
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if isinstance(message, dict) and message.get("type") == "subscribe":
+                ids = message.get("ids")
+                subscription.resume_ids = frozenset(map(str, ids[:RESUME_BATCH_MAX])) if isinstance(ids, list) else None
+    except WebSocketDisconnect:
+        pass
+    except (ValueError, KeyError):
+        # Not JSON, or a binary frame
+        await websocket.close(code=1003)
+    finally:
+        notification_hub.unsubscribe(subscription)
+
+
+# Token buckets per route group, keyed by user (or IP for anonymous requests and auth)
+def rate_limit_policy(group: str, rate: float, burst: int, key: str = "user") -> Policy:
+    setting = f"RATE_LIMIT_{group.upper()}"
+    return Policy(group, rate=float(os.environ.get(f"{setting}_PER_SECOND", rate)),
+                  burst=int(os.environ.get(f"{setting}_BURST", burst)), key=key)
+
+def build_rate_limiter() -> RateLimiter:
+    redis_url = os.environ.get('RATE_LIMIT_REDIS_URL')
+    if redis_url:
+        # Shared by all workers; redis is only required when this is configured
+        import redis.asyncio
+        buckets = SharedBuckets(redis.asyncio.from_url(redis_url))
+    else:
+        buckets = LocalBuckets(max_keys=int(os.environ.get('RATE_LIMIT_MAX_KEYS', '100000')))
+    policies = [
+        # bcrypt on every call, and the client is anonymous until it succeeds
+        rate_limit_policy("auth", rate=0.2, burst=10, key="ip"),
+        # Autosave sends about one PATCH per second per open editor
+        rate_limit_policy("writes", rate=10, burst=50),
+        rate_limit_policy("reads", rate=30, burst=120),
+    ]
+    return RateLimiter(policies, buckets, identify=request_user_id,
+                       trust_forwarded=os.environ.get('RATE_LIMIT_TRUST_FORWARDED') == '1')
+
+rate_limiter = build_rate_limiter() if os.environ.get('RATE_LIMIT_ENABLED', '1') == '1' else None
 
 # Configure logging
 logging.basicConfig(
@@ -307,6 +1517,91 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
+async def check_db_indexes():
+    # Opt-in (CI): refuse to start while any query shape is unindexed
+    if os.environ.get('MONGO_QUERY_PLAN_GUARD') == '1':
+        await ensure_indexes(db)
+        failures = await check_query_plans(db)
+        if failures:
+            raise RuntimeError("Unindexed query shapes: " + "; ".join(failures))
+
+async def start_write_buffer():
+    if write_buffer is not None:
+        write_buffer.start()
+
+async def start_search_index():
+    search_index.start(lambda: db.resumes, interval=SEARCH_REFRESH_SECONDS)
+
+async def warm_up():
+    # Off the startup path, so a worker boots (and reports not ready) even while MongoDB is unreachable
+    while True:
+        try:
+            await ensure_indexes(db)
+            await job_queue.start()
+            break
+        except PyMongoError:
+            logger.exception("Warm-up could not reach MongoDB, retrying")
+            await asyncio.sleep(1)
+    try:
+        await job_queue.warm_up()
+    except Exception:
+        logger.exception("Job pool warm-up failed")
+    while not search_index.ready:
+        await asyncio.sleep(0.1)
+    readiness["warmed_up"] = True
+    logger.info("Worker %d is ready", os.getpid())
+
+warm_up_task: Optional[asyncio.Task] = None
+
+async def start_notifications():
+    notification_hub.start()
+
+async def start_warm_up():
+    global warm_up_task
+    readiness.update(warmed_up=False, draining=False)
+    warm_up_task = asyncio.get_running_loop().create_task(warm_up())
+
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    # uvicorn has stopped accepting connections and waited for in-flight requests by now
+    readiness["draining"] = True
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    # Flush acknowledged autosaves before the connection goes away
+    if write_buffer is not None:
+        await write_buffer.stop()
+    await search_index.stop()
+    await notification_hub.stop()
+    await job_queue.stop()
+    client.close()
+    password_hasher.shutdown()
+
+def create_app() -> FastAPI:
+    """The ASGI app; ``launcher.py`` serves it with ``uvicorn --factory server:create_app``."""
+    application = FastAPI()
+    application.include_router(api_router)
+
+    # Innermost, so rejected requests are still measured and still get CORS headers
+    application.add_middleware(RateLimitMiddleware, limiter=lambda: rate_limiter)
+
+    application.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Added last, so it is outermost and latency covers CORS (preflights too) and every other layer
+    slow_request_ms = os.environ.get('SLOW_REQUEST_MS')
+    application.add_middleware(
+        metrics.MetricsMiddleware,
+        slow_request_seconds=float(slow_request_ms) / 1000 if slow_request_ms else None,
+    )
+
+    for handler in (check_db_indexes, start_write_buffer, start_search_index, start_notifications, start_warm_up):
+        application.add_event_handler("startup", handler)
+    application.add_event_handler("shutdown", shutdown_db_client)
+    return application
+
+# For ``uvicorn server:app``, the benchmarks and the test harnesses
+app = create_app()
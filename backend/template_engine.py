@@ -0,0 +1,168 @@
+"""Server-side HTML rendering of resumes with compiled templates.
+
+Templates are the ``*.html`` files of one directory, read once and
+compiled into Python functions, so rendering is plain string building with
+no parsing. Files starting with ``_`` are partials: they can only be
+pulled in with ``include`` and are not templates of their own.
+
+The syntax is a small, logic-less subset of Jinja:
+
+* ``{{ resume.personal_info.full_name }}``: HTML-escaped value of a dotted
+  path; missing keys render as nothing.
+* ``{{ experience.description|rich }}``: rich-text editor HTML, reduced to
+  ``rich_text.RICH_TEXT_TAGS`` with every attribute dropped. Stored HTML is
+  already normalized; sanitizing again covers documents written before it
+  was.
+* ``{% if path %}``/``{% if not path %}``, ``{% else %}``, ``{% endif %}``.
+* ``{% for item in path %}``/``{% endfor %}``.
+* ``{% include "_partial.html" %}``, inlined at compile time.
+"""
+import html
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from rich_text import sanitize
+
+_TOKEN = re.compile(r"({{.*?}}|{%.*?%})", re.S)
+_PATH = re.compile(r"[A-Za-z_]\w*(?:\.\w+)*")
+
+
+class TemplateError(Exception):
+    pass
+
+
+class TemplateNotFound(TemplateError, KeyError):
+    pass
+
+
+def _attr(value: Any, parts: Tuple[str, ...]) -> Any:
+    for part in parts:
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, list) and part.isdigit():
+            value = value[int(part)] if int(part) < len(value) else None
+        else:
+            return None
+    return value
+
+
+def _escape(value: Any) -> str:
+    if value is None or value is False:
+        return ""
+    return html.escape(str(value))
+
+
+def _iterate(value: Any) -> List[Any]:
+    return value if isinstance(value, list) else []
+
+
+class _Compiler:
+    def __init__(self, sources: Dict[str, str]):
+        self.sources = sources
+        self.lines: List[str] = []
+        self.blocks: List[str] = []
+        # Template loop variable -> Python local, innermost last
+        self.loop_vars: List[Tuple[str, str]] = []
+        self.text: List[str] = []
+
+    def emit(self, line: str) -> None:
+        self.flush_text()
+        self.lines.append("    " * (len(self.blocks) + 1) + line)
+
+    def flush_text(self) -> None:
+        if self.text:
+            text = "".join(self.text)
+            self.text = []
+            if text:
+                self.lines.append("    " * (len(self.blocks) + 1) + f"write({text!r})")
+
+    def expression(self, source: str, where: str) -> str:
+        source = source.strip()
+        if not _PATH.fullmatch(source):
+            raise TemplateError(f"{where}: expected a dotted name, got {source!r}")
+        first, *rest = source.split(".")
+        base = next((local for name, local in reversed(self.loop_vars) if name == first), None)
+        base = base or f"context.get({first!r})"
+        return f"attr({base}, {tuple(rest)!r})" if rest else base
+
+    def compile_template(self, name: str, including: Tuple[str, ...] = ()) -> None:
+        if name in including:
+            raise TemplateError(f"Include cycle: {' -> '.join(including + (name,))}")
+        if name not in self.sources:
+            raise TemplateNotFound(name)
+        for token in _TOKEN.split(self.sources[name]):
+            where = f"{name}: {token[:40]!r}"
+            if token.startswith("{{"):
+                source, _, filter_name = token[2:-2].partition("|")
+                value = self.expression(source, where)
+                if filter_name.strip() == "rich":
+                    self.emit(f"write(rich({value}))")
+                elif filter_name.strip():
+                    raise TemplateError(f"{where}: unknown filter {filter_name.strip()!r}")
+                else:
+                    self.emit(f"write(escape({value}))")
+            elif token.startswith("{%"):
+                self.statement(token[2:-2].split(), where, including + (name,))
+            else:
+                self.text.append(token)
+
+    def statement(self, words: List[str], where: str, including: Tuple[str, ...]) -> None:
+        keyword = words[0] if words else ""
+        if keyword == "if" and len(words) in (2, 3):
+            negate = len(words) == 3
+            if negate and words[1] != "not":
+                raise TemplateError(f"{where}: expected 'if not <name>'")
+            self.emit(f"if {'not ' if negate else ''}{self.expression(words[-1], where)}:")
+            self.blocks.append("if")
+        elif keyword == "else" and self.blocks and self.blocks[-1] == "if":
+            self.emit("pass")
+            self.blocks[-1] = "else"
+            self.lines.append("    " * len(self.blocks) + "else:")
+        elif keyword == "for" and len(words) == 4 and words[2] == "in":
+            local = f"item{len(self.lines)}"
+            self.emit(f"for {local} in iterate({self.expression(words[3], where)}):")
+            self.blocks.append("for")
+            self.loop_vars.append((words[1], local))
+        elif keyword in ("endif", "endfor") and self.blocks and self.blocks[-1].replace("else", "if") == keyword[3:]:
+            self.emit("pass")
+            self.blocks.pop()
+            if keyword == "endfor":
+                self.loop_vars.pop()
+        elif keyword == "include" and len(words) == 2:
+            self.compile_template(words[1].strip("\"'"), including)
+        else:
+            raise TemplateError(f"{where}: unexpected {' '.join(words)!r}")
+
+    def build(self, name: str) -> Callable[[Dict[str, Any]], str]:
+        self.compile_template(name)
+        if self.blocks:
+            raise TemplateError(f"{name}: unclosed {self.blocks[-1]}")
+        self.flush_text()
+        source = "\n".join(["def render(context):", "    out = []", "    write = out.append",
+                            *self.lines, "    return ''.join(out)"])
+        namespace = {"attr": _attr, "escape": _escape, "rich": sanitize, "iterate": _iterate}
+        exec(compile(source, f"<template {name}>", "exec"), namespace)
+        return namespace["render"]
+
+
+class TemplateEngine:
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        sources = {path.name: path.read_text(encoding="utf-8") for path in sorted(self.directory.glob("*.html"))}
+        self._compiled: Dict[str, Callable[[Dict[str, Any]], str]] = {
+            name[:-len(".html")]: _Compiler(sources).build(name)
+            for name in sources if not name.startswith("_")
+        }
+
+    @property
+    def template_ids(self) -> List[str]:
+        return list(self._compiled)
+
+    def render(self, template_id: str, resume: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> str:
+        """Render ``resume`` (a stored or ``ResumeData`` dict) with one of the templates."""
+        try:
+            template = self._compiled[template_id]
+        except KeyError:
+            raise TemplateNotFound(template_id) from None
+        return template({**(context or {}), "resume": resume, "template_id": template_id})
@@ -0,0 +1,139 @@
+"""Small PNG previews of resumes for the resume list.
+
+A thumbnail is a miniature of the page in the resume's template: the
+template's background, header band and accent colour, the name, and one
+grey bar per line of text, so the list shows each resume's shape and
+length at a glance. It is drawn directly with Pillow (at twice the size,
+then downsampled) rather than by rasterizing the HTML, which would need a
+browser.
+
+Thumbnails are cached under the same content hash as PDFs, so one is only
+drawn again after the resume's content or template changes.
+"""
+import io
+import math
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+from pdf_export import DEFAULT_TEMPLATE, PdfRenderCache, content_hash
+from search_index import tokenize
+
+THUMBNAIL_SIZE = (120, 170)
+_SCALE = 2
+
+# background, text, accent, header background (None: no band), centered header
+THEMES: Dict[str, Tuple[str, str, str, Optional[str], bool]] = {
+    "template1": ("#ffffff", "#1f2937", "#1f2937", None, False),
+    "template2": ("#ffffff", "#111827", "#2563eb", None, False),
+    "template3": ("#f9fafb", "#1f2937", "#374151", None, True),
+    "template4": ("#ffffff", "#111827", "#111827", "#111827", False),
+    "template5": ("#ffffff", "#1f2937", "#4b5563", "#f3f4f6", False),
+    "template6": ("#eff6ff", "#111827", "#4338ca", "#4f46e5", False),
+    "template7": ("#ffffff", "#1f2937", "#1d4ed8", None, False),
+    "template8": ("#111827", "#ffffff", "#374151", "#ffffff", False),
+    "template9": ("#ffffff", "#1f2937", "#9ca3af", "#f3f4f6", False),
+    "template10": ("#faf5ff", "#111827", "#7e22ce", "#ffffff", True),
+}
+# Average characters per line of body text on the page
+_CHARS_PER_LINE = 90
+
+
+def _font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def _blend(color: str, background: str, amount: float) -> Tuple[int, int, int]:
+    return tuple(round(x * amount + y * (1 - amount))
+                 for x, y in zip(ImageColor.getrgb(color), ImageColor.getrgb(background)))
+
+
+def _text_length(value: Any) -> int:
+    return sum(len(token) + 1 for token in tokenize(value)) if isinstance(value, str) else 0
+
+
+def render_thumbnail(resume: Dict[str, Any], template_id: Optional[str] = None) -> bytes:
+    """PNG bytes of a ``THUMBNAIL_SIZE`` miniature of ``resume``."""
+    template_id = template_id or resume.get("template_id") or DEFAULT_TEMPLATE
+    background, text, accent, header_bg, centered = THEMES.get(template_id, THEMES[DEFAULT_TEMPLATE])
+    width, height = THUMBNAIL_SIZE[0] * _SCALE, THUMBNAIL_SIZE[1] * _SCALE
+    margin = 16
+    image = Image.new("RGB", (width, height), background)
+    draw = ImageDraw.Draw(image)
+    line_color = _blend(text, background, 0.25)
+
+    info = resume.get("personal_info") or {}
+    name = info.get("full_name") or resume.get("title") or "Your Name"
+    header_text = text
+    if header_bg:
+        draw.rectangle([0, 0, width, 64], fill=header_bg)
+        header_text = "#ffffff" if header_bg in ("#111827", "#4f46e5") else "#111827"
+    font = _font(18)
+    name_width = draw.textlength(name, font=font)
+    x = (width - name_width) / 2 if centered else margin
+    draw.text((x, 16), name, fill=header_text, font=font)
+    contact_width = width * 0.45
+    x = (width - contact_width) / 2 if centered else margin
+    draw.rectangle([x, 44, x + contact_width, 48], fill=_blend(header_text, header_bg or background, 0.35))
+    y = 80
+
+    def section(lines: int) -> None:
+        nonlocal y
+        if y > height - margin:
+            return
+        draw.rectangle([margin, y, margin + width * 0.35, y + 6], fill=accent)
+        y += 14
+        for line in range(lines):
+            if y > height - margin:
+                return
+            # Ragged right edge, stable for a given resume
+            right = width - margin - (0 if line % 3 else 24) - (12 if line == lines - 1 else 0)
+            draw.rectangle([margin, y, right, y + 3], fill=line_color)
+            y += 8
+        y += 8
+
+    def lines_for(*values: Any) -> int:
+        return max(1, math.ceil(sum(_text_length(value) for value in values) / _CHARS_PER_LINE))
+
+    if info.get("summary"):
+        section(lines_for(info["summary"]))
+    for key, fields in (("experience", ("title", "company", "description")),
+                        ("education", ("degree", "institution")),
+                        ("projects", ("name", "description", "technologies"))):
+        entries = [entry for entry in resume.get(key) or [] if isinstance(entry, dict)]
+        if entries:
+            section(sum(lines_for(*(entry.get(field) for field in fields)) for entry in entries))
+    skills = [skill for skill in resume.get("skills") or [] if isinstance(skill, str)]
+    if skills and y < height - margin:
+        draw.rectangle([margin, y, margin + width * 0.35, y + 6], fill=accent)
+        y += 14
+        x = margin
+        for skill in skills:
+            pill = 10 + 4 * min(len(skill), 12)
+            if x + pill > width - margin:
+                x, y = margin, y + 12
+            if y > height - margin:
+                break
+            draw.rounded_rectangle([x, y, x + pill, y + 8], radius=4, fill=_blend(accent, background, 0.3))
+            x += pill + 6
+
+    image = image.resize(THUMBNAIL_SIZE, Image.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format="PNG", optimize=False)
+    return output.getvalue()
+
+
+class ThumbnailCache(PdfRenderCache):
+    """Bounded LRU of thumbnails keyed by content hash."""
+
+    def render(self, resume: Dict[str, Any], template_id: Optional[str] = None) -> bytes:
+        key = content_hash(resume, template_id)
+        thumbnail = self.get(key)
+        if thumbnail is None:
+            thumbnail = render_thumbnail(resume, template_id)
+            self.put(key, thumbnail)
+        return thumbnail
@@ -0,0 +1,237 @@
+"""Write-behind buffer that coalesces autosave updates.
+
+Editors autosave every few seconds, and most saves only `$set` a handful of
+fields on the same resume. ``WriteBehindBuffer.stage`` merges those writes in
+memory, acknowledges them immediately with the next version number, and a
+background task flushes the merged state to MongoDB with one ``bulk_write``
+per interval. ``overlay`` applies still-pending writes to documents read
+from MongoDB, so the writer always reads its own writes. Anything other
+readers can observe (revisions, change notifications) is driven from
+``on_flush``, after the write has committed.
+
+Only plain ``$set`` updates without positional paths are buffered; callers
+route anything else (``$push``/``$pull``, list indices) straight to MongoDB
+after ``flush_one``. Pending state is per process: deployments with several
+workers should route a given resume's traffic to one worker.
+"""
+import asyncio
+import copy
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+staged_writes = metrics.registry.register(metrics.Counter(
+    "write_behind_staged_total", "Resume writes acknowledged from the write-behind buffer"))
+flushed_documents = metrics.registry.register(metrics.Counter(
+    "write_behind_flushed_documents_total", "Coalesced resume documents written to MongoDB"))
+bulk_writes = metrics.registry.register(metrics.Counter(
+    "write_behind_bulk_writes_total", "bulk_write calls issued by the write-behind buffer", ("outcome",)))
+pending_gauge = metrics.registry.register(metrics.Gauge(
+    "write_behind_pending_documents", "Resumes with writes waiting to be flushed"))
+
+
+class ResumeNotFound(Exception):
+    pass
+
+
+class VersionConflict(Exception):
+    pass
+
+
+@dataclass
+class PendingWrite:
+    resume_id: str
+    user_id: str
+    version: int
+    created_at: Optional[datetime]
+    updated_at: datetime
+    fields: Dict[str, Any] = field(default_factory=dict)
+
+
+def set_path(target: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        child = target.get(part)
+        if not isinstance(child, dict):
+            child = target[part] = {}
+        target = child
+    target[parts[-1]] = value
+
+
+def _merge_fields(fields: Dict[str, Any], updates: Dict[str, Any]) -> None:
+    """Fold ``$set`` paths into ``fields`` the way MongoDB would apply them in sequence."""
+    for path, value in updates.items():
+        # A parent already pending as a whole object absorbs the nested change
+        parts = path.split(".")
+        parent = next((".".join(parts[:i]) for i in range(1, len(parts))
+                       if ".".join(parts[:i]) in fields and isinstance(fields[".".join(parts[:i])], dict)), None)
+        if parent is not None:
+            fields[parent] = copy.deepcopy(fields[parent])
+            set_path(fields[parent], path[len(parent) + 1:], copy.deepcopy(value))
+            continue
+        # Replacing an object supersedes pending changes beneath it
+        for pending in [p for p in fields if p.startswith(path + ".")]:
+            del fields[pending]
+        fields[path] = copy.deepcopy(value)
+
+
+class WriteBehindBuffer:
+    def __init__(self, collection: Callable[[], Any], flush_interval: float = 1.0,
+                 max_pending: int = 1000, max_batch: int = 500,
+                 on_flush: Optional[Callable[[List["PendingWrite"]], Awaitable[None]]] = None):
+        # Resolved on every use so the database handle can be swapped (tests, benchmarks)
+        self._collection = collection
+        # Called with every batch of writes once committed, e.g. to record revisions and publish changes
+        self._on_flush = on_flush
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self._pending: Dict[str, PendingWrite] = {}
+        self._inflight: Dict[str, PendingWrite] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _latest(self, resume_id: str) -> Optional[PendingWrite]:
+        return self._pending.get(resume_id) or self._inflight.get(resume_id)
+
+    async def stage(self, resume_id: str, user_id: str, updates: Dict[str, Any],
+                    if_match: Optional[List[int]] = None) -> PendingWrite:
+        """Merge a ``$set`` update and return the acknowledged pending state."""
+        latest = self._latest(resume_id)
+        if latest is None:
+            stored = await self._collection().find_one(
+                {"id": resume_id, "user_id": user_id, "deleted_at": None}, {"_id": 0, "version": 1, "created_at": 1})
+            if stored is None:
+                raise ResumeNotFound(resume_id)
+            # Another request may have staged this resume while we were reading
+            latest = self._latest(resume_id)
+            base_version, created_at = stored.get("version", 0), stored.get("created_at")
+        if latest is not None:
+            if latest.user_id != user_id:
+                raise ResumeNotFound(resume_id)
+            base_version, created_at = latest.version, latest.created_at
+
+        if if_match is not None and base_version not in if_match:
+            raise VersionConflict(resume_id)
+
+        pending = self._pending.get(resume_id)
+        if pending is None:
+            pending = self._pending[resume_id] = PendingWrite(
+                resume_id=resume_id, user_id=user_id, version=base_version,
+                created_at=created_at, updated_at=datetime.utcnow())
+        _merge_fields(pending.fields, updates)
+        pending.version = base_version + 1
+        pending.updated_at = datetime.utcnow()
+        staged_writes.inc()
+        pending_gauge.set(len(self._pending))
+
+        if len(self._pending) >= self.max_pending:
+            await self.flush()
+        return pending
+
+    def overlay(self, resume: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply pending writes for ``resume`` (a stored document or projection of one)."""
+        writes = [w for w in (self._inflight.get(resume.get("id")), self._pending.get(resume.get("id"))) if w]
+        if not writes:
+            return resume
+        resume = copy.deepcopy(resume)
+        for write in writes:
+            for path, value in write.fields.items():
+                set_path(resume, path, copy.deepcopy(value))
+            resume["version"] = write.version
+            resume["updated_at"] = write.updated_at
+        return resume
+
+    def has_pending(self, user_id: str) -> bool:
+        return any(w.user_id == user_id for w in (*self._pending.values(), *self._inflight.values()))
+
+    def discard(self, resume_id: str, user_id: str) -> None:
+        pending = self._pending.get(resume_id)
+        if pending is not None and pending.user_id == user_id:
+            del self._pending[resume_id]
+            pending_gauge.set(len(self._pending))
+
+    async def flush_one(self, resume_id: str) -> None:
+        """Write one resume's pending state now, e.g. before a non-bufferable update."""
+        if resume_id in self._pending or resume_id in self._inflight:
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._inflight, self._pending = self._pending, {}
+            pending_gauge.set(0)
+            writes = list(self._inflight.values())
+            try:
+                for start in range(0, len(writes), self.max_batch):
+                    batch = writes[start:start + self.max_batch]
+                    # $max keeps the version monotonic if another writer got there first
+                    operations = [
+                        UpdateOne({"id": w.resume_id, "user_id": w.user_id, "deleted_at": None},
+                                  {"$set": {**w.fields, "updated_at": w.updated_at}, "$max": {"version": w.version}})
+                        for w in batch
+                    ]
+                    try:
+                        await self._collection().bulk_write(operations, ordered=False)
+                    except Exception:
+                        bulk_writes.inc("failure")
+                        logger.exception("Write-behind flush failed; re-queueing %d resumes", len(writes) - start)
+                        self._requeue(writes[start:])
+                        return
+                    bulk_writes.inc("success")
+                    flushed_documents.inc(amount=len(batch))
+                    if self._on_flush is not None:
+                        try:
+                            await self._on_flush(batch)
+                        except Exception:
+                            logger.exception("Write-behind flush hook failed")
+            finally:
+                self._inflight = {}
+
+    def _requeue(self, writes: List[PendingWrite]) -> None:
+        for write in writes:
+            newer = self._pending.get(write.resume_id)
+            if newer is not None:
+                # Older fields first, then the newer pending changes on top
+                merged = dict(write.fields)
+                _merge_fields(merged, newer.fields)
+                newer.fields = merged
+            else:
+                self._pending[write.resume_id] = write
+        pending_gauge.set(len(self._pending))
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Write-behind flush loop error")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and durably write everything still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for _ in range(3):
+            await self.flush()
+            if not self._pending:
+                return
+        if self._pending:
+            logger.error("Write-behind buffer shut down with %d unflushed resumes", len(self._pending))
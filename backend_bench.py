@@ -0,0 +1,1082 @@
+"""Local load and latency benchmarks for the Resume Creator API.
+
+By default the FastAPI app is booted in-process against an in-memory
+MongoDB stand-in (mongomock-motor), so the suite needs no network, no
+database and no running server. Pass --base-url to drive a real
+deployment instead (e.g. uvicorn on localhost:8001 with a real MongoDB).
+
+    python backend_bench.py                       # everything, in-process
+    python backend_bench.py bench_endpoints -c 32 -n 500
+    python backend_bench.py --base-url http://localhost:8001 --output before.json
+
+Results are written as JSON (--output) so runs can be diffed across commits.
+"""
+import argparse
+import asyncio
+import copy
+import inspect
+import io
+import json
+import os
+import platform
+import secrets
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+# The benches drive far more requests per user than the API allows; bench_rate_limit installs its own limiter
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+# Tokens only need to verify within this run (and the servers it starts)
+os.environ.setdefault("JWT_SECRET_KEY", secrets.token_urlsafe(32))
+os.environ.setdefault("METRICS_TOKEN", secrets.token_urlsafe(32))
+METRICS_HEADERS = {"Authorization": f"Bearer {os.environ['METRICS_TOKEN']}"}
+
+SAMPLE_RESUME = {
+    "title": "Benchmark Resume",
+    "template_id": "template1",
+    "personal_info": {
+        "full_name": "John Doe",
+        "email": "john.doe@example.com",
+        "phone": "(555) 123-4567",
+        "location": "New York, NY",
+        "linkedin": "linkedin.com/in/johndoe",
+        "website": "johndoe.com",
+        "summary": "<p>Experienced software developer with 5+ years in web development, "
+                   "building <strong>scalable</strong> APIs and React frontends.</p>",
+    },
+    "experience": [
+        {
+            "title": f"Software Engineer {i}",
+            "company": f"Tech Corp {i}",
+            "location": "San Francisco, CA",
+            "start_date": "Jan 2020",
+            "end_date": "Dec 2022",
+            "current": False,
+            "description": "<ul><li>Led development of web applications using React and Node.js.</li>"
+                           "<li>Cut API latency by 40% with caching and query tuning.</li>"
+                           "<li>Mentored four engineers and ran the on-call rotation.</li></ul>",
+        }
+        for i in range(6)
+    ],
+    "education": [
+        {
+            "degree": "Bachelor of Science in Computer Science",
+            "institution": "University of Technology",
+            "location": "Boston, MA",
+            "graduation_date": "May 2019",
+            "gpa": "3.8",
+        }
+    ],
+    "skills": ["JavaScript", "React", "Node.js", "Python", "MongoDB", "FastAPI", "Docker", "AWS"],
+    "projects": [
+        {
+            "name": f"Project {i}",
+            "description": "Built a full-stack e-commerce platform with payment integration.",
+            "technologies": "React, Node.js, MongoDB, Stripe",
+            "link": f"https://github.com/johndoe/project{i}",
+        }
+        for i in range(4)
+    ],
+}
+
+
+# Vocabulary for synthetic search corpora
+SEARCH_SKILLS = [
+    "Python", "JavaScript", "TypeScript", "React", "Node.js", "Go", "Rust", "Java", "Kotlin", "Swift",
+    "C++", "C#", "Ruby", "PHP", "Scala", "Elixir", "PostgreSQL", "MySQL", "MongoDB", "Redis",
+    "Kafka", "RabbitMQ", "Docker", "Kubernetes", "Terraform", "AWS", "GCP", "Azure", "GraphQL", "gRPC",
+    "Django", "Flask", "FastAPI", "Spring", "Rails", "Vue", "Angular", "Svelte", "Pandas", "NumPy",
+    "PyTorch", "TensorFlow", "Spark", "Airflow", "dbt", "Snowflake", "Linux", "Bash", "Git", "CI/CD",
+]
+SEARCH_ROLES = ["Engineer", "Developer", "Architect", "Analyst", "Scientist", "Manager", "Designer", "Consultant"]
+SEARCH_LEVELS = ["Junior", "Senior", "Staff", "Principal", "Lead", "Backend", "Frontend", "Data"]
+SEARCH_WORDS = (
+    "built designed scaled migrated led mentored shipped reduced improved automated owned launched "
+    "distributed systems services pipelines platform latency throughput reliability customers revenue "
+    "team features infrastructure observability testing deployment architecture analytics dashboards "
+    "payments search recommendations billing onboarding mobile web realtime streaming batch cloud"
+).split()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.mean(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+class ResumeCreatorBenchmark:
+    def __init__(self, base_url=None, concurrency=16, requests_per_endpoint=200, auth_requests=32,
+                 listing_resumes=500, iterations=20, search_resumes=200_000):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.requests_per_endpoint = requests_per_endpoint
+        self.auth_requests = auth_requests
+        self.listing_resumes = listing_resumes
+        self.iterations = iterations
+        self.search_resumes = search_resumes
+        self.results = {}
+        self.client = None
+        self.server = None
+
+    async def __aenter__(self):
+        if self.base_url:
+            self.client = httpx.AsyncClient(base_url=self.base_url, timeout=60)
+        else:
+            # In-process: the real app, with Mongo swapped for an in-memory stand-in
+            import mongomock_motor
+            import server
+
+            self.server = server
+            server.client = mongomock_motor.AsyncMongoMockClient()
+            server.db = server.client["benchmark"]
+            await server.app.router.startup()
+            self.client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=server.app), base_url="http://bench", timeout=60)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+        if self.server is not None:
+            await self.server.app.router.shutdown()
+
+    def record(self, name, **metrics):
+        self.results[name] = metrics
+        print(f"\n📈 {name}")
+        for key, value in metrics.items():
+            print(f"   {key}: {value:.2f}" if isinstance(value, float) else f"   {key}: {value}")
+
+    async def drive(self, name, make_request, total=None, concurrency=None, expected=(200, 201)):
+        """Issue ``total`` requests from ``concurrency`` workers and record latency percentiles.
+
+        ``make_request(i)`` returns the awaitable for the i-th request.
+        """
+        total = total or self.requests_per_endpoint
+        concurrency = min(concurrency or self.concurrency, total)
+        samples, statuses, counter = [], {}, iter(range(total))
+
+        async def worker():
+            for i in counter:
+                start = time.perf_counter()
+                try:
+                    status = (await make_request(i)).status_code
+                except httpx.HTTPError:
+                    status = "error"
+                samples.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+        failures = sum(count for status, count in statuses.items() if status not in expected)
+        self.record(name, concurrency=concurrency, requests_per_sec=total / elapsed, failures=failures,
+                    statuses={str(status): count for status, count in statuses.items()}, **summarize(samples))
+        return samples
+
+    async def register_user(self):
+        email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+        response = await self.client.post("/api/register", json={
+            "email": email, "full_name": "Bench User", "password": "bench-password"})
+        response.raise_for_status()
+        return email, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def create_resumes(self, headers, count):
+        ids = []
+
+        async def create(i):
+            response = await self.client.post("/api/resumes", json={**SAMPLE_RESUME, "title": f"Resume {i}"},
+                                              headers=headers)
+            if response.status_code == 201:
+                ids.append(response.json()["id"])
+            return response
+
+        await self.drive(f"seed.create_resume.{count}", create, total=count)
+        return ids
+
+    async def bench_endpoints(self):
+        """Throughput and p50/p95/p99 per endpoint at the configured concurrency"""
+        await self.drive("templates", lambda i: self.client.get("/api/templates"))
+
+        emails = []
+
+        async def register(i):
+            email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+            emails.append(email)
+            return await self.client.post("/api/register", json={
+                "email": email, "full_name": "Bench User", "password": "bench-password"})
+
+        await self.drive("register", register, total=self.auth_requests)
+        await self.drive("login", lambda i: self.client.post("/api/login", json={
+            "email": emails[i % len(emails)], "password": "bench-password"}), total=self.auth_requests)
+
+        _, headers = await self.register_user()
+        ids = await self.create_resumes(headers, self.requests_per_endpoint)
+        await self.drive("get_resume", lambda i: self.client.get(f"/api/resumes/{ids[i % len(ids)]}",
+                                                                 headers=headers))
+        await self.drive("update_resume", lambda i: self.client.put(
+            f"/api/resumes/{ids[i % len(ids)]}", json={**SAMPLE_RESUME, "title": f"Updated {i}"}, headers=headers))
+        await self.drive("patch_resume", lambda i: self.client.patch(
+            f"/api/resumes/{ids[i % len(ids)]}", json={"personal_info": {"summary": f"Summary {i}"}},
+            headers=headers))
+        await self.drive("delete_resume", lambda i: self.client.delete(f"/api/resumes/{ids[i]}", headers=headers),
+                         total=len(ids))
+
+    async def bench_listing(self):
+        """First page and full keyset walk of a user's list with N stored resumes"""
+        _, headers = await self.register_user()
+        await self.create_resumes(headers, self.listing_resumes)
+
+        await self.drive(f"get_resumes.first_page.{self.listing_resumes}",
+                         lambda i: self.client.get("/api/resumes", params={"limit": 20}, headers=headers))
+
+        async def walk(i):
+            cursor, response = None, None
+            while True:
+                params = {"limit": 100, **({"cursor": cursor} if cursor else {})}
+                response = await self.client.get("/api/resumes", params=params, headers=headers)
+                cursor = response.json().get("next_cursor")
+                if response.status_code != 200 or not cursor:
+                    return response
+
+        await self.drive(f"get_resumes.full_walk.{self.listing_resumes}", walk,
+                         total=max(1, self.requests_per_endpoint // 20))
+
+    async def bench_sync(self):
+        """Steady-state refresh of N resumes: delta sync vs. re-downloading the list"""
+        _, headers = await self.register_user()
+        ids = await self.create_resumes(headers, self.listing_resumes)
+        watermark = (await self.client.get("/api/resumes/sync", headers=headers)).json()["next_cursor"]
+        while True:
+            page = (await self.client.get("/api/resumes/sync", params={"since": watermark}, headers=headers)).json()
+            watermark = page["next_cursor"]
+            if not page["has_more"]:
+                break
+
+        await self.drive(f"get_resumes.refresh_full.{self.listing_resumes}",
+                         lambda i: self.client.get("/api/resumes", params={"limit": 100}, headers=headers))
+        await self.drive(f"resumes_sync.unchanged.{self.listing_resumes}",
+                         lambda i: self.client.get("/api/resumes/sync", params={"since": watermark},
+                                                   headers=headers))
+
+        await self.client.patch(f"/api/resumes/{ids[0]}", json={"title": "Changed"}, headers=headers)
+        await self.client.delete(f"/api/resumes/{ids[1]}", headers=headers)
+        await self.drive(f"resumes_sync.two_changes.{self.listing_resumes}",
+                         lambda i: self.client.get("/api/resumes/sync", params={"since": watermark},
+                                                   headers=headers))
+
+    async def scrape_metric(self, name):
+        response = await self.client.get("/api/metrics", headers=METRICS_HEADERS)
+        return sum(float(line.rsplit(" ", 1)[1]) for line in response.text.splitlines()
+                   if line.startswith(name))
+
+    async def bench_autosave(self, resumes=20, saves_per_resume=10):
+        """Autosave bursts: PATCH latency and how many Mongo writes the write-behind buffer issued"""
+        _, headers = await self.register_user()
+        ids = await self.create_resumes(headers, resumes)
+        staged = await self.scrape_metric("write_behind_staged_total")
+        flushed = await self.scrape_metric("write_behind_flushed_documents_total")
+
+        await self.drive(f"patch_resume.autosave.{resumes}x{saves_per_resume}",
+                         lambda i: self.client.patch(
+                             f"/api/resumes/{ids[i % len(ids)]}",
+                             json={"personal_info": {"summary": f"Draft {i}"}}, headers=headers),
+                         total=resumes * saves_per_resume)
+
+        # Let at least one flush interval pass so the burst reaches Mongo
+        await asyncio.sleep(float(os.environ.get("WRITE_BEHIND_FLUSH_MS", "1000")) / 1000 + 0.5)
+        staged = await self.scrape_metric("write_behind_staged_total") - staged
+        flushed = await self.scrape_metric("write_behind_flushed_documents_total") - flushed
+        self.record("write_behind.coalescing", staged_writes=int(staged), mongo_documents_written=int(flushed),
+                    coalescing_ratio=staged / flushed if flushed else 0.0)
+
+    async def bench_revisions(self, revisions=300):
+        """Revision history of one resume with hundreds of autosaves: storage and materialization latency"""
+        if self.server is None:
+            print("⏭️  bench_revisions seeds history in-process; skipped with --base-url")
+            return
+        import bson
+
+        store = self.server.revision_store
+        _, headers = await self.register_user()
+        resume = (await self.client.post("/api/resumes", json=SAMPLE_RESUME, headers=headers)).json()
+        full_copy_bytes, record_times = 0, []
+        for version in range(2, revisions + 2):
+            # Typical autosave edits: one field of the summary or of an experience entry
+            resume = copy.deepcopy(resume)
+            resume["version"] = version
+            if version % 3:
+                resume["personal_info"]["summary"] = f"<p>Summary draft {version}</p>"
+            else:
+                entry = resume["experience"][version % len(resume["experience"])]
+                entry["description"] += f"<p>Edit {version}</p>"
+            if version % 50 == 0:
+                resume["skills"] = resume["skills"] + [f"Skill {version}"]
+            full_copy_bytes += len(bson.encode(store.content(resume)))
+            start = time.perf_counter()
+            await store.record(resume)
+            record_times.append(time.perf_counter() - start)
+
+        stored = await self.server.db.resume_revisions.find({"resume_id": resume["id"]}).to_list(None)
+        stored_bytes = sum(len(bson.encode(doc)) for doc in stored)
+        self.record(f"revisions.storage.{revisions}", revisions=len(stored),
+                    snapshots=sum(1 for doc in stored if doc["kind"] == "snapshot"),
+                    stored_kib=stored_bytes / 1024, full_copies_kib=full_copy_bytes / 1024,
+                    compression_ratio=full_copy_bytes / stored_bytes,
+                    **{f"record_{key}": value for key, value in summarize(record_times).items()})
+
+        numbers = [doc["revision"] for doc in stored]
+        await self.drive(f"get_resume_revision.random.{revisions}",
+                         lambda i: self.client.get(f"/api/resumes/{resume['id']}/revisions/{numbers[i * 7919 % len(numbers)]}",
+                                                   headers=headers))
+        await self.drive(f"list_resume_revisions.first_page.{revisions}",
+                         lambda i: self.client.get(f"/api/resumes/{resume['id']}/revisions", headers=headers))
+
+    @staticmethod
+    def synthetic_resume(rng, user_id):
+        skills = rng.sample(SEARCH_SKILLS, 8)
+        return {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "skills": skills,
+            "personal_info": {"summary": " ".join(rng.choices(SEARCH_WORDS, k=30))},
+            "experience": [
+                {"title": f"{rng.choice(SEARCH_LEVELS)} {rng.choice(SEARCH_ROLES)}",
+                 "company": f"Company {rng.randrange(5000)}",
+                 "description": "<ul><li>" + " ".join(rng.choices(SEARCH_WORDS + skills, k=40)) + "</li></ul>"}
+                for _ in range(3)
+            ],
+            "projects": [{"technologies": ", ".join(rng.sample(skills, 3))}],
+        }
+
+    async def bench_search(self):
+        """Ranked search latency with N resumes indexed: 10 per typical user plus one user holding 5%"""
+        import random
+
+        from search_index import SearchIndex
+
+        rng = random.Random(7)
+        heavy_user, heavy_share = "heavy-user", max(1, self.search_resumes // 20)
+        index = SearchIndex()
+        start = time.perf_counter()
+        for i in range(self.search_resumes):
+            user_id = heavy_user if i < heavy_share else f"user-{i // 10}"
+            index.update(self.synthetic_resume(rng, user_id))
+        build_seconds = time.perf_counter() - start
+        self.record(f"search_index.build.{self.search_resumes}", resumes=len(index),
+                    seconds=build_seconds, resumes_per_sec=len(index) / build_seconds)
+
+        queries = [
+            ("text", {"query": "senior backend engineer python"}),
+            ("skill_prefix", {"skills": ["pyt"]}),
+            ("text_and_skill", {"query": "distributed systems", "skills": ["kub"]}),
+        ]
+        for user_label, user_id in (("typical_user", "user-500"), (f"heavy_user_{heavy_share}", heavy_user)):
+            for label, query in queries:
+                samples = []
+                for _ in range(self.iterations * 10):
+                    start = time.perf_counter()
+                    index.search(user_id, limit=20, **query)
+                    samples.append(time.perf_counter() - start)
+                self.record(f"search_index.{user_label}.{label}.{self.search_resumes}", **summarize(samples))
+
+        # End to end: the app's own index holds the synthetic corpus plus this user's stored resumes
+        _, headers = await self.register_user()
+        await self.create_resumes(headers, 50)
+        if self.server is not None:
+            for i in range(self.search_resumes):
+                self.server.search_index.update(self.synthetic_resume(rng, f"user-{i // 10}"))
+        await self.drive(f"search_resumes.text.{self.search_resumes}",
+                         lambda i: self.client.get("/api/resumes/search", params={"q": "python react"},
+                                                   headers=headers))
+        await self.drive(f"search_resumes.skill_prefix.{self.search_resumes}",
+                         lambda i: self.client.get("/api/resumes/search", params={"skill": "pyth"},
+                                                   headers=headers))
+
+    async def bench_ats_scoring(self, resumes=5000):
+        """Batch ATS scoring from cached term vectors vs. re-tokenizing every resume per request"""
+        import random
+
+        from ats_scoring import AtsScorer
+
+        rng = random.Random(11)
+        corpus = [{**self.synthetic_resume(rng, "bench-user"), "version": 1} for _ in range(resumes)]
+        ids = [resume["id"] for resume in corpus]
+        job = ("Senior Backend Engineer to build distributed systems in Python and Go on Kubernetes, "
+               "with PostgreSQL, Kafka, Terraform and AWS. Experience with observability and CI/CD.")
+
+        scorer = AtsScorer()
+        start = time.perf_counter()
+        for resume in corpus:
+            scorer.add(resume)
+        vectorize_seconds = time.perf_counter() - start
+
+        samples = []
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            vectors, _ = scorer.lookup({resume_id: 1 for resume_id in ids})
+            scorer.score(job, vectors)
+            samples.append(time.perf_counter() - start)
+        self.record(f"ats_score.cached_vectors.{resumes}", vectorize_all_ms=vectorize_seconds * 1000,
+                    resumes_per_sec=resumes / statistics.median(samples), **summarize(samples))
+
+        # End to end: the first request vectorizes, later ones only read versions
+        _, headers = await self.register_user()
+        await self.create_resumes(headers, min(resumes, self.listing_resumes))
+        payload = {"job_description": job}
+        await self.drive("ats_score.api.cold",
+                         lambda i: self.client.post("/api/resumes/ats-score", json=payload, headers=headers),
+                         total=1, concurrency=1)
+        await self.drive(f"ats_score.api.warm.{min(resumes, self.listing_resumes)}",
+                         lambda i: self.client.post("/api/resumes/ats-score", json=payload, headers=headers),
+                         total=max(1, self.requests_per_endpoint // 4))
+
+    async def bench_resume_cache(self, resumes=50):
+        """GET /resumes/{id} through the read-through cache versus straight from Mongo, plus the bare hit path"""
+        _, headers = await self.register_user()
+        ids = await self.create_resumes(headers, resumes)
+        get = lambda i: self.client.get(f"/api/resumes/{ids[i % len(ids)]}", headers=headers)
+        await self.drive("get_resume.cached", get)
+        if self.server is None:
+            return
+
+        cache = self.server.resume_cache
+        self.server.resume_cache = None
+        try:
+            await self.drive("get_resume.uncached", get)
+        finally:
+            self.server.resume_cache = cache
+        if cache is None:
+            return
+
+        user_id = (await self.server.db.resumes.find_one({"id": ids[0]}))["user_id"]
+        load = lambda: self.server.db.resumes.find_one({"id": ids[0]}, {"_id": 0})
+        await cache.get(ids[0], user_id, load)
+        rounds = self.iterations * 100
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await cache.get(ids[0], user_id, load)
+        hit_us = (time.perf_counter() - start) / rounds * 1e6
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await load()
+        load_us = (time.perf_counter() - start) / rounds * 1e6
+        self.record("resume_cache.hit_path", hit_us=hit_us, mongo_read_us=load_us, **cache.stats())
+
+    async def bench_bulk_io(self, resumes=2000):
+        """NDJSON bulk import and streaming export throughput, and peak parser memory per dump size"""
+        import gzip
+        import random
+        import tracemalloc
+
+        from ndjson_io import read_ndjson
+
+        rng = random.Random(17)
+        _, headers = await self.register_user()
+        lines = []
+        for _ in range(resumes):
+            resume = self.synthetic_resume(rng, None)
+            del resume["id"], resume["user_id"]
+            lines.append(json.dumps(resume).encode())
+        body = b"\n".join(lines) + b"\n"
+
+        async def chunks(data, size=64 * 1024):
+            for start in range(0, len(data), size):
+                yield data[start:start + size]
+
+        start = time.perf_counter()
+        response = await self.client.post("/api/resumes/import", content=chunks(body), headers=headers)
+        elapsed = time.perf_counter() - start
+        result = response.json()
+        self.record(f"bulk_io.import.{resumes}", imported=result["imported"], failed=result["failed"],
+                    body_mb=len(body) / 1e6, seconds=elapsed, resumes_per_sec=result["imported"] / elapsed)
+
+        for compress in (False, True):
+            start, size, first_byte = time.perf_counter(), 0, None
+            async with self.client.stream("GET", f"/api/resumes/export?gzip={str(compress).lower()}",
+                                          headers=headers) as stream:
+                async for chunk in stream.aiter_raw():
+                    first_byte = first_byte or time.perf_counter() - start
+                    size += len(chunk)
+            elapsed = time.perf_counter() - start
+            self.record(f"bulk_io.export.{'gzip' if compress else 'plain'}.{resumes}", size_mb=size / 1e6,
+                        seconds=elapsed, time_to_first_byte_ms=(first_byte or 0) * 1000,
+                        resumes_per_sec=resumes / elapsed)
+
+        # Parser memory should not grow with the dump: parse 1x and 4x the body under tracemalloc
+        for copies in (1, 4):
+            dump = gzip.compress(body * copies, compresslevel=1)
+            tracemalloc.start()
+            parsed = 0
+            async for _, value, _ in read_ndjson(chunks(dump), max_line_bytes=1024 * 1024):
+                parsed += value is not None
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.record(f"bulk_io.parse_memory.{copies}x", lines=parsed, inflated_mb=len(body) * copies / 1e6,
+                        peak_traced_mb=peak / 1e6)
+
+    async def bench_batch(self, batch=50, rounds=10):
+        """Fetching, duplicating and deleting ``batch`` resumes one request per id versus one batch request"""
+        _, headers = await self.register_user()
+        ids = await self.create_resumes(headers, batch)
+
+        async def timed(make_requests):
+            samples = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                await make_requests()
+                samples.append(time.perf_counter() - start)
+            return summarize(samples)
+
+        async def get_each():
+            for resume_id in ids:
+                (await self.client.get(f"/api/resumes/{resume_id}", headers=headers)).raise_for_status()
+
+        async def get_batch():
+            (await self.client.post("/api/resumes/batch/get", json={"ids": ids}, headers=headers)).raise_for_status()
+
+        self.record(f"batch.get.each.{batch}", **await timed(get_each))
+        self.record(f"batch.get.batch.{batch}", **await timed(get_batch))
+
+        async def copy_each(copies):
+            for resume_id in ids:
+                resume = (await self.client.get(f"/api/resumes/{resume_id}", headers=headers)).json()
+                response = await self.client.post("/api/resumes", json=resume, headers=headers)
+                copies.append(response.json()["id"])
+
+        async def copy_batch(copies):
+            response = await self.client.post("/api/resumes/batch/duplicate", json={"ids": ids}, headers=headers)
+            copies.extend(item["resume"]["id"] for item in response.json()["items"])
+
+        async def delete_each(copies):
+            for resume_id in copies:
+                (await self.client.delete(f"/api/resumes/{resume_id}", headers=headers)).raise_for_status()
+
+        async def delete_batch(copies):
+            (await self.client.post("/api/resumes/batch/delete", json={"ids": copies},
+                                    headers=headers)).raise_for_status()
+
+        # Each round copies the resumes and deletes the copies again, so the store does not grow
+        for name, copy, delete in (("each", copy_each, delete_each), ("batch", copy_batch, delete_batch)):
+            copy_samples, delete_samples = [], []
+            for _ in range(rounds):
+                copies = []
+                start = time.perf_counter()
+                await copy(copies)
+                copy_samples.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                await delete(copies)
+                delete_samples.append(time.perf_counter() - start)
+            self.record(f"batch.duplicate.{name}.{batch}", **summarize(copy_samples))
+            self.record(f"batch.delete.{name}.{batch}", **summarize(delete_samples))
+
+    async def bench_jobs(self, users=4, jobs_per_user=20):
+        """CRUD latency while PDF export jobs are queued, and how fast the job pool drains them"""
+        _, headers = await self.register_user()
+        resume_id = (await self.create_resumes(headers, 1))[0]
+        await self.drive("get_resume.idle", lambda i: self.client.get(f"/api/resumes/{resume_id}", headers=headers))
+
+        jobs = []
+        for _ in range(users):
+            _, owner = await self.register_user()
+            owned = (await self.client.post("/api/resumes", json=SAMPLE_RESUME, headers=owner)).json()["id"]
+            for i in range(jobs_per_user):
+                response = await self.client.post(
+                    "/api/jobs", json={"kind": "pdf_export", "resume_id": owned,
+                                       "template_id": f"template{i % 10 + 1}"}, headers=owner)
+                if response.status_code == 202:
+                    jobs.append((response.json()["id"], owner))
+        start = time.perf_counter()
+        await self.drive(f"get_resume.with_{len(jobs)}_jobs_queued",
+                         lambda i: self.client.get(f"/api/resumes/{resume_id}", headers=headers))
+
+        pending = list(jobs)
+        while pending and time.perf_counter() - start < 120:
+            statuses = [(await self.client.get(f"/api/jobs/{job_id}", headers=owner)).json()["status"]
+                        for job_id, owner in pending]
+            pending = [job for job, status in zip(pending, statuses) if status in ("queued", "running")]
+            if pending:
+                await asyncio.sleep(0.2)
+        elapsed = time.perf_counter() - start
+        self.record("jobs.pdf_export.drain", jobs=len(jobs), unfinished=len(pending),
+                    seconds=elapsed, jobs_per_sec=(len(jobs) - len(pending)) / elapsed)
+
+    def bench_pdf_export(self):
+        """Compare server-side vector PDF rendering against the browser's raster path"""
+        from pdf_export import PdfRenderCache, render_resume_pdf
+
+        vector_times, vector_size = [], 0
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            vector_size = len(render_resume_pdf(SAMPLE_RESUME))
+            vector_times.append(time.perf_counter() - start)
+
+        raster_times, raster_size = [], 0
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            raster_size = len(self._raster_pdf(SAMPLE_RESUME))
+            raster_times.append(time.perf_counter() - start)
+
+        cache = PdfRenderCache()
+        cache.render(SAMPLE_RESUME)
+        cached_times = []
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            cache.render(SAMPLE_RESUME)
+            cached_times.append(time.perf_counter() - start)
+
+        self.record("pdf_export.vector", size_bytes=vector_size, **summarize(vector_times))
+        self.record("pdf_export.raster", size_bytes=raster_size, **summarize(raster_times))
+        self.record("pdf_export.vector_cached", **summarize(cached_times))
+
+    def bench_templates(self):
+        """HTML rendering with each compiled template, template compilation, and thumbnail drawing"""
+        from template_engine import TemplateEngine
+        from thumbnails import ThumbnailCache, render_thumbnail
+
+        directory = Path(__file__).parent / "backend" / "resume_templates"
+        compile_times = []
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            engine = TemplateEngine(directory)
+            compile_times.append(time.perf_counter() - start)
+        self.record("templates.compile", templates=len(engine.template_ids), **summarize(compile_times))
+
+        for template_id in engine.template_ids:
+            times, size = [], 0
+            for _ in range(self.iterations * 10):
+                start = time.perf_counter()
+                size = len(engine.render(template_id, SAMPLE_RESUME))
+                times.append(time.perf_counter() - start)
+            self.record(f"templates.html.{template_id}", size_bytes=size, **summarize(times))
+
+        thumbnail_times, thumbnail_size = [], 0
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            thumbnail_size = len(render_thumbnail(SAMPLE_RESUME))
+            thumbnail_times.append(time.perf_counter() - start)
+        self.record("templates.thumbnail", size_bytes=thumbnail_size, **summarize(thumbnail_times))
+
+        cache = ThumbnailCache()
+        cache.render(SAMPLE_RESUME)
+        cached_times = []
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            cache.render(SAMPLE_RESUME)
+            cached_times.append(time.perf_counter() - start)
+        self.record("templates.thumbnail_cached", **summarize(cached_times))
+
+    async def bench_login_burst(self, logins=64):
+        """p99 of GET /api/resumes/{id} on its own and during a burst of concurrent logins"""
+        email, headers = await self.register_user()
+        resume_id = (await self.client.post("/api/resumes", json=SAMPLE_RESUME, headers=headers)).json()["id"]
+        get_resume = lambda i: self.client.get(f"/api/resumes/{resume_id}", headers=headers)
+
+        await self.drive("login_burst.get_resume_idle", get_resume, concurrency=1)
+
+        readers = asyncio.ensure_future(
+            self.drive("login_burst.get_resume_during_logins", get_resume, concurrency=1))
+        await self.drive("login_burst.logins", lambda i: self.client.post("/api/login", json={
+            "email": email, "password": "bench-password"}), total=logins, expected=(200, 503))
+        await readers
+        await self.client.delete(f"/api/resumes/{resume_id}", headers=headers)
+
+    async def bench_rate_limit(self, logins=200, readers=8):
+        """p99 of other users' reads while one client floods /api/login, with the rate limiter and without it"""
+        email, _ = await self.register_user()
+        reader_headers = [(await self.register_user())[1] for _ in range(readers)]
+        # Spread over several users so the readers stay inside their own read budget
+        get_resumes = lambda i: self.client.get("/api/resumes", headers=reader_headers[i % readers])
+        login = lambda i: self.client.post("/api/login", json={"email": email, "password": "bench-password"})
+
+        limiter = None
+        if self.server is not None:
+            limiter = self.server.rate_limiter
+            self.server.rate_limiter = self.server.build_rate_limiter()
+        try:
+            await self.drive("rate_limit.reads_idle", get_resumes, concurrency=1)
+            # Spend the client's burst first, so the flood below is what a sustained attacker sees
+            await self.drive("rate_limit.login_burst", login, total=logins // 10, expected=(200, 429, 503))
+            reads = asyncio.ensure_future(self.drive("rate_limit.reads_during_login_flood", get_resumes, concurrency=1))
+            await self.drive("rate_limit.login_flood", login, total=logins, expected=(200, 429, 503))
+            await reads
+            if self.server is None:
+                return
+            self.record("rate_limit.limiter", **{k: v for k, v in self.server.rate_limiter.stats().items()
+                                                 if k != "policies"})
+            self.server.rate_limiter = None
+            reads = asyncio.ensure_future(self.drive("rate_limit.reads_during_login_flood_unlimited", get_resumes,
+                                                     concurrency=1))
+            await self.drive("rate_limit.login_flood_unlimited", login, total=logins, expected=(200, 503))
+            await reads
+        finally:
+            if self.server is not None:
+                self.server.rate_limiter = limiter
+
+    async def bench_workers(self, worker_counts=(1, 2, 4, 8), port=8765):
+        """Cold start of launcher.py and GET /api/templates throughput across worker counts"""
+        if self.base_url:
+            return
+        backend = Path(__file__).parent / "backend"
+        import_times = []
+        for _ in range(5):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", "import server"], cwd=backend, check=True)
+            import_times.append(time.perf_counter() - start)
+        loaded = subprocess.run(
+            [sys.executable, "-c", "import sys, server; print(sorted(m for m in ('reportlab', 'numpy', 'PIL') "
+                                   "if m in sys.modules))"],
+            cwd=backend, check=True, capture_output=True, text=True).stdout.strip()
+        self.record("workers.import_server", heavy_modules_loaded=loaded, **summarize(import_times))
+
+        for workers in worker_counts:
+            process = subprocess.Popen(
+                [sys.executable, "launcher.py", "--workers", str(workers), "--port", str(port),
+                 "--log-level", "warning"], cwd=backend)
+            try:
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+                    start = time.perf_counter()
+                    while True:
+                        try:
+                            (await client.get("/api/")).raise_for_status()
+                            break
+                        except httpx.HTTPError:
+                            await asyncio.sleep(0.02)
+                    first_response = time.perf_counter() - start
+                    # Readiness needs MongoDB; without one, only the time to serve is meaningful
+                    ready = None
+                    while time.perf_counter() - start < 30:
+                        if (await client.get("/api/ready")).status_code == 200:
+                            ready = time.perf_counter() - start
+                            break
+                        await asyncio.sleep(0.1)
+                    # Let every worker finish booting before measuring throughput
+                    await asyncio.sleep(workers * 0.5)
+                    self.record(f"workers.{workers}.cold_start", first_response_s=first_response,
+                                ready_s=ready if ready is not None else "not ready")
+                    await self.drive(f"workers.{workers}.templates", lambda i: client.get("/api/templates"),
+                                     total=self.requests_per_endpoint * 10)
+            finally:
+                process.terminate()
+                process.wait(timeout=60)
+
+    async def bench_notifications(self, subscribers=2000, port=8766):
+        """Memory per idle change subscription, in the hub and per WebSocket connection, and fan-out latency"""
+        import tracemalloc
+
+        from notifications import LocalBackend, NotificationHub, change_event
+
+        # The hub alone: subscriptions whose sends complete immediately
+        hub = NotificationHub(LocalBackend(), max_per_user=subscribers)
+        hub.start()
+        received = []
+
+        async def send(message):
+            received.append(time.perf_counter())
+
+        async def close():
+            pass
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        subscriptions = [hub.subscribe("bench-user", send, close) for _ in range(subscribers)]
+        idle_bytes = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, "filename"))
+        tracemalloc.stop()
+        for _ in range(2):
+            # The first round is a warm-up
+            received.clear()
+            start = time.perf_counter()
+            await hub.publish("bench-user", change_event("updated", "resume-id", 2, ["title"]))
+            while len(received) < subscribers:
+                await asyncio.sleep(0)
+        self.record("notifications.hub", subscribers=subscribers, bytes_per_idle_subscription=idle_bytes / subscribers,
+                    fan_out_ms=(received[-1] - start) * 1000)
+        for subscription in subscriptions:
+            hub.unsubscribe(subscription)
+
+        if self.base_url:
+            return
+        # The whole stack: uvicorn + websockets serving the app (on mongomock) in its own process
+        import websockets
+
+        backend = Path(__file__).parent / "backend"
+        process = subprocess.Popen(
+            [sys.executable, "-c",
+             "import mongomock_motor, server, uvicorn; "
+             "server.client = mongomock_motor.AsyncMongoMockClient(); server.db = server.client['benchmark']; "
+             f"uvicorn.run(server.app, port={port}, log_level='warning')"],
+            cwd=backend, env={**os.environ, "NOTIFY_MAX_CONNECTIONS_PER_USER": str(subscribers)})
+
+        def rss_kb():
+            with open(f"/proc/{process.pid}/status") as status:
+                return next(int(line.split()[1]) for line in status if line.startswith("VmRSS:"))
+
+        connections = []
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+                while True:
+                    try:
+                        response = await client.post("/api/register", json={
+                            "email": "bench@example.com", "full_name": "Bench User", "password": "bench-password"})
+                        break
+                    except httpx.HTTPError:
+                        await asyncio.sleep(0.1)
+                token = response.json()["access_token"]
+                headers = {"Authorization": f"Bearer {token}"}
+                # Warm the WebSocket path so first-use allocations are not counted per connection
+                async with websockets.connect(f"ws://127.0.0.1:{port}/api/resumes/changes?token={token}"):
+                    pass
+                await asyncio.sleep(0.5)
+                rss_before = rss_kb()
+                for _ in range(subscribers):
+                    connections.append(await websockets.connect(
+                        f"ws://127.0.0.1:{port}/api/resumes/changes?token={token}"))
+                await asyncio.sleep(1)
+                rss_after = rss_kb()
+
+                start = time.perf_counter()
+                created = await client.post("/api/resumes", json=SAMPLE_RESUME, headers=headers)
+                created.raise_for_status()
+                arrivals = []
+
+                async def wait_event(connection):
+                    await connection.recv()
+                    arrivals.append(time.perf_counter() - start)
+
+                await asyncio.gather(*(wait_event(connection) for connection in connections))
+                stats = (await client.get("/api/metrics/notifications", headers=METRICS_HEADERS)).json()
+                self.record("notifications.websocket", subscribers=stats["subscribers"],
+                            rss_kb_per_idle_connection=(rss_after - rss_before) / subscribers,
+                            **{f"event_{key}": value for key, value in summarize(arrivals).items()})
+        finally:
+            await asyncio.gather(*(connection.close() for connection in connections), return_exceptions=True)
+            process.terminate()
+            process.wait(timeout=60)
+
+    def bench_serialization(self, rounds=2000, page_size=100):
+        """get_resume/get_resumes response encoding: validated Pydantic + json vs trusted dict + orjson"""
+        import orjson
+        import server
+
+        stored = server.ResumeData(**SAMPLE_RESUME, user_id="bench-user", version=1).dict()
+        summaries = [server.resume_summary(stored) for _ in range(page_size)]
+
+        def validated_resume():
+            # What FastAPI does with response_model: rebuild, re-validate, dump, json.dumps
+            model = server.ResumeData(**stored)
+            body = server.ResumeData.model_validate(model).model_dump(mode="json")
+            return json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        def fast_resume():
+            return orjson.dumps(server.trusted_resume(dict(stored)))
+
+        def validated_page():
+            page = server.ResumePage(items=summaries, next_cursor=None)
+            body = server.ResumePage.model_validate(page).model_dump(mode="json")
+            return json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        def fast_page():
+            return orjson.dumps({"items": summaries, "next_cursor": None})
+
+        for name, encode in (("get_resume.validated", validated_resume), ("get_resume.fast", fast_resume),
+                             ("get_resumes.validated", validated_page), ("get_resumes.fast", fast_page)):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                size = len(encode())
+            elapsed = time.perf_counter() - start
+            self.record(f"serialization.{name}", responses_per_sec=rounds / elapsed,
+                        us_per_response=elapsed / rounds * 1e6, size_bytes=size)
+
+    def bench_rich_text(self, rounds=500):
+        """Write-time HTML normalization, and what readers pay per resume with and without the derived fields"""
+        import server
+        from ats_scoring import resume_tokens
+        from rich_text import RICH_TEXT_FIELDS, stored_text
+        from search_index import resume_terms
+
+        def timed(name, operation, **extra):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                operation()
+            elapsed = time.perf_counter() - start
+            self.record(f"rich_text.{name}", us_per_op=elapsed / rounds * 1e6, **extra)
+
+        timed("validate_write", lambda: server.ResumeCreate.model_validate(SAMPLE_RESUME))
+
+        stored = server.ResumeData(**SAMPLE_RESUME, user_id="bench-user", version=1).model_dump()
+        legacy = json.loads(json.dumps(stored, default=str))
+        for path in RICH_TEXT_FIELDS:
+            section, field = path.split(".")
+            for item in legacy[section] if isinstance(legacy[section], list) else [legacy[section]]:
+                for key in [key for key in item if key.startswith(f"{field}_")]:
+                    del item[key]
+
+        def read(resume):
+            # Search terms, ATS tokens and the PDF's text: the consumers of rich text on every read
+            resume_terms(resume)
+            resume_tokens(resume)
+            for path in RICH_TEXT_FIELDS:
+                section, field = path.split(".")
+                for item in resume[section] if isinstance(resume[section], list) else [resume[section]]:
+                    stored_text(item, field)
+
+        timed("read.parsed_html", lambda: read(legacy))
+        timed("read.derived", lambda: read(stored))
+
+        oversized = {**SAMPLE_RESUME, "personal_info": {"summary": "<p>" + "x" * 1_000_000 + "</p>"}}
+
+        def reject():
+            try:
+                server.ResumeCreate.model_validate(oversized)
+            except server.ValidationError:
+                return
+            raise AssertionError("oversized summary was accepted")
+
+        timed("reject_oversized", reject, size_bytes=len(oversized["personal_info"]["summary"]))
+
+    @staticmethod
+    def _raster_pdf(resume):
+        """Approximate html2canvas(scale=2) + jsPDF: draw the page as a PNG and embed it"""
+        from PIL import Image, ImageDraw
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.utils import ImageReader
+        from reportlab.pdfgen import canvas
+
+        from pdf_export import _plain
+
+        # The preview is max-w-2xl (672px) wide, rasterised at scale 2
+        width, height = 1344, 1900
+        image = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(image)
+        y = 60
+        lines = [resume["personal_info"]["full_name"], resume["personal_info"]["email"],
+                 _plain(resume["personal_info"], "summary")]
+        for exp in resume["experience"]:
+            lines += [f"{exp['title']} - {exp['company']}", _plain(exp, "description")]
+        lines.append(", ".join(resume["skills"]))
+        for project in resume["projects"]:
+            lines += [project["name"], project["description"]]
+        for line in lines:
+            for chunk in line.split("<br/>"):
+                draw.text((64, y), chunk, fill="black")
+                y += 32
+
+        png = io.BytesIO()
+        image.save(png, format="PNG")
+        png.seek(0)
+
+        out = io.BytesIO()
+        pdf = canvas.Canvas(out, pagesize=A4)
+        pdf.drawImage(ImageReader(png), 0, 0, width=A4[0], height=A4[1])
+        pdf.save()
+        return out.getvalue()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=Path(__file__).parent, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benches(args):
+    async with ResumeCreatorBenchmark(
+        base_url=args.base_url, concurrency=args.concurrency, requests_per_endpoint=args.requests,
+        auth_requests=args.auth_requests, listing_resumes=args.resumes, iterations=args.iterations,
+        search_resumes=args.search_resumes,
+    ) as bench:
+        benches = [
+            bench.bench_endpoints,
+            bench.bench_listing,
+            bench.bench_autosave,
+            bench.bench_sync,
+            bench.bench_revisions,
+            bench.bench_search,
+            bench.bench_ats_scoring,
+            bench.bench_resume_cache,
+            bench.bench_batch,
+            bench.bench_jobs,
+            bench.bench_bulk_io,
+            bench.bench_login_burst,
+            bench.bench_rate_limit,
+            bench.bench_pdf_export,
+            bench.bench_templates,
+            bench.bench_serialization,
+            bench.bench_rich_text,
+            bench.bench_notifications,
+            bench.bench_workers,
+        ]
+
+        failed = 0
+        for run in benches:
+            if args.benches and run.__name__ not in args.benches:
+                continue
+            try:
+                if inspect.iscoroutinefunction(run):
+                    await run()
+                else:
+                    run()
+            except Exception as e:
+                failed += 1
+                print(f"❌ {run.__name__} failed with exception: {str(e)}")
+        return bench.results, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resume Creator API benchmarks")
+    parser.add_argument("benches", nargs="*", help="bench_* methods to run (default: all)")
+    parser.add_argument("--base-url", default=os.environ.get("BENCH_BASE_URL"),
+                        help="drive a running server instead of booting the app in-process")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("-n", "--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--auth-requests", type=int, default=32, help="register/login requests (bcrypt-bound)")
+    parser.add_argument("--resumes", type=int, default=500, help="resumes stored for the listing benchmark")
+    parser.add_argument("--search-resumes", type=int, default=200_000,
+                        help="synthetic resumes in the search index benchmark")
+    parser.add_argument("--iterations", type=int, default=20, help="iterations for in-process micro-benchmarks")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="machine-readable results file")
+    args = parser.parse_args()
+
+    print("🚀 Starting Resume Creator Benchmarks")
+    print(f"   Target: {args.base_url or 'in-process app + in-memory MongoDB'}")
+    print("=" * 50)
+
+    results, failed = asyncio.run(run_benches(args))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "target": args.base_url or "in-process",
+            "python": platform.python_version(),
+            "concurrency": args.concurrency,
+            "requests_per_endpoint": args.requests,
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2, default=str))
+
+    print("\n" + "=" * 50)
+    print(f"📊 Wrote {len(results)} results to {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
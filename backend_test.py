@@ -1,16 +1,20 @@
+import gzip
+import os
 import requests
 import sys
 import json
+import time
 from datetime import datetime
 
 class ResumeCreatorAPITester:
-    def __init__(self, base_url="https://49d41494-df0c-439a-8433-5631963ee8f8.preview.emergentagent.com"):
+    def __init__(self, base_url=os.environ.get("BACKEND_TEST_URL", "http://localhost:8001")):
         self.base_url = base_url
         self.api_url = f"{base_url}/api"
         self.token = None
         self.tests_run = 0
         self.tests_passed = 0
         self.created_resume_id = None
+        self.sync_cursor = None
 
     def run_test(self, name, method, endpoint, expected_status, data=None, headers=None):
         """Run a single API test"""
@@ -32,6 +36,8 @@ class ResumeCreatorAPITester:
                 response = requests.post(url, json=data, headers=default_headers, timeout=10)
             elif method == 'PUT':
                 response = requests.put(url, json=data, headers=default_headers, timeout=10)
+            elif method == 'PATCH':
+                response = requests.patch(url, json=data, headers=default_headers, timeout=10)
             elif method == 'DELETE':
                 response = requests.delete(url, headers=default_headers, timeout=10)
 
@@ -90,6 +96,33 @@ class ResumeCreatorAPITester:
                 print(f"   Template example: {template['name']}")
         return success
 
+    def test_register_user(self):
+        """Register a fresh user and keep its token for the resume tests"""
+        email = f"test_{datetime.now().strftime('%H%M%S%f')}@example.com"
+        success, response = self.run_test(
+            "Register User",
+            "POST",
+            "register",
+            200,
+            data={"email": email, "full_name": "Test User", "password": "TestPass123!"}
+        )
+        if success and 'access_token' in response:
+            self.token = response['access_token']
+            print(f"   Registered {email}")
+        return success
+
+    def test_unauthenticated_resumes(self):
+        """Resume routes must reject requests without a bearer token"""
+        token, self.token = self.token, None
+        success, _ = self.run_test(
+            "Get Resumes Without Token",
+            "GET",
+            "resumes",
+            401
+        )
+        self.token = token
+        return success
+
     def test_create_resume(self):
         """Test creating a new resume"""
         resume_data = {
@@ -163,8 +196,82 @@ class ResumeCreatorAPITester:
             "resumes",
             200
         )
-        if success and isinstance(response, list):
-            print(f"   Found {len(response)} resumes")
+        if success and isinstance(response, dict):
+            print(f"   Found {len(response.get('items', []))} resumes on first page")
+            if 'next_cursor' not in response:
+                print(f"   ⚠️  Missing 'next_cursor' in resume page")
+                return False
+        return success
+
+    def test_sync_resumes(self):
+        """Test a full delta sync and keep its watermark"""
+        success, response = self.run_test(
+            "Full Resume Sync",
+            "GET",
+            "resumes/sync",
+            200
+        )
+        if success and isinstance(response, dict):
+            self.sync_cursor = response.get('next_cursor')
+            ids = [item['id'] for item in response.get('items', [])]
+            if self.created_resume_id and self.created_resume_id not in ids:
+                print(f"   ⚠️  Created resume missing from full sync")
+                return False
+        return success
+
+    def test_sync_tombstones(self):
+        """Test that a sync after deleting reports the deletion"""
+        if not self.created_resume_id or not self.sync_cursor:
+            print("❌ Skipping - No resume ID or sync cursor available")
+            return False
+
+        success, response = self.run_test(
+            "Delta Resume Sync",
+            "GET",
+            f"resumes/sync?since={self.sync_cursor}",
+            200
+        )
+        if success and self.created_resume_id not in response.get('deleted', []):
+            print(f"   ⚠️  Deleted resume missing from sync tombstones")
+            return False
+        return success
+
+    def test_search_resumes(self):
+        """Test ranked search by text and skill prefix"""
+        if not self.created_resume_id:
+            print("❌ Skipping - No resume ID available")
+            return False
+
+        success, response = self.run_test(
+            "Search Resumes",
+            "GET",
+            "resumes/search?q=react+engineer&skill=pyth",
+            200
+        )
+        if success and self.created_resume_id not in [item['id'] for item in response.get('items', [])]:
+            print(f"   ⚠️  Created resume missing from search results")
+            return False
+        return success
+
+    def test_ats_score(self):
+        """Test batch ATS scoring against a job description"""
+        if not self.created_resume_id:
+            print("❌ Skipping - No resume ID available")
+            return False
+
+        success, response = self.run_test(
+            "ATS Score Resumes",
+            "POST",
+            "resumes/ats-score",
+            200,
+            data={"job_description": "Senior Software Engineer with React, Node.js and Kubernetes"}
+        )
+        if success:
+            scored = {result['resume_id']: result for result in response.get('results', [])}
+            result = scored.get(self.created_resume_id)
+            if not result or 'react' not in result['matched'] or 'kubernetes' not in result['missing']:
+                print(f"   ⚠️  Unexpected ATS result: {result}")
+                return False
         return success
 
     def test_get_resume_by_id(self):
@@ -228,9 +335,333 @@ class ResumeCreatorAPITester:
             else:
                 print(f"   ⚠️  Title not updated properly")
                 return False
+
+            # The earlier read is cached; the update must have invalidated it
+            success, response = self.run_test(
+                "Get Updated Resume",
+                "GET",
+                f"resumes/{self.created_resume_id}",
+                200
+            )
+            if success and response.get('title') != 'Updated Test Resume':
+                print(f"   ⚠️  Stale resume returned after update: {response.get('title')}")
+                return False
         
         return success
 
+    def test_patch_index_out_of_range(self):
+        """Test that patching a list index past the end leaves the resume unchanged"""
+        if not self.created_resume_id:
+            print("❌ Skipping - No resume ID available")
+            return False
+
+        success, before = self.run_test(
+            "Get Resume Before Patch",
+            "GET",
+            f"resumes/{self.created_resume_id}",
+            200
+        )
+        if not success:
+            return False
+
+        index = len(before.get('experience', []))
+        success, _ = self.run_test(
+            "Patch Index Past End",
+            "PATCH",
+            f"resumes/{self.created_resume_id}",
+            409,
+            data=[{"op": "replace", "path": f"/experience/{index}/title", "value": "Ghost"}]
+        )
+        if not success:
+            return False
+
+        success, after = self.run_test(
+            "Get Resume After Patch",
+            "GET",
+            f"resumes/{self.created_resume_id}",
+            200
+        )
+        if success and (after.get('experience') != before.get('experience') or after.get('version') != before.get('version')):
+            print(f"   ⚠️  Rejected patch changed the stored resume")
+            return False
+        return success
+
+    def test_resume_revisions(self):
+        """Test listing and materializing a resume's revision history"""
+        if not self.created_resume_id:
+            print("❌ Skipping - No resume ID available")
+            return False
+
+        success, response = self.run_test(
+            "List Resume Revisions",
+            "GET",
+            f"resumes/{self.created_resume_id}/revisions",
+            200
+        )
+        if not success or not response.get('items'):
+            print(f"   ⚠️  No revisions recorded")
+            return False
+
+        oldest = response['items'][-1]['revision']
+        success, response = self.run_test(
+            "Get Resume Revision",
+            "GET",
+            f"resumes/{self.created_resume_id}/revisions/{oldest}",
+            200
+        )
+        if success and 'resume' not in response:
+            print(f"   ⚠️  Missing 'resume' in revision")
+            return False
+        return success
+
+    def test_pdf_export_job(self):
+        """Test exporting a PDF through the background job queue"""
+        if not self.created_resume_id:
+            print("❌ Skipping - No resume ID available")
+            return False
+
+        success, job = self.run_test(
+            "Submit PDF Export Job",
+            "POST",
+            "jobs",
+            202,
+            data={"kind": "pdf_export", "resume_id": self.created_resume_id}
+        )
+        if not success:
+            return False
+
+        for _ in range(50):
+            success, job = self.run_test("Poll PDF Export Job", "GET", f"jobs/{job['id']}", 200)
+            if not success or job.get('status') not in ('queued', 'running'):
+                break
+            time.sleep(0.2)
+        if job.get('status') != 'succeeded':
+            print(f"   ⚠️  Job did not succeed: {job}")
+            return False
+
+        response = requests.get(f"{self.base_url}{job['result_url']}",
+                                headers={'Authorization': f'Bearer {self.token}'}, timeout=10)
+        if response.status_code != 200 or not response.content.startswith(b'%PDF'):
+            print(f"   ⚠️  Unexpected job result: {response.status_code} {response.content[:20]}")
+            return False
+        print(f"   Result: {len(response.content)} byte PDF")
+        return True
+
+    def test_resume_html_and_thumbnail(self):
+        """Test server-rendered HTML and the thumbnail of a resume, with ETag revalidation"""
+        if not self.created_resume_id:
+            print("❌ Skipping - No resume ID available")
+            return False
+
+        self.tests_run += 1
+        print("\n🔍 Testing Resume HTML and Thumbnail...")
+        headers = {'Authorization': f'Bearer {self.token}'}
+        try:
+            page = requests.get(f"{self.api_url}/resumes/{self.created_resume_id}/html", headers=headers, timeout=10)
+            thumbnail = requests.get(f"{self.api_url}/resumes/{self.created_resume_id}/thumbnail",
+                                     headers=headers, timeout=10)
+            revalidated = requests.get(f"{self.api_url}/resumes/{self.created_resume_id}/thumbnail",
+                                       headers={**headers, 'If-None-Match': thumbnail.headers.get('etag', '')},
+                                       timeout=10)
+            if (page.status_code == 200 and page.text.startswith('<!DOCTYPE html>')
+                    and thumbnail.status_code == 200 and thumbnail.content.startswith(b'\x89PNG')
+                    and revalidated.status_code == 304):
+                self.tests_passed += 1
+                print(f"✅ Passed - {len(page.text)} byte page, {len(thumbnail.content)} byte thumbnail")
+                return True
+            print(f"❌ Failed - HTML {page.status_code}, thumbnail {thumbnail.status_code}, "
+                  f"revalidation {revalidated.status_code}")
+            return False
+        except Exception as e:
+            print(f"❌ Failed - Error: {str(e)}")
+            return False
+
+    def test_batch_resumes(self):
+        """Test duplicating, fetching and deleting resumes in batches"""
+        if not self.created_resume_id:
+            print("❌ Skipping - No resume ID available")
+            return False
+
+        success, duplicated = self.run_test(
+            "Batch Duplicate Resumes",
+            "POST",
+            "resumes/batch/duplicate",
+            201,
+            data={"ids": [self.created_resume_id]}
+        )
+        if not success or duplicated['items'][0]['status'] != 'created':
+            return False
+        copy_id = duplicated['items'][0]['resume']['id']
+
+        success, fetched = self.run_test(
+            "Batch Get Resumes",
+            "POST",
+            "resumes/batch/get",
+            200,
+            data={"ids": [self.created_resume_id, copy_id, "invalid-id-12345"]}
+        )
+        if not success or [item['status'] for item in fetched['items']] != ['ok', 'ok', 'not_found']:
+            return False
+
+        success, deleted = self.run_test(
+            "Batch Delete Resumes",
+            "POST",
+            "resumes/batch/delete",
+            200,
+            data={"ids": [copy_id, "invalid-id-12345"]}
+        )
+        return success and [item['status'] for item in deleted['items']] == ['deleted', 'not_found']
+
+    def test_rich_text_normalization(self):
+        """Test that rich text is normalized on write and oversized text is rejected"""
+        if not self.created_resume_id:
+            print("❌ Skipping - No resume ID available")
+            return False
+
+        success, patched = self.run_test(
+            "Normalize Rich Text",
+            "PATCH",
+            f"resumes/{self.created_resume_id}",
+            200,
+            data={"personal_info": {"summary": '<p class="ql-align">Full-stack <b>developer</b></p><p><br></p>'
+                                               '<ul><li>React</li><li onclick="x()">FastAPI</li></ul>'}}
+        )
+        info = patched.get('changes', {}).get('personal_info', {}) if success else {}
+        if info.get('summary') != '<p>Full-stack <strong>developer</strong></p><ul><li>React</li><li>FastAPI</li></ul>':
+            print(f"❌ Failed - Summary not normalized: {info.get('summary')!r}")
+            return False
+        if info.get('summary_words') != 4 or info.get('summary_bullets') != ['React', 'FastAPI']:
+            print(f"❌ Failed - Derived fields wrong: {info}")
+            return False
+
+        success, _ = self.run_test(
+            "Reject Oversized Rich Text",
+            "PATCH",
+            f"resumes/{self.created_resume_id}",
+            422,
+            data={"personal_info": {"summary": "<p>" + "x" * 100000 + "</p>"}}
+        )
+        return success
+
+    def test_fast_json_legacy_resume(self):
+        """Test that a resume stored before the derived rich-text fields serializes like the validated path"""
+        self.tests_run += 1
+        print("\n🔍 Testing Fast JSON For Legacy Resume...")
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+        # Only serializes in this process; nothing signed with it leaves
+        os.environ.setdefault("JWT_SECRET_KEY", "backend-test-serialization-only")
+        try:
+            import orjson
+            import server
+        except Exception as e:
+            print(f"❌ Failed - Could not import the API: {str(e)}")
+            return False
+        legacy = {
+            "id": "legacy-resume",
+            "user_id": "legacy-user",
+            "title": "Legacy Resume",
+            "personal_info": {"full_name": "Jane Roe", "summary": '<p class="x">Backend <b>engineer</b></p>'},
+            "experience": [{"title": "Developer", "description": "<ul><li>APIs</li><li>Queues</li></ul>"}],
+            "education": [{"degree": "BSc"}],
+            "projects": [{"name": "Tool", "technologies": "Python, Go"}],
+            "created_at": datetime(2024, 1, 1),
+            "updated_at": datetime(2024, 1, 2),
+        }
+        fast = orjson.loads(orjson.dumps(server.trusted_resume(dict(legacy))))
+        validated = json.loads(server.ResumeData(**legacy).model_dump_json())
+        if fast != validated:
+            different = sorted(key for key in set(fast) | set(validated) if fast.get(key) != validated.get(key))
+            print(f"❌ Failed - Fast and validated responses differ in {different}")
+            return False
+        self.tests_passed += 1
+        print("✅ Passed - Fast response matches validation")
+        return True
+
+    def test_resume_change_notifications(self):
+        """Test that a change to a resume is pushed to an open WebSocket subscription"""
+        from websockets.sync.client import connect
+
+        if not self.created_resume_id:
+            print("❌ Skipping - No resume ID available")
+            return False
+        self.tests_run += 1
+        print("\n🔍 Testing Resume Change Notifications...")
+        ws_url = self.api_url.replace("http", "ws", 1) + f"/resumes/changes?token={self.token}"
+        try:
+            with connect(ws_url, open_timeout=10) as websocket:
+                websocket.send(json.dumps({"type": "subscribe", "ids": [self.created_resume_id]}))
+                time.sleep(0.2)
+                response = requests.patch(
+                    f"{self.api_url}/resumes/{self.created_resume_id}",
+                    json={"title": "Notified Resume"},
+                    headers={'Authorization': f'Bearer {self.token}'},
+                    timeout=10,
+                )
+                # Autosaves are announced when the write-behind buffer flushes them, so events
+                # for earlier writes can still arrive first
+                deadline = time.time() + 10
+                event = json.loads(websocket.recv(timeout=10))
+                while event.get("version") != response.json().get("version") and time.time() < deadline:
+                    event = json.loads(websocket.recv(timeout=max(0.1, deadline - time.time())))
+        except Exception as e:
+            print(f"❌ Failed - Error: {str(e)}")
+            return False
+        expected = {"type": "updated", "id": self.created_resume_id,
+                    "version": response.json().get("version"), "fields": ["title"]}
+        if response.status_code != 200 or event != expected:
+            print(f"❌ Failed - Got {event}, expected {expected}")
+            return False
+        self.tests_passed += 1
+        print(f"✅ Passed - Event: {event}")
+        return True
+
+    def test_export_import_resumes(self):
+        """Test NDJSON export and re-import of the user's resumes"""
+        self.tests_run += 1
+        print("\n🔍 Testing Export/Import Resumes...")
+        headers = {'Authorization': f'Bearer {self.token}'}
+        try:
+            export = requests.get(f"{self.api_url}/resumes/export", headers=headers, timeout=10)
+            lines = export.content.splitlines()
+            if export.status_code != 200 or not lines:
+                print(f"❌ Failed - Export returned {export.status_code} with {len(lines)} lines")
+                return False
+            body = b"\n".join(lines + [b'{"skills": "not a list"}'])
+            response = requests.post(f"{self.api_url}/resumes/import", data=body,
+                                     headers={**headers, 'Content-Type': 'application/x-ndjson'}, timeout=30)
+            result = response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Failed - Network Error: {str(e)}")
+            return False
+        if response.status_code != 200 or result.get('imported') != len(lines) or result.get('failed') != 1:
+            print(f"❌ Failed - Unexpected import result: {response.status_code} {result}")
+            return False
+        self.tests_passed += 1
+        print(f"✅ Passed - Exported and re-imported {len(lines)} resumes")
+        return True
+
+    def test_import_multi_member_gzip(self):
+        """Test that a gzip upload made of two concatenated members imports the lines of both"""
+        self.tests_run += 1
+        print("\n🔍 Testing Multi-member Gzip Import...")
+        headers = {'Authorization': f'Bearer {self.token}'}
+        try:
+            export = requests.get(f"{self.api_url}/resumes/export", headers=headers, timeout=10)
+            line = export.content.splitlines()[0]
+            body = gzip.compress(line + b"\n") + gzip.compress(line + b"\n" + line + b"\n")
+            response = requests.post(f"{self.api_url}/resumes/import", data=body,
+                                     headers={**headers, 'Content-Type': 'application/gzip'}, timeout=30)
+            result = response.json()
+        except (requests.exceptions.RequestException, IndexError) as e:
+            print(f"❌ Failed - Error: {str(e)}")
+            return False
+        if response.status_code != 200 or result.get('imported') != 3 or result.get('failed') != 0:
+            print(f"❌ Failed - Unexpected import result: {response.status_code} {result}")
+            return False
+        self.tests_passed += 1
+        print("✅ Passed - Imported the lines of both gzip members")
+        return True
+
     def test_delete_resume(self):
         """Test deleting a resume"""
         if not self.created_resume_id:
@@ -270,6 +701,50 @@ class ResumeCreatorAPITester:
         )
         return success
 
+    def test_metrics_requires_token(self):
+        """Test that a user's token cannot read the metrics, and METRICS_TOKEN (when given) can"""
+        self.tests_run += 1
+        print("\n🔍 Testing Metrics Token...")
+        try:
+            response = requests.get(f"{self.api_url}/metrics",
+                                    headers={'Authorization': f'Bearer {self.token}'}, timeout=10)
+            if response.status_code not in (401, 404):
+                print(f"❌ Failed - A user token got {response.status_code}")
+                return False
+            metrics_token = os.environ.get("METRICS_TOKEN")
+            if metrics_token:
+                response = requests.get(f"{self.api_url}/metrics",
+                                        headers={'Authorization': f'Bearer {metrics_token}'}, timeout=10)
+                if response.status_code != 200:
+                    print(f"❌ Failed - METRICS_TOKEN got {response.status_code}")
+                    return False
+            self.tests_passed += 1
+            print("✅ Passed - Metrics are only served with METRICS_TOKEN")
+            return True
+        except Exception as e:
+            print(f"❌ Failed - Error: {str(e)}")
+            return False
+
+    def test_login_rate_limit(self):
+        """Test that a login flood from one client is answered with 429 and Retry-After"""
+        self.tests_run += 1
+        print("\n🔍 Testing Login Rate Limit...")
+        try:
+            for attempt in range(1, 31):
+                response = requests.post(f"{self.api_url}/login", json={
+                    "email": "nobody@example.com", "password": "wrong-password"}, timeout=10)
+                if response.status_code == 429:
+                    break
+            if response.status_code == 429 and response.headers.get('Retry-After'):
+                self.tests_passed += 1
+                print(f"✅ Passed - 429 after {attempt} attempts, Retry-After {response.headers['Retry-After']}s")
+                return True
+            print(f"❌ Failed - Last status {response.status_code} after {attempt} attempts")
+            return False
+        except Exception as e:
+            print(f"❌ Failed - Error: {str(e)}")
+            return False
+
 def main():
     print("🚀 Starting Resume Creator API Tests")
     print("=" * 50)
@@ -280,12 +755,31 @@ def main():
     tests = [
         tester.test_root_endpoint,
         tester.test_get_templates,
+        tester.test_unauthenticated_resumes,
+        tester.test_register_user,
         tester.test_create_resume,
         tester.test_get_resumes,
+        tester.test_sync_resumes,
+        tester.test_search_resumes,
+        tester.test_ats_score,
         tester.test_get_resume_by_id,
         tester.test_update_resume,
+        tester.test_patch_index_out_of_range,
+        tester.test_resume_revisions,
+        tester.test_pdf_export_job,
+        tester.test_resume_html_and_thumbnail,
+        tester.test_batch_resumes,
+        tester.test_rich_text_normalization,
+        tester.test_fast_json_legacy_resume,
+        tester.test_resume_change_notifications,
+        tester.test_export_import_resumes,
+        tester.test_import_multi_member_gzip,
         tester.test_delete_resume,
+        tester.test_sync_tombstones,
         tester.test_invalid_resume_id,
+        tester.test_metrics_requires_token,
+        # Last: it spends this client's login budget
+        tester.test_login_rate_limit,
     ]
     
     for test in tests:
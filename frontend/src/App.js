@@ -28,7 +28,41 @@ import { saveAs } from 'file-saver';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+const setAuthToken = (token) => {
+  if (token) {
+    localStorage.setItem('token', token);
+    axios.defaults.headers.common['Authorization'] = `Bearer ${token}`;
+  } else {
+    localStorage.removeItem('token');
+    delete axios.defaults.headers.common['Authorization'];
+  }
+};
+setAuthToken(localStorage.getItem('token'));
+
+// Resume fields the backend stores; autosave PATCHes only the ones that changed
+const SAVED_FIELDS = ['title', 'template_id', 'personal_info', 'experience', 'education', 'skills', 'projects'];
+
+const diffResume = (saved, current) => {
+  const changes = {};
+  SAVED_FIELDS.forEach(field => {
+    if (field === 'personal_info') {
+      Object.keys(current.personal_info || {}).forEach(key => {
+        if ((saved.personal_info || {})[key] !== current.personal_info[key]) {
+          changes.personal_info = { ...changes.personal_info, [key]: current.personal_info[key] };
+        }
+      });
+    } else if (JSON.stringify(saved[field]) !== JSON.stringify(current[field])) {
+      changes[field] = current[field];
+    }
+  });
+  return changes;
+};
+
 const App = () => {
+  const [authToken, setAuthTokenState] = useState(localStorage.getItem('token'));
+  const [authMode, setAuthMode] = useState('login');
+  const [authForm, setAuthForm] = useState({ email: '', password: '', full_name: '' });
+  const [authError, setAuthError] = useState('');
   const [resumes, setResumes] = useState([]);
   const [currentResume, setCurrentResume] = useState({
     id: '',
@@ -67,6 +101,10 @@ const App = () => {
   const [exportProgress, setExportProgress] = useState(0);
   const resumePreviewRef = useRef(null);
   const autoSaveTimer = useRef(null);
+  const lastSavedResume = useRef(null);
+  const syncCursor = useRef(null);
+  // Set on a 412 until the resume is reloaded, so autosave stops resending a stale If-Match
+  const saveConflict = useRef(false);
 
   // Rich text editor modules
   const quillModules = {
@@ -85,14 +123,57 @@ const App = () => {
     'list', 'bullet', 'indent', 'link'
   ];
 
+  useEffect(() => {
+    // Expired or revoked sessions drop back to the sign-in screen
+    const interceptor = axios.interceptors.response.use(
+      response => response,
+      error => {
+        if (error.response?.status === 401) {
+          setAuthToken(null);
+          setAuthTokenState(null);
+        }
+        return Promise.reject(error);
+      }
+    );
+    return () => axios.interceptors.response.eject(interceptor);
+  }, []);
+
   useEffect(() => {
     fetchTemplates();
+    if (!authToken) return;
+    syncCursor.current = null;
     fetchResumes();
-  }, []);
+    // Pick up edits made in other tabs and devices when the window regains focus
+    const onFocus = () => fetchResumes();
+    window.addEventListener('focus', onFocus);
+    return () => window.removeEventListener('focus', onFocus);
+  }, [authToken]);
+
+  const submitAuth = async (e) => {
+    e.preventDefault();
+    setAuthError('');
+    try {
+      const payload = authMode === 'register'
+        ? authForm
+        : { email: authForm.email, password: authForm.password };
+      const response = await axios.post(`${API}/${authMode}`, payload);
+      setAuthToken(response.data.access_token);
+      setAuthTokenState(response.data.access_token);
+    } catch (error) {
+      setAuthError(error.response?.data?.detail || 'Could not sign in. Please try again.');
+    }
+  };
+
+  const signOut = () => {
+    setAuthToken(null);
+    setAuthTokenState(null);
+    setResumes([]);
+    syncCursor.current = null;
+  };
 
   // Auto-save functionality
   useEffect(() => {
-    if (autoSave && currentResume.id) {
+    if (autoSave && currentResume.id && !saveConflict.current) {
       if (autoSaveTimer.current) clearTimeout(autoSaveTimer.current);
       autoSaveTimer.current = setTimeout(() => {
         saveResume(true); // Silent save
@@ -112,15 +193,43 @@ const App = () => {
     }
   };
 
+  // Delta sync: only resumes changed or deleted since the last watermark
   const fetchResumes = async () => {
     try {
-      const response = await axios.get(`${API}/resumes`);
-      setResumes(response.data);
+      const fullSync = !syncCursor.current;
+      let changed = [];
+      let deleted = [];
+      let page;
+      do {
+        const params = syncCursor.current ? { since: syncCursor.current } : {};
+        page = (await axios.get(`${API}/resumes/sync`, { params })).data;
+        changed = changed.concat(page.items);
+        deleted = deleted.concat(page.deleted);
+        syncCursor.current = page.next_cursor;
+      } while (page.has_more);
+
+      // Syncs overlap and a resume can change between pages: keep the newest version of each
+      setResumes(prev => {
+        const byId = new Map(fullSync ? [] : prev.map(resume => [resume.id, resume]));
+        for (const resume of changed) {
+          const known = byId.get(resume.id);
+          if (!known || (known.version ?? -1) <= (resume.version ?? -1)) byId.set(resume.id, resume);
+        }
+        deleted.forEach(id => byId.delete(id));
+        return [...byId.values()].sort((a, b) => (a.updated_at < b.updated_at ? 1 : -1));
+      });
     } catch (error) {
+      if (error.response?.status === 410) {
+        // Watermark is older than the server keeps tombstones; start over
+        syncCursor.current = null;
+        fetchResumes();
+        return;
+      }
       console.error('Error fetching resumes:', error);
     }
   };
 
+  // Resolves to whether the resume on the server now matches the editor
   const saveResume = async (silent = false) => {
     try {
       const resumeData = { ...currentResume };
@@ -128,21 +237,50 @@ const App = () => {
       delete resumeData.created_at;
       delete resumeData.updated_at;
       
-      if (currentResume.id) {
-        await axios.put(`${API}/resumes/${currentResume.id}`, resumeData);
+      delete resumeData.version;
+
+      // Refuse to overwrite edits made in another tab or device since our last save
+      const lastSaved = lastSavedResume.current;
+      const headers = lastSaved?.id === currentResume.id && lastSaved.version !== undefined
+        ? { 'If-Match': `"${lastSaved.version}"` }
+        : {};
+
+      let saved;
+      if (currentResume.id && silent && lastSaved?.id === currentResume.id) {
+        const changes = diffResume(lastSaved, currentResume);
+        if (Object.keys(changes).length === 0) return true;
+        const patched = (await axios.patch(`${API}/resumes/${currentResume.id}`, changes, { headers })).data;
+        saved = { ...currentResume, version: patched.version, updated_at: patched.updated_at };
+      } else if (currentResume.id) {
+        saved = (await axios.put(`${API}/resumes/${currentResume.id}`, resumeData, { headers })).data;
       } else {
-        const response = await axios.post(`${API}/resumes`, resumeData);
-        setCurrentResume(response.data);
+        saved = (await axios.post(`${API}/resumes`, resumeData)).data;
+        setCurrentResume(saved);
       }
-      fetchResumes();
+      lastSavedResume.current = JSON.parse(JSON.stringify(saved));
+      // Keep the sidebar list in sync locally instead of re-downloading it
+      setResumes(prev => [
+        { id: saved.id, title: saved.title, template_id: saved.template_id,
+          full_name: saved.personal_info.full_name, updated_at: saved.updated_at, version: saved.version },
+        ...prev.filter(resume => resume.id !== saved.id)
+      ]);
       if (!silent) {
         showNotification('Resume saved successfully!', 'success');
       }
+      return true;
     } catch (error) {
       console.error('Error saving resume:', error);
-      if (!silent) {
+      if (error.response?.status === 412) {
+        if (!saveConflict.current) {
+          saveConflict.current = true;
+          mergeRemoteChanges(currentResume.id);
+        } else if (!silent) {
+          showNotification('This resume was changed elsewhere. Reload it before saving again.', 'error');
+        }
+      } else if (!silent) {
         showNotification('Error saving resume. Please try again.', 'error');
       }
+      return false;
     }
   };
 
@@ -159,9 +297,31 @@ const App = () => {
     }, 3000);
   };
 
+  // Rebase unsaved edits onto the copy saved elsewhere, then let autosave write them again
+  const mergeRemoteChanges = async (resumeId) => {
+    try {
+      const remote = (await axios.get(`${API}/resumes/${resumeId}`)).data;
+      const base = lastSavedResume.current;
+      if (base?.id !== resumeId) return; // another resume was opened meanwhile
+      lastSavedResume.current = remote;
+      saveConflict.current = false;
+      setCurrentResume(prev => {
+        if (prev.id !== resumeId) return prev;
+        const edits = diffResume(base, prev);
+        return { ...remote, ...edits, personal_info: { ...remote.personal_info, ...edits.personal_info } };
+      });
+      showNotification('This resume was changed elsewhere. Those changes were loaded and your edits kept.', 'error');
+    } catch (error) {
+      console.error('Error reloading resume:', error);
+      showNotification('This resume was changed elsewhere. Reload it before saving again.', 'error');
+    }
+  };
+
   const loadResume = async (resumeId) => {
     try {
       const response = await axios.get(`${API}/resumes/${resumeId}`);
+      saveConflict.current = false;
+      lastSavedResume.current = response.data;
       setCurrentResume(response.data);
       setSelectedTemplate(response.data.template_id);
     } catch (error) {
@@ -213,7 +373,25 @@ const App = () => {
     try {
       setIsExporting(true);
       setExportProgress(0);
-      
+
+      // Saved resumes are rendered server-side as a vector PDF (cached by content hash)
+      if (currentResume.id) {
+        // The server renders its saved copy, which must be what the user sees
+        if (!(await saveResume(true))) {
+          showNotification('Could not save your latest changes, so the PDF was not exported. Please try again.', 'error');
+          return;
+        }
+        setExportProgress(50);
+        const response = await axios.get(`${API}/resumes/${currentResume.id}/pdf`, {
+          params: { template_id: selectedTemplate },
+          responseType: 'blob'
+        });
+        setExportProgress(100);
+        saveAs(response.data, `${currentResume.personal_info.full_name || 'Resume'}.pdf`);
+        showNotification('PDF exported successfully!', 'success');
+        return;
+      }
+
       const element = resumePreviewRef.current;
       setExportProgress(25);
       
@@ -1022,6 +1200,69 @@ const App = () => {
     );
   }
 
+  if (!authToken) {
+    return (
+      <div className="min-h-screen flex items-center justify-center bg-gradient-to-br from-slate-50 via-blue-50 to-indigo-100">
+        <Card className="w-full max-w-sm backdrop-blur-md bg-white/80 border-white/30">
+          <CardHeader>
+            <h1 className="text-2xl font-bold bg-gradient-to-r from-blue-600 to-indigo-600 bg-clip-text text-transparent">
+              Resume Creator Pro
+            </h1>
+            <p className="text-sm text-gray-600">
+              {authMode === 'login' ? 'Sign in to your resumes' : 'Create your account'}
+            </p>
+          </CardHeader>
+          <CardContent>
+            <form onSubmit={submitAuth} className="space-y-4">
+              {authMode === 'register' && (
+                <div>
+                  <Label htmlFor="auth-name">Full Name</Label>
+                  <Input
+                    id="auth-name"
+                    value={authForm.full_name}
+                    onChange={(e) => setAuthForm(prev => ({ ...prev, full_name: e.target.value }))}
+                    required
+                  />
+                </div>
+              )}
+              <div>
+                <Label htmlFor="auth-email">Email</Label>
+                <Input
+                  id="auth-email"
+                  type="email"
+                  value={authForm.email}
+                  onChange={(e) => setAuthForm(prev => ({ ...prev, email: e.target.value }))}
+                  required
+                />
+              </div>
+              <div>
+                <Label htmlFor="auth-password">Password</Label>
+                <Input
+                  id="auth-password"
+                  type="password"
+                  value={authForm.password}
+                  onChange={(e) => setAuthForm(prev => ({ ...prev, password: e.target.value }))}
+                  required
+                />
+              </div>
+              {authError && <div className="text-sm text-red-600">{authError}</div>}
+              <Button type="submit" className="w-full">
+                {authMode === 'login' ? 'Sign In' : 'Create Account'}
+              </Button>
+              <button
+                type="button"
+                onClick={() => setAuthMode(authMode === 'login' ? 'register' : 'login')}
+                className="w-full text-sm text-blue-600 hover:underline"
+              >
+                {authMode === 'login' ? 'Need an account? Register' : 'Already registered? Sign in'}
+              </button>
+            </form>
+          </CardContent>
+        </Card>
+      </div>
+    );
+  }
+
   return (
     <div className="min-h-screen bg-gradient-to-br from-slate-50 via-blue-50 to-indigo-100">
       {/* Header */}
@@ -1051,6 +1292,9 @@ const App = () => {
                 <Eye className="w-4 h-4 mr-2" />
                 Preview
               </Button>
+              <Button onClick={signOut} variant="ghost" className="text-gray-600">
+                Sign Out
+              </Button>
             </div>
           </div>
         </div>